@@ -4,50 +4,37 @@ Trail Data Analyzer - Agent A1
 Parses KML trail data and generates comprehensive analysis
 """
 
+import argparse
 import csv
+import gzip
 import json
-import math
-import re
-import xml.etree.ElementTree as ET
-from collections import Counter, defaultdict
-from typing import Any, Dict, List, Tuple
-
-# KML namespace
-NS = {"kml": "http://www.opengis.net/kml/2.2"}
-
-
-def parse_description(description: str) -> Dict[str, str]:
-    """Parse the CDATA description field to extract OSM tags"""
-    tags = {}
-    if not description:
-        return tags
-
-    # Extract content from CDATA
-    cdata_match = re.search(r"<!\[CDATA\[(.*?)\]\]>", description, re.DOTALL)
-    if not cdata_match:
-        return tags
-
-    content = cdata_match.group(1)
-
-    # Parse HTML tags
-    tag_pattern = r"<b>(.*?):</b>\s*(.*?)(?:<br/>|$)"
-    matches = re.findall(tag_pattern, content)
-
-    for key, value in matches:
-        tags[key] = value.strip()
-
-    return tags
-
-
-def parse_coordinates(coord_string: str) -> List[Tuple[float, float]]:
-    """Parse KML coordinate string into list of (lon, lat) tuples"""
-    coords = []
-    for coord in coord_string.strip().split():
-        parts = coord.split(",")
-        if len(parts) >= 2:
-            lon, lat = float(parts[0]), float(parts[1])
-            coords.append((lon, lat))
-    return coords
+import mmap
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from kml_reader import PlacemarkBatch, PlacemarkReader, parse_coordinates, parse_description
+from geojson_io import FeatureCollectionWriter
+from kml_shards import Shard, plan_shards, read_shard
+from osm_reader import OsmTrailReader
+from output_cache import StagedOutputs
+from trail_columns import DEFAULT_PRECISION, TrailColumnsWriter
+from trail_geometry import trail_lengths_miles
+from trail_records import TrailTable, describe_trail
+from trail_stats import TrailStats
+
+DEFAULT_KML_PATH = "trails.kml"
+GEOJSON_PATH = "data/trails.geojson"
+MANIFEST_PATH = "data/trails_ingest_manifest.json"
+COLUMNS_PATH = "data/trails.tcol"
+CSV_PATH = "data/trails_summary.csv"
+STATS_PATH = "data/trails_statistics.json"
+MANIFEST_VERSION = 2
 
 
 def calculate_distance(coords: List[Tuple[float, float]]) -> float:
@@ -55,180 +42,342 @@ def calculate_distance(coords: List[Tuple[float, float]]) -> float:
     if len(coords) < 2:
         return 0.0
 
-    total_miles = 0.0
-    for i in range(len(coords) - 1):
-        lon1, lat1 = coords[i]
-        lon2, lat2 = coords[i + 1]
-
-        # Haversine formula
-        R = 3959  # Earth radius in miles
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (
-            math.sin(dlat / 2) ** 2
-            + math.cos(math.radians(lat1))
-            * math.cos(math.radians(lat2))
-            * math.sin(dlon / 2) ** 2
-        )
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        total_miles += R * c
-
-    return total_miles
+    vertices = np.asarray(coords, dtype=np.float64)
+    offsets = np.array([0, len(coords)], dtype=np.int64)
+    return float(trail_lengths_miles(vertices, offsets)[0])
 
 
-def extract_county(tags: Dict[str, str]) -> str:
-    """Extract county from tiger:county tag"""
-    county_raw = tags.get("tiger:county", "Unknown")
-    # Parse "Buncombe, NC" -> "Buncombe"
-    if "," in county_raw:
-        return county_raw.split(",")[0].strip()
-    return county_raw
-
-
-def main():
-    print("Starting KML trail data analysis...")
-    print(f"Parsing: trails.kml")
-
-    # Parse KML
-    tree = ET.parse("trails.kml")
-    root = tree.getroot()
-
-    # Storage
-    trails = []
-    geojson_features = []
-
-    # Statistics
-    stats = {
-        "total_trails": 0,
-        "total_miles": 0.0,
-        "named_trails": 0,
-        "unnamed_trails": 0,
-        "county_counts": Counter(),
-        "county_miles": defaultdict(float),
-        "highway_types": Counter(),
-        "surface_types": Counter(),
-        "difficulty_levels": Counter(),
-        "forest_service_roads": 0,
-        "has_surface_tag": 0,
-        "has_difficulty_tag": 0,
+@dataclass
+class IngestResult:
+    """
+    Trails and statistics for a run of placemarks.
+
+    Trails live in a column-oriented TrailTable, so results cross process
+    boundaries as arrays and strings rather than per-trail dicts. An
+    incremental ingest also lists the rows whose GeoJSON feature is copied
+    verbatim from the previous trails.geojson text, as (start, end) spans.
+    """
+
+    table: TrailTable
+    stats: TrailStats
+    copied: Dict[int, Tuple[int, int]] = field(default_factory=dict)
+    previous_text: Any = None
+
+
+def ingest_batches(batches: Iterable[PlacemarkBatch], progress: bool = True) -> IngestResult:
+    """Build the trail table and statistics from placemark batches"""
+    table = TrailTable()
+
+    # Statistics, accumulated a batch at a time
+    stats = TrailStats()
+    processed = 0
+
+    # Parse Placemarks in batches; geometry arrives as ragged arrays
+    for batch in batches:
+        lengths = trail_lengths_miles(batch.vertices, batch.offsets).tolist()
+        bounds = batch.offsets.tolist()
+        batch_start = len(table)
+
+        for j in range(len(batch)):
+            processed += 1
+
+            # Extract name
+            name = (
+                batch.names[j]
+                if batch.names[j] is not None
+                else f"Trail {batch.indices[j]}"
+            )
+
+            # OSM tags from the description
+            tags = batch.tags[j]
+
+            # Extract coordinates
+            start, end = bounds[j], bounds[j + 1]
+            if not batch.has_linestring[j] or start == end:
+                continue
+
+            # Distance and metadata
+            summary = describe_trail(name, tags, end - start, lengths[j])
+
+            # Build trail record; vertices stay in the batch buffer
+            table.append(
+                summary,
+                tags,
+                end - start,
+                batch.indices[j],
+                batch.hashes[j],
+                batch.names[j] is None,
+            )
+
+            # Progress indicator
+            if progress and processed % 1000 == 0:
+                print(f"  Processed {processed} trails...")
+
+        # Skipped placemarks have no vertices, so the buffer lines up
+        table.add_vertices(batch.vertices)
+        stats.update(table, batch_start, placemarks=len(batch))
+
+    return IngestResult(table, stats)
+
+
+def ingest_shard(kml_path: str, shard: Shard) -> IngestResult:
+    """Worker entry point: parse one byte-range shard of the KML"""
+    reader = PlacemarkReader(read_shard(kml_path, shard), index_start=shard.first_index)
+    return ingest_batches(reader.iter_batches(), progress=False)
+
+
+def merge_results(results: List[IngestResult]) -> IngestResult:
+    """
+    Combine shard results in file order.
+
+    Tables are concatenated and statistics merged shard by shard, which
+    keeps counter keys in first-seen order.
+    """
+    merged = IngestResult(TrailTable(), TrailStats())
+    for result in results:
+        merged.table.extend(result.table)
+        merged.stats.merge(result.stats)
+    return merged
+
+
+def ingest_kml_sharded(kml_path: str, workers: int) -> IngestResult:
+    """Parse the KML in parallel over Placemark-aligned byte ranges"""
+    # A few shards per worker keeps the pool busy when shard costs differ
+    shards = plan_shards(kml_path, workers * 4)
+    print(f"  Split into {len(shards)} shards across {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(ingest_shard, kml_path, shard) for shard in shards]
+        results = []
+        for shard, future in zip(shards, futures):
+            results.append(future.result())
+            print(f"  Shard {shard.shard_id + 1}/{len(shards)}: {shard.num_placemarks:,} placemarks")
+    return merge_results(results)
+
+
+def trail_keys(osm_ids: Iterable[str]) -> List[str]:
+    """Stable per-trail keys: the OSM ID, with #n appended to repeats"""
+    seen = Counter()
+    keys = []
+    for osm_id in osm_ids:
+        keys.append(f"{osm_id}#{seen[osm_id]}" if seen[osm_id] else osm_id)
+        seen[osm_id] += 1
+    return keys
+
+
+def write_manifest(
+    result: IngestResult,
+    spans: List[Tuple[int, int]],
+    kml_path: str,
+    geojson_path: str = GEOJSON_PATH,
+    precision: Optional[int] = None,
+    indent: Optional[int] = 2,
+    path: str = MANIFEST_PATH,
+    geojson_size: Optional[int] = None,
+) -> None:
+    """
+    Record each trail's placemark hash, unrounded distance and feature span
+    in trails.geojson (uncompressed), so the next --incremental run can
+    reuse it.
+    """
+    table = result.table
+    keys = trail_keys(table.osm_ids)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "kml_path": kml_path,
+        "geojson_path": geojson_path,
+        "geojson_size": geojson_size,
+        "precision": precision,
+        "indent": indent,
+        "num_features": len(table),
+        "trails": {
+            key: {"hash": content_hash, "distance_miles": distance_miles, "span": span}
+            for key, content_hash, distance_miles, span in zip(
+                keys, table.hashes, table.distance_miles.tolist(), spans
+            )
+        },
     }
-
-    # Parse each Placemark
-    for placemark in root.findall(".//kml:Placemark", NS):
-        stats["total_trails"] += 1
-
-        # Extract name
-        name_elem = placemark.find("kml:name", NS)
-        name = (
-            name_elem.text
-            if name_elem is not None
-            else f"Trail {stats['total_trails']}"
-        )
-
-        # Extract description (contains OSM tags)
-        desc_elem = placemark.find("kml:description", NS)
-        description = desc_elem.text if desc_elem is not None else ""
-        tags = parse_description(description)
-
-        # Extract coordinates
-        linestring = placemark.find(".//kml:LineString/kml:coordinates", NS)
-        if linestring is None:
+    with open(path, "w") as f:
+        f.write(json.dumps(manifest))
+
+
+def load_previous_run(
+    geojson_path: str = GEOJSON_PATH,
+    precision: Optional[int] = None,
+    indent: Optional[int] = 2,
+    manifest_path: str = MANIFEST_PATH,
+) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """
+    Manifest and trails.geojson text (bytes, memory-mapped when not gzipped)
+    of the last run, or None if they don't line up (including when that run
+    wrote a different file, layout or coordinate precision)
+    """
+    if not (os.path.exists(manifest_path) and os.path.exists(geojson_path)):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    if manifest.get("geojson_path", GEOJSON_PATH) != geojson_path:
+        return None
+    if manifest.get("precision") != precision or manifest.get("indent") != indent:
+        return None
+    if os.path.getsize(geojson_path) != manifest.get("geojson_size"):
+        return None
+    if geojson_path.endswith(".gz"):
+        with gzip.open(geojson_path, "rb") as f:
+            text = f.read()
+    else:
+        with open(geojson_path, "rb") as f:
+            text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return manifest, text
+
+
+def ingest_incremental(kml_path: str, manifest: Dict[str, Any], previous_text: Any) -> IngestResult:
+    """
+    Re-ingest only placemarks whose content hash changed since the last run.
+
+    Placemarks are matched to the manifest by OSM ID. Unchanged trails keep
+    their previous distance and decode their geometry from their own span of
+    the previous GeoJSON, without parsing coordinates; their feature text is
+    copied into the new GeoJSON as is (unless an unnamed trail moved, which
+    changes its "Trail N" name). New and changed placemarks go through
+    ingest_batches. Placemarks missing from the KML drop out. The outputs
+    match a full run over the same file.
+    """
+    entries = manifest["trails"]
+    reader = PlacemarkReader(kml_path)
+
+    # Pass 1: hash every placemark and split into reused and pending
+    # (placemark index, name, name missing, tags, hash, previous manifest entry or None)
+    slots = []
+    pending = []
+    seen = Counter()
+    matched = set()
+    added = 0
+    for placemark in reader:
+        text = placemark.coordinates_text
+        if not placemark.has_linestring or not (text and text.strip()):
             continue
-
-        coords = parse_coordinates(linestring.text)
-        if not coords:
-            continue
-
-        # Calculate distance
-        distance_miles = calculate_distance(coords)
-        stats["total_miles"] += distance_miles
-
-        # Extract metadata
-        county = extract_county(tags)
-        highway_type = tags.get("highway", "unknown")
-        surface = tags.get("surface", "unknown")
-        difficulty = tags.get("sac_scale", tags.get("tracktype", "unknown"))
-        osm_id = tags.get("OSM ID", "unknown")
-        ref = tags.get("ref", "")
-
-        # Update statistics
-        stats["county_counts"][county] += 1
-        stats["county_miles"][county] += distance_miles
-        stats["highway_types"][highway_type] += 1
-
-        if surface != "unknown":
-            stats["surface_types"][surface] += 1
-            stats["has_surface_tag"] += 1
-
-        if difficulty != "unknown":
-            stats["difficulty_levels"][difficulty] += 1
-            stats["has_difficulty_tag"] += 1
-
-        if "Trail " in name and name.startswith("Trail "):
-            stats["unnamed_trails"] += 1
+        osm_id = placemark.tags.get("OSM ID", "unknown")
+        key = f"{osm_id}#{seen[osm_id]}" if seen[osm_id] else osm_id
+        seen[osm_id] += 1
+
+        content_hash = placemark.content_hash()
+        entry = entries.get(key)
+        if entry is None:
+            added += 1
         else:
-            stats["named_trails"] += 1
-
-        if ref and "FS " in ref:
-            stats["forest_service_roads"] += 1
-
-        # Build trail record
-        trail_record = {
-            "name": name,
-            "osm_id": osm_id,
-            "county": county,
-            "distance_miles": round(distance_miles, 3),
-            "highway_type": highway_type,
-            "surface": surface,
-            "difficulty": difficulty,
-            "ref": ref,
-            "num_coordinates": len(coords),
-            "all_tags": tags,
-        }
-        trails.append(trail_record)
-
-        # Build GeoJSON feature
-        geojson_coords = [[lon, lat] for lon, lat in coords]
-        feature = {
-            "type": "Feature",
-            "properties": {
-                "name": name,
-                "osm_id": osm_id,
-                "county": county,
-                "distance_miles": round(distance_miles, 3),
-                "highway_type": highway_type,
-                "surface": surface,
-                "difficulty": difficulty,
-                "ref": ref,
-                **tags,  # Include all OSM tags
-            },
-            "geometry": {"type": "LineString", "coordinates": geojson_coords},
-        }
-        geojson_features.append(feature)
-
-        # Progress indicator
-        if stats["total_trails"] % 1000 == 0:
-            print(f"  Processed {stats['total_trails']} trails...")
-
-    print(f"\nParsing complete! Processed {stats['total_trails']} trails")
-    print(f"Total trail miles: {stats['total_miles']:.2f}")
-
-    # Sort trails by distance (longest first)
-    trails.sort(key=lambda x: x["distance_miles"], reverse=True)
+            matched.add(key)
 
-    # Write GeoJSON
-    geojson = {"type": "FeatureCollection", "features": geojson_features}
+        # Unnamed trails are labelled by position, which may have moved
+        name_missing = placemark.name is None
+        name = f"Trail {placemark.index}" if name_missing else placemark.name
+        if entry is not None and entry["hash"] == content_hash:
+            slots.append((placemark.index, name, name_missing, placemark.tags, content_hash, entry))
+        else:
+            slots.append((placemark.index, name, name_missing, placemark.tags, content_hash, None))
+            pending.append(placemark)
+
+    # Pass 2: parse new and changed placemarks
+    fresh = TrailTable()
+    if pending:
+        batches = (
+            PlacemarkBatch.from_placemarks(pending[i : i + 4096])
+            for i in range(0, len(pending), 4096)
+        )
+        fresh = ingest_batches(batches, progress=False).table
+    fresh_rows = {index: i for i, index in enumerate(fresh.indices)}
+    fresh_distances = fresh.distance_miles.tolist()
+    fresh_offsets = fresh.vertex_offsets.tolist()
+
+    # Rebuild trails and statistics in file order
+    result = IngestResult(TrailTable(), TrailStats(), previous_text=previous_text)
+    table = result.table
+    for index, name, name_missing, tags, content_hash, entry in slots:
+        if entry is not None:
+            start, end = entry["span"]
+            feature = json.loads(previous_text[start:end])
+            coordinates = feature["geometry"]["coordinates"]
+            vertices = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+            distance_miles = entry["distance_miles"]
+            if feature["properties"]["name"] == name:
+                result.copied[len(table)] = (start, end)
+        elif index in fresh_rows:
+            row = fresh_rows[index]
+            vertices = fresh.vertices[fresh_offsets[row] : fresh_offsets[row + 1]]
+            distance_miles = fresh_distances[row]
+        else:
+            continue  # no usable coordinates
+        summary = describe_trail(name, tags, len(vertices), distance_miles)
+        table.append(summary, tags, len(vertices), index, content_hash, name_missing)
+        table.add_vertices(vertices)
+    result.stats.update(table, placemarks=reader.count)
 
-    geojson_path = "data/trails.geojson"
+    print(
+        f"  Incremental: {len(slots) - len(pending):,} unchanged, "
+        f"{len(pending) - added:,} changed, "
+        f"{added:,} new, {len(set(entries) - matched):,} removed"
+    )
+    return result
+
+
+def write_outputs(
+    table: TrailTable,
+    order: List[int],
+    stats: TrailStats,
+    geojson_path: str = GEOJSON_PATH,
+    indent: Optional[int] = 2,
+    precision: Optional[int] = None,
+    columns_path: Optional[str] = None,
+    outputs: Optional[StagedOutputs] = None,
+    copied: Optional[Dict[int, Tuple[int, int]]] = None,
+    previous_text: Any = None,
+) -> List[Tuple[int, int]]:
+    """
+    Write trails.geojson, trails_summary.csv and trails_statistics.json
+    (through ``outputs`` staging paths when given). Rows in ``copied`` take
+    their feature text from that span of ``previous_text``. Returns each
+    feature's span in the new GeoJSON.
+    """
+    target = outputs.path if outputs else str
+    copied = copied or {}
+
+    # Write GeoJSON (file order), one feature at a time
     print(f"\nWriting GeoJSON to: {geojson_path}")
-    with open(geojson_path, "w") as f:
-        json.dump(geojson, f, indent=2)
-    print(f"  GeoJSON written: {len(geojson_features)} features")
+    with FeatureCollectionWriter(target(geojson_path), indent=indent, precision=precision) as geojson:
+        for i in range(len(table)):
+            span = copied.get(i)
+            if span is None:
+                geojson.write(table.feature(i))
+            else:
+                geojson.write_text(previous_text[span[0] : span[1]].decode("ascii"))
+    if copied:
+        print(f"  GeoJSON written: {geojson.count} features ({len(copied):,} copied unchanged)")
+    else:
+        print(f"  GeoJSON written: {geojson.count} features")
+
+    if columns_path:
+        print(f"\nWriting trail columns to: {columns_path}")
+        vertices, offsets = table.vertices, table.vertex_offsets.tolist()
+        name_missing = table.name_missing.tolist()
+        with TrailColumnsWriter(
+            target(columns_path), precision if precision is not None else DEFAULT_PRECISION
+        ) as out:
+            for i in range(len(table)):
+                out.add(
+                    table.properties(i),
+                    vertices[offsets[i] : offsets[i + 1]],
+                    name_missing=name_missing[i],
+                )
+        print(f"  Trail columns written: {out.count} features")
+
+    # Summary rows, longest first
+    trails = [table.summary(i) for i in order[:10]]
 
     # Write CSV
-    csv_path = "data/trails_summary.csv"
-    print(f"\nWriting CSV to: {csv_path}")
-    with open(csv_path, "w", newline="") as f:
+    print(f"\nWriting CSV to: {CSV_PATH}")
+    with open(target(CSV_PATH), "w", newline="") as f:
         fieldnames = [
             "name",
             "osm_id",
@@ -242,79 +391,41 @@ def main():
         ]
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
-        for trail in trails:
-            row = {k: trail[k] for k in fieldnames}
-            writer.writerow(row)
-    print(f"  CSV written: {len(trails)} rows")
+        for i in order:
+            writer.writerow(table.summary(i))
+    print(f"  CSV written: {len(order)} rows")
 
     # Prepare statistics JSON
-    stats_export = {
-        "summary": {
-            "total_trails": stats["total_trails"],
-            "total_miles": round(stats["total_miles"], 2),
-            "named_trails": stats["named_trails"],
-            "unnamed_trails": stats["unnamed_trails"],
-            "forest_service_roads": stats["forest_service_roads"],
-            "trails_with_surface_tag": stats["has_surface_tag"],
-            "trails_with_difficulty_tag": stats["has_difficulty_tag"],
-        },
-        "by_county": {
-            county: {
-                "trail_count": stats["county_counts"][county],
-                "total_miles": round(stats["county_miles"][county], 2),
-                "avg_miles_per_trail": round(
-                    stats["county_miles"][county] / stats["county_counts"][county], 2
-                ),
-            }
-            for county in sorted(stats["county_counts"].keys())
-        },
-        "by_highway_type": dict(stats["highway_types"].most_common()),
-        "by_surface": dict(stats["surface_types"].most_common()),
-        "by_difficulty": dict(stats["difficulty_levels"].most_common()),
-        "top_10_longest_trails": [
-            {
-                "name": t["name"],
-                "county": t["county"],
-                "distance_miles": t["distance_miles"],
-                "highway_type": t["highway_type"],
-            }
-            for t in trails[:10]
-        ],
-        "buncombe_county_summary": {
-            "trail_count": stats["county_counts"]["Buncombe"],
-            "total_miles": round(stats["county_miles"]["Buncombe"], 2),
-            "percentage_of_total": round(
-                100 * stats["county_counts"]["Buncombe"] / stats["total_trails"], 2
-            ),
-        },
-    }
+    stats_export = stats.export(trails)
 
-    stats_path = "data/trails_statistics.json"
-    print(f"\nWriting statistics to: {stats_path}")
-    with open(stats_path, "w") as f:
+    print(f"\nWriting statistics to: {STATS_PATH}")
+    with open(target(STATS_PATH), "w") as f:
         json.dump(stats_export, f, indent=2)
     print(f"  Statistics written")
+    return geojson.spans
 
+
+def print_summary(trails: List[Dict[str, Any]], stats: TrailStats) -> None:
     # Print summary
     print("\n" + "=" * 70)
     print("TRAIL DATA SUMMARY")
     print("=" * 70)
-    print(f"\nTotal Trails: {stats['total_trails']:,}")
-    print(f"Total Miles: {stats['total_miles']:,.2f}")
+    print(f"\nTotal Trails: {stats.total_trails:,}")
+    print(f"Total Miles: {stats.total_miles:,.2f}")
     print(
-        f"Average Trail Length: {stats['total_miles'] / stats['total_trails']:.2f} miles"
+        f"Average Trail Length: {stats.total_miles / stats.total_trails:.2f} miles"
     )
-    print(f"\nNamed Trails: {stats['named_trails']:,}")
-    print(f"Unnamed Trails: {stats['unnamed_trails']:,}")
-    print(f"Forest Service Roads: {stats['forest_service_roads']}")
+    print(f"\nNamed Trails: {stats.named_trails:,}")
+    print(f"Unnamed Trails: {stats.unnamed_trails:,}")
+    print(f"Forest Service Roads: {stats.forest_service_roads}")
 
     print(f"\n--- Top 5 Counties by Trail Count ---")
-    for county, count in stats["county_counts"].most_common(5):
-        miles = stats["county_miles"][county]
+    for county, count in stats.county_counts.most_common(5):
+        miles = stats.county_miles[county]
         print(f"  {county}: {count:,} trails ({miles:,.2f} miles)")
 
     print(f"\n--- Highway Types ---")
-    for hwy_type, count in stats["highway_types"].most_common():
+    for hwy_type, count in stats.highway_types.most_common():
         print(f"  {hwy_type}: {count:,} trails")
 
     print(f"\n--- Top 10 Longest Trails ---")
@@ -328,5 +439,144 @@ def main():
     print("=" * 70)
 
 
+def analyze(
+    args: argparse.Namespace,
+    source: str,
+    workers: int,
+    geojson_path: str,
+    indent: Optional[int],
+    outputs: StagedOutputs,
+) -> None:
+    print("Starting KML trail data analysis...")
+    print(f"Parsing: {source}")
+
+    previous = load_previous_run(geojson_path, args.precision, indent) if args.incremental else None
+    if args.incremental and previous is None:
+        print("  No usable previous run found, doing a full ingest")
+
+    start = time.perf_counter()
+    if args.osm:
+        reader = OsmTrailReader(args.osm)
+        result = ingest_batches(reader.iter_batches())
+        ingest_report = reader.report()
+    elif previous is not None:
+        result = ingest_incremental(args.kml, *previous)
+        elapsed = time.perf_counter() - start
+        ingest_report = f"Incremental ingest in {elapsed:.2f}s"
+    elif workers > 1:
+        result = ingest_kml_sharded(args.kml, workers)
+        elapsed = time.perf_counter() - start
+        rate = result.stats.total_trails / elapsed if elapsed > 0 else 0.0
+        ingest_report = (
+            f"Read {result.stats.total_trails:,} placemarks in {elapsed:.2f}s "
+            f"({rate:,.0f} placemarks/sec)"
+        )
+    else:
+        # Stream Placemarks from the KML
+        reader = PlacemarkReader(args.kml)
+        result = ingest_batches(reader.iter_batches())
+        ingest_report = reader.report()
+
+    table = result.table
+    stats = result.stats
+
+    print(f"\nParsing complete! Processed {stats.total_trails} trails")
+    print(f"  {ingest_report}")
+    print(f"Total trail miles: {stats.total_miles:.2f}")
+
+    # Sort trails by distance (longest first)
+    order = table.longest_first()
+
+    spans = write_outputs(
+        table,
+        order,
+        stats,
+        geojson_path,
+        indent,
+        args.precision,
+        COLUMNS_PATH if args.columnar else None,
+        outputs,
+        result.copied,
+        result.previous_text,
+    )
+    write_manifest(
+        result,
+        spans,
+        source,
+        geojson_path,
+        args.precision,
+        indent,
+        path=outputs.path(MANIFEST_PATH),
+        geojson_size=os.path.getsize(outputs.path(geojson_path)),
+    )
+    print_summary([table.summary(i) for i in order[:10]], stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--kml", default=DEFAULT_KML_PATH, help="OSM trail export")
+    parser.add_argument(
+        "--osm",
+        help="read trail ways straight from an .osm or .osm.pbf extract instead of --kml",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="parse in N processes over Placemark-aligned shards "
+        "(0 = one per CPU; 1 = serial)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="re-parse only placemarks whose content changed since the last run "
+        f"(tracked in {MANIFEST_PATH}) and copy the unchanged features' GeoJSON "
+        "text from the previous output; the CSV and statistics are rebuilt",
+    )
+    parser.add_argument(
+        "--compact", action="store_true", help="write trails.geojson without indentation"
+    )
+    parser.add_argument(
+        "--gzip", action="store_true", help=f"write {GEOJSON_PATH}.gz instead of {GEOJSON_PATH}"
+    )
+    parser.add_argument(
+        "--precision",
+        type=int,
+        help="round GeoJSON coordinates to this many decimal places",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help=f"also write {COLUMNS_PATH} (binary, spatially indexed; see trail_columns.py)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-ingest and rewrite outputs even if the source and options are unchanged",
+    )
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    geojson_path = GEOJSON_PATH + ".gz" if args.gzip else GEOJSON_PATH
+    indent = None if args.compact else 2
+    if args.osm and (args.incremental or workers > 1):
+        parser.error("--osm reads the extract serially; drop --incremental/--workers")
+    source = args.osm or args.kml
+    params = {
+        "source": source,
+        "gzip": args.gzip,
+        "compact": args.compact,
+        "precision": args.precision,
+        "columnar": args.columnar,
+    }
+    with StagedOutputs(
+        "analyze_trails", [source], params, force=args.force, code=[__file__]
+    ) as outputs:
+        if outputs.unchanged():
+            print(f"{source} and options unchanged since the last run; nothing to do")
+        else:
+            analyze(args, source, workers, geojson_path, indent, outputs)
+    outputs.report()
+
+
 if __name__ == "__main__":
     main()
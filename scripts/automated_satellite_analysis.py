@@ -15,6 +15,9 @@ import pandas as pd
 import requests
 from PIL import Image
 
+from trail_geometry import line_centroids
+from vertex_store import open_vertex_store
+
 # Paths
 DATA_DIR = Path("data")
 PHOTO_DIR = Path("photos")
@@ -94,31 +97,72 @@ def download_sentinel_hub(lat, lon, bbox_size=0.01):
     return None
 
 
+def geojson_centroids(osm_ids):
+    """(lat, lon) line centroids of the given trails in top_20_verified.geojson"""
+    trails_gj = DATA_DIR / "top_20_verified.geojson"
+    if not trails_gj.exists():
+        print(f"GeoJSON file not found: {trails_gj}")
+        return {}
+
+    with open(trails_gj) as f:
+        features = json.load(f)["features"]
+    wanted = set(osm_ids)
+    lines = {}
+    for feature in features:
+        osm_id = str(feature["properties"].get("osm_id", ""))
+        geometry = feature.get("geometry") or {}
+        if osm_id in wanted and geometry.get("type") == "LineString":
+            lines.setdefault(osm_id, np.asarray(geometry["coordinates"], dtype=np.float64)[:, :2])
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    np.cumsum([len(line) for line in lines.values()], out=offsets[1:])
+    vertices = np.concatenate(list(lines.values())) if lines else np.empty((0, 2))
+    centroids = line_centroids(vertices, offsets)
+    return {osm_id: (lat, lon) for osm_id, (lon, lat) in zip(lines, centroids.tolist())}
+
+
 def extract_trail_coordinates(csv_file):
     """
     Extract GPS coordinates from trail data
-    Note: Our CSV doesn't have explicit lat/lon columns, need to parse from trails.geojson
+    Note: Our CSV doesn't have explicit lat/lon columns. The trails and their
+    ranks are csv_file's rows; each trail's centroid comes from the memory-mapped
+    vertex store by OSM ID, or from top_20_verified.geojson when the store
+    doesn't have it. Trails found in neither are reported and kept with
+    lat/lon None.
     """
-    import geopandas as gpd
-
-    # Load GeoJSON with trail geometries
-    trails_gj = DATA_DIR / "top_20_verified.geojson"
-
-    if not trails_gj.exists():
-        print(f"GeoJSON file not found: {trails_gj}")
-        return []
+    candidates = pd.read_csv(csv_file, dtype={"osm_id": str}, keep_default_na=False)
+    osm_ids = candidates["osm_id"].tolist()
 
-    gdf = gpd.read_file(trails_gj)
+    centers = {}
+    try:
+        trail_vertices = open_vertex_store()
+    except FileNotFoundError:
+        trail_vertices = None
+    if trail_vertices is not None:
+        rows = {osm_id: trail_vertices.row(osm_id) for osm_id in osm_ids}
+        found = [osm_id for osm_id, row in rows.items() if row is not None]
+        centroids = trail_vertices.centroids([rows[osm_id] for osm_id in found])
+        for osm_id, (lon, lat) in zip(found, centroids.tolist()):
+            centers[osm_id] = (lat, lon)
+
+    missing = [osm_id for osm_id in osm_ids if osm_id not in centers]
+    if missing:
+        centers.update(geojson_centroids(missing))
+        missing = [osm_id for osm_id in osm_ids if osm_id not in centers]
+    if missing:
+        print(
+            f"No geometry for {len(missing)} of {len(osm_ids)} trails in {csv_file} "
+            f"(OSM IDs {', '.join(missing)})"
+        )
 
     coordinates = []
-    for idx, row in gdf.iterrows():
-        # Get centroid of trail
-        centroid = row.geometry.centroid
+    for idx, (name, osm_id) in enumerate(zip(candidates["trail_name"], osm_ids)):
+        lat, lon = centers.get(osm_id, (None, None))
         coordinates.append(
             {
-                "name": row.get("trail_name", row.get("name", f"Trail {idx + 1}")),
-                "lat": centroid.y,
-                "lon": centroid.x,
+                "name": name or f"Trail {idx + 1}",
+                "osm_id": osm_id,
+                "lat": lat,
+                "lon": lon,
                 "rank": idx + 1,
             }
         )
@@ -314,6 +358,9 @@ def main():
     # Analyze top 5 trails
     for trail in coordinates[:5]:
         print(f"\n--- Analyzing: {trail['name']} (Rank {trail['rank']}) ---")
+        if trail["lat"] is None:
+            print(f"✗ No geometry for OSM ID {trail['osm_id']}")
+            continue
         print(f"Location: {trail['lat']:.4f}, {trail['lon']:.4f}")
 
         # Try downloading satellite imagery
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: joining scored candidates back to their features
+Compares the legacy nested scan (every candidate rescans the feature list,
+plus list.index for ranks) against feature_index.FeatureIndex on synthetic
+features, at several candidate counts. The legacy join is O(features x
+candidates), so past a few thousand candidates it is timed on a random
+sample and extrapolated (marked "est.").
+
+Usage: python scripts/bench_feature_index.py [--sizes 1000,10000,100000] [--sample N]
+"""
+
+import argparse
+import random
+import time
+
+from feature_index import FeatureIndex
+
+FIRST_OSM_ID = 900_000_000
+# Features per candidate: filter_and_score keeps roughly one trail in two
+# among the candidates it joins
+FEATURES_PER_CANDIDATE = 2
+MAX_LEGACY_COMPARISONS = 50_000_000
+
+
+def make_features(count):
+    return [
+        {
+            "type": "Feature",
+            "properties": {"osm_id": str(FIRST_OSM_ID + i), "name": f"Trail {i}"},
+            "geometry": {"type": "LineString", "coordinates": [[-82.5, 35.5], [-82.4, 35.6]]},
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_join(features, candidates):
+    """The nested scan filter_and_score_trails used for its GeoJSON outputs"""
+    joined = []
+    for osm_id in candidates:
+        for feature in features:
+            if str(feature["properties"].get("osm_id", "")) == osm_id:
+                joined.append((candidates.index(osm_id) + 1, feature))
+                break
+    return joined
+
+
+def index_join(features, candidates):
+    index = FeatureIndex(features)
+    joined = []
+    for rank, osm_id in enumerate(candidates, 1):
+        feature = index.get(osm_id)
+        if feature is not None:
+            joined.append((rank, feature))
+    return joined
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="candidate counts")
+    parser.add_argument("--sample", type=int, default=200, help="legacy sample size when estimating")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{'Candidates':>11} {'Features':>10} {'Legacy (s)':>14} {'Index (s)':>10} {'Speedup':>10}")
+    print("-" * 60)
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        features = make_features(size * FEATURES_PER_CANDIDATE)
+        ids = [f["properties"]["osm_id"] for f in features]
+        candidates = rng.sample(ids, size)
+
+        start = time.perf_counter()
+        joined = index_join(features, candidates)
+        index_seconds = time.perf_counter() - start
+
+        # Worst case for the scan is ~features comparisons per candidate
+        if size * len(features) <= MAX_LEGACY_COMPARISONS:
+            start = time.perf_counter()
+            legacy = legacy_join(features, candidates)
+            legacy_seconds = time.perf_counter() - start
+            assert legacy == joined, "index join disagrees with the legacy scan"
+            legacy_label = f"{legacy_seconds:.3f}"
+        else:
+            sample = candidates[: args.sample]
+            start = time.perf_counter()
+            legacy = legacy_join(features, sample)
+            # list.index over the sample only; the full list would add more
+            legacy_seconds = (time.perf_counter() - start) * size / len(sample)
+            assert [f for _, f in legacy] == [f for _, f in joined[: len(sample)]]
+            legacy_label = f"{legacy_seconds:.1f} est."
+
+        print(
+            f"{size:>11,} {len(features):>10,} {legacy_label:>14} {index_seconds:>10.3f} "
+            f"{legacy_seconds / index_seconds:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
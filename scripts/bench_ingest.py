@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Ingest scaling benchmark
+Generates synthetic KMLs (generate_synthetic_kml.py) at several sizes and
+times each reader path on them in a fresh subprocess, recording wall time,
+placemarks/sec, MB/sec and peak RSS (per worker as well for the sharded
+path). Results go to a JSON report tagged with the git commit so runs can
+be compared across commits.
+
+Reader paths:
+  iterparse       PlacemarkReader, tags + raw coordinate text only
+  batches         PlacemarkReader.iter_batches (bulk coordinate parsing)
+  ingest          analyze_trails.ingest_batches, serial
+  ingest-sharded  analyze_trails.ingest_kml_sharded over --workers processes
+  trail-store     trail_store.TrailStore.build
+
+Usage:
+  python scripts/bench_ingest.py [--sizes 10000,100000,1000000]
+                                 [--paths ingest,ingest-sharded] [--workers N]
+                                 [--report PATH] [--compare OLD_REPORT.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from generate_synthetic_kml import generate
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+PATHS = ("iterparse", "batches", "ingest", "ingest-sharded", "trail-store")
+DEFAULT_WORK_DIR = Path("data/cache/bench")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_path(path: str, kml_path: str, workers: int) -> int:
+    """Run one reader path to completion; returns placemarks read"""
+    from analyze_trails import ingest_batches, ingest_kml_sharded
+    from kml_reader import PlacemarkReader
+    from trail_store import TrailStore
+
+    if path == "iterparse":
+        reader = PlacemarkReader(kml_path)
+        for _ in reader:
+            pass
+        return reader.count
+    if path == "batches":
+        reader = PlacemarkReader(kml_path)
+        for _ in reader.iter_batches():
+            pass
+        return reader.count
+    if path == "ingest":
+        return ingest_batches(PlacemarkReader(kml_path).iter_batches(), progress=False).stats.total_trails
+    if path == "ingest-sharded":
+        return ingest_kml_sharded(kml_path, workers).stats.total_trails
+    if path == "trail-store":
+        return len(TrailStore.build(kml_path))
+    raise ValueError(f"unknown reader path {path!r}")
+
+
+def peak_rss_kb() -> int:
+    """
+    High-water RSS of this process.
+
+    VmHWM is reset by exec; ru_maxrss is not, so it would include the
+    parent's footprint at fork time.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def child(path: str, kml_path: str, workers: int) -> None:
+    # Keep the reader's own progress lines out of the JSON on stdout
+    real_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    start = time.perf_counter()
+    placemarks = run_path(path, kml_path, workers)
+    elapsed = time.perf_counter() - start
+    sys.stdout = real_stdout
+    result = {"placemarks": placemarks, "seconds": elapsed, "peak_rss_kb": peak_rss_kb()}
+    if path == "ingest-sharded":
+        result["worker_peak_rss_kb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps(result))
+
+
+def measure(path: str, kml_path: Path, workers: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", path, str(kml_path), str(workers)],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ).stdout
+    raw = json.loads(out.strip().splitlines()[-1])
+    size_mb = kml_path.stat().st_size / 2**20
+    seconds = raw["seconds"]
+    return {
+        "path": path,
+        "workers": workers if path == "ingest-sharded" else 1,
+        "placemarks": raw["placemarks"],
+        "file_mb": round(size_mb, 2),
+        "seconds": round(seconds, 3),
+        "placemarks_per_sec": round(raw["placemarks"] / seconds, 1) if seconds > 0 else None,
+        "mb_per_sec": round(size_mb / seconds, 2) if seconds > 0 else None,
+        "peak_rss_mb": round(raw["peak_rss_kb"] / 1024, 1),
+        "worker_peak_rss_mb": (
+            round(raw["worker_peak_rss_kb"] / 1024, 1) if "worker_peak_rss_kb" in raw else None
+        ),
+    }
+
+
+def synthetic_kml(size: int, seed: int, work_dir: Path) -> Path:
+    path = work_dir / f"synthetic_{size}_seed{seed}.kml"
+    if not path.exists():
+        print(f"Generating {path} ({size:,} placemarks)...")
+        start = time.perf_counter()
+        generate(path, size, seed)
+        print(f"  {path.stat().st_size / 2**20:,.1f} MB in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def print_table(results, previous=None) -> None:
+    before = {(r["placemarks"], r["path"]): r for r in (previous or [])}
+    print()
+    header = f"{'Placemarks':>11} {'Path':<15} {'Seconds':>9} {'Placemarks/s':>13} {'MB/s':>8} {'Peak RSS MB':>12}"
+    if previous is not None:
+        header += f" {'vs old':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        line = (
+            f"{r['placemarks']:>11,} {r['path']:<15} {r['seconds']:>9.2f} "
+            f"{r['placemarks_per_sec'] or 0:>13,.0f} {r['mb_per_sec'] or 0:>8.1f} "
+            f"{r['peak_rss_mb']:>12.1f}"
+        )
+        if previous is not None:
+            old = before.get((r["placemarks"], r["path"]))
+            line += f" {old['seconds'] / r['seconds']:>7.2f}x" if old and r["seconds"] else f" {'-':>8}"
+        print(line)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="comma-separated placemark counts",
+    )
+    parser.add_argument("--paths", default=",".join(PATHS), help="comma-separated reader paths")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", type=Path, default=DEFAULT_WORK_DIR)
+    parser.add_argument("--report", type=Path, help="JSON report path (default: work dir, by commit)")
+    parser.add_argument("--compare", type=Path, help="earlier report to compare wall times against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    paths = [p for p in args.paths.split(",") if p]
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown reader paths: {', '.join(sorted(unknown))}")
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+
+    commit = git_commit()
+    results = []
+    for size in sizes:
+        kml_path = synthetic_kml(size, args.seed, args.work_dir)
+        for path in paths:
+            print(f"Running {path} on {size:,} placemarks...")
+            results.append(measure(path, kml_path, args.workers))
+
+    report = {
+        "benchmark": "ingest",
+        "git_commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "results": results,
+    }
+    report_path = args.report or args.work_dir / f"ingest_report_{commit}.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_table(results, previous)
+    print(f"\nReport written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: OSM tag extraction from KML descriptions
+Compares the legacy per-placemark regex parser against osm_tags.parse_osm_tags
+(all tags, and a key subset) on the descriptions of a real KML file.
+
+Usage: python scripts/bench_osm_tags.py [trails.kml] [--repeat N]
+"""
+
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from kml_reader import DESCRIPTION_TAG, PLACEMARK_TAG
+from osm_tags import parse_osm_tags
+
+SUBSET_KEYS = ("OSM ID", "access", "surface")
+
+
+def legacy_parse_description(description):
+    """The regex parser previously copied into three scripts"""
+    tags = {}
+    if not description:
+        return tags
+
+    cdata_match = re.search(r"<!\[CDATA\[(.*?)\]\]>", description, re.DOTALL)
+    if not cdata_match:
+        return tags
+
+    content = cdata_match.group(1)
+    tag_pattern = r"<b>(.*?):</b>\s*(.*?)(?:<br/>|$)"
+    matches = re.findall(tag_pattern, content)
+
+    for key, value in matches:
+        tags[key.strip()] = value.strip()
+
+    return tags
+
+
+def load_descriptions(kml_path):
+    descriptions = []
+    for _, elem in ET.iterparse(kml_path):
+        if elem.tag == DESCRIPTION_TAG:
+            descriptions.append(elem.text)
+        elif elem.tag == PLACEMARK_TAG:
+            elem.clear()
+    return descriptions
+
+
+def time_parser(parse, descriptions, repeat):
+    """Best-of-N wall time for one pass over all descriptions"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for description in descriptions:
+            parse(description)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 5
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i : i + 2]
+    kml_path = args[0] if args else "trails.kml"
+
+    print(f"Loading descriptions from {kml_path}...")
+    descriptions = load_descriptions(kml_path)
+    print(f"  {len(descriptions):,} descriptions")
+
+    # Correctness: the scanner must agree with the regex on every placemark
+    mismatches = sum(
+        1 for d in descriptions if parse_osm_tags(d) != legacy_parse_description(d)
+    )
+    subset_mismatches = sum(
+        1
+        for d in descriptions
+        if parse_osm_tags(d, SUBSET_KEYS)
+        != {k: v for k, v in legacy_parse_description(d).items() if k in SUBSET_KEYS}
+    )
+    print(f"  Mismatches vs legacy: {mismatches} (all tags), {subset_mismatches} (subset)")
+
+    results = [
+        ("legacy regex", time_parser(legacy_parse_description, descriptions, repeat)),
+        ("parse_osm_tags", time_parser(parse_osm_tags, descriptions, repeat)),
+        (
+            f"parse_osm_tags keys={list(SUBSET_KEYS)}",
+            time_parser(lambda d: parse_osm_tags(d, SUBSET_KEYS), descriptions, repeat),
+        ),
+    ]
+
+    baseline = results[0][1]
+    print()
+    print(f"{'Parser':<55} {'Total (ms)':>11} {'us/placemark':>13} {'Speedup':>8}")
+    print("-" * 90)
+    for label, seconds in results:
+        per_item = seconds / max(len(descriptions), 1) * 1e6
+        print(
+            f"{label:<55} {seconds * 1000:>11.1f} {per_item:>13.2f} "
+            f"{baseline / seconds:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: scoring synthetic trails, per feature vs columnar
+Compares the per-feature reference scorer of filter_and_score_trails.py
+(score_trail + apply_hard_constraints, with their hard-coded weights and
+thresholds) against score_columns over the whole trail table with the
+default scoring_rules.json, and checks that every trail gets the same
+TrailScore and hard-constraint result, with drive times within
+DRIVE_TIME_ULPS of the reference's and everything else identical.
+
+Trails sample rows of data/trails_summary.csv (as generate_synthetic_kml.py
+does) with random-walk geometry, built a chunk at a time so the features
+for 1M trails never exist at once. The per-feature scorer finds each
+trail's center itself, so the reported speedup counts the columnar
+centers (vertex_means) too; the speedup of scoring alone, as when
+trail_store has the centers cached, is reported after it.
+
+Usage: python scripts/bench_scoring.py [--trails 1000000] [--chunk 20000] [--seed 0]
+"""
+
+import argparse
+import dataclasses
+import time
+
+import numpy as np
+import pandas as pd
+
+from filter_and_score_trails import (
+    DRIVE_TIME_ULPS,
+    apply_hard_constraints,
+    drive_times_match,
+    score_columns,
+    score_trail,
+    trail_scores,
+)
+from generate_synthetic_kml import DEFAULT_PROFILE_CSV, FIRST_OSM_ID, random_walks
+from trail_geometry import vertex_means
+
+STRING_COLUMNS = ["name", "county", "surface", "difficulty", "highway_type", "ref"]
+
+
+def synthetic_chunks(profile: pd.DataFrame, trails: int, chunk: int, seed: int):
+    """(first row, profile rows, vertices, offsets) per chunk of trails"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, trails, chunk):
+        picks = rng.integers(0, len(profile), min(chunk, trails - start))
+        counts = np.maximum(profile["num_coordinates"].to_numpy()[picks], 2)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        yield start, picks, random_walks(rng, counts), offsets
+
+
+def make_features(profile: pd.DataFrame, start: int, picks: np.ndarray, vertices, offsets):
+    rows = profile.iloc[picks].to_dict("records")
+    bounds = offsets.tolist()
+    return [
+        {
+            "type": "Feature",
+            "properties": {
+                "name": row["name"],
+                "osm_id": str(FIRST_OSM_ID + start + j),
+                "county": row["county"],
+                "distance_miles": row["distance_miles"],
+                "highway_type": row["highway_type"],
+                "surface": row["surface"],
+                "difficulty": row["difficulty"],
+                "ref": row["ref"],
+            },
+            "geometry": {
+                "type": "LineString",
+                "coordinates": vertices[bounds[j] : bounds[j + 1]].tolist(),
+            },
+        }
+        for j, row in enumerate(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--trails", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=20_000, help="trails per feature chunk")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", default=DEFAULT_PROFILE_CSV, help="trails_summary.csv to sample")
+    args = parser.parse_args()
+
+    profile = pd.read_csv(args.profile, keep_default_na=False)
+    codes = {col: pd.factorize(profile[col]) for col in STRING_COLUMNS}
+
+    # Per-feature baseline, chunk by chunk; the table columns are collected
+    # alongside (centers via vertex_means, timed separately)
+    print(f"Scoring {args.trails:,} synthetic trails one feature at a time...")
+    baseline_seconds = center_seconds = 0.0
+    all_picks, centers, expected = [], [], []
+    for start, picks, vertices, offsets in synthetic_chunks(profile, args.trails, args.chunk, args.seed):
+        features = make_features(profile, start, picks, vertices, offsets)
+        begin = time.perf_counter()
+        scored = [score_trail(feature) for feature in features]
+        passes = [apply_hard_constraints(trail) for trail in scored]
+        baseline_seconds += time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        centers.append(vertex_means(vertices, offsets))
+        center_seconds += time.perf_counter() - begin
+        all_picks.append(picks)
+        expected.append((scored, passes))
+        del features
+    picks = np.concatenate(all_picks)
+    centers = np.concatenate(centers)
+
+    table = pd.DataFrame(
+        {
+            col: pd.Categorical.from_codes(col_codes[picks], categories=uniques)
+            for col, (col_codes, uniques) in codes.items()
+        }
+    )
+    table["osm_id"] = [str(FIRST_OSM_ID + i) for i in range(len(picks))]
+    table["distance_miles"] = profile["distance_miles"].to_numpy(dtype=np.float64)[picks]
+    table["latitude"] = centers[:, 1]
+    table["longitude"] = centers[:, 0]
+
+    print("Scoring the same trails as columns...")
+    begin = time.perf_counter()
+    scores = score_columns(table)
+    engine_seconds = time.perf_counter() - begin
+
+    print("Checking every TrailScore and hard-constraint result...")
+    passes = scores["passes"].tolist()
+    start = 0
+    inexact = 0
+    for scored, baseline_passes in expected:
+        rows = range(start, start + len(scored))
+        trails = trail_scores(table, scores, rows)
+        times = [trail.drive_time_minutes for trail in trails]
+        reference_times = [trail.drive_time_minutes for trail in scored]
+        assert drive_times_match(times, reference_times).all(), (
+            f"drive time more than {DRIVE_TIME_ULPS} ulps off in rows {rows}"
+        )
+        inexact += sum(a != b for a, b in zip(times, reference_times))
+        trails = [
+            dataclasses.replace(trail, drive_time_minutes=reference.drive_time_minutes)
+            for trail, reference in zip(trails, scored)
+        ]
+        assert trails == scored, f"TrailScore differs in rows {rows}"
+        assert passes[start : rows.stop] == baseline_passes, f"hard constraints differ in rows {rows}"
+        start = rows.stop
+
+    n = len(table)
+    columns_seconds = center_seconds + engine_seconds
+    print(
+        f"\n{'Trails':>10} {'Per feature (s)':>16} {'Centers (s)':>12} "
+        f"{'Scoring (s)':>12} {'Speedup':>9}"
+    )
+    print("-" * 64)
+    print(
+        f"{n:>10,} {baseline_seconds:>16.2f} {center_seconds:>12.3f} "
+        f"{engine_seconds:>12.3f} {baseline_seconds / columns_seconds:>8.0f}x"
+    )
+    print(
+        f"\n{baseline_seconds / n * 1e6:.2f} us/trail per feature, "
+        f"{columns_seconds / n * 1e9:.0f} ns/trail as columns with centers; "
+        f"{int(scores['passes'].sum()):,} trails pass, all {n:,} match "
+        f"({inexact:,} drive times differ by at most {DRIVE_TIME_ULPS} ulps)"
+    )
+    print(
+        f"Scoring alone, with centers cached (trail_store): "
+        f"{baseline_seconds / engine_seconds:.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
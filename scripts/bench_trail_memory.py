@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark: per-trail dicts vs the compact TrailTable
+Builds the in-memory trail representation analyze_trails.py used to keep
+(a record dict with all_tags plus a GeoJSON feature dict repeating the tags,
+coordinates as nested lists) and the TrailTable it keeps now, each in a
+fresh subprocess, and reports peak RSS, the heap the result retains
+(tracemalloc, in a second subprocess) and build time.
+
+Usage: python scripts/bench_trail_memory.py [trails.kml]
+"""
+
+import gc
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from analyze_trails import ingest_batches
+from kml_reader import PlacemarkReader
+from trail_geometry import trail_lengths_miles
+from trail_records import describe_trail
+
+MODES = ("legacy dicts", "TrailTable")
+
+
+def current_rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() // 1024
+
+
+def build_legacy(kml_path):
+    """The trails/features lists analyze_trails.main used to hold"""
+    trails, features = [], []
+    for batch in PlacemarkReader(kml_path).iter_batches():
+        lengths = trail_lengths_miles(batch.vertices, batch.offsets).tolist()
+        flat = batch.vertices.tolist()
+        bounds = batch.offsets.tolist()
+        for j in range(len(batch)):
+            start, end = bounds[j], bounds[j + 1]
+            if not batch.has_linestring[j] or start == end:
+                continue
+            name = batch.names[j] if batch.names[j] is not None else f"Trail {batch.indices[j]}"
+            tags = batch.tags[j]
+            summary = describe_trail(name, tags, end - start, lengths[j])
+            distance = round(summary["distance_miles"], 3)
+            trails.append({**summary, "distance_miles": distance, "all_tags": tags})
+            props = {k: v for k, v in summary.items() if k != "num_coordinates"}
+            props["distance_miles"] = distance
+            features.append(
+                {
+                    "type": "Feature",
+                    "properties": {**props, **tags},
+                    "geometry": {"type": "LineString", "coordinates": flat[start:end]},
+                }
+            )
+    return trails, features
+
+
+def build_table(kml_path):
+    return ingest_batches(PlacemarkReader(kml_path).iter_batches(), progress=False).table
+
+
+def run_child(mode: str, kml_path: str, traced: bool) -> None:
+    builder = build_legacy if mode == MODES[0] else build_table
+    if traced:
+        # Heap still referenced by the result once parsing garbage is gone
+        tracemalloc.start()
+        kept = builder(kml_path)
+        gc.collect()
+        print(json.dumps({"retained_bytes": tracemalloc.get_traced_memory()[0]}))
+        return
+
+    rss_before = current_rss_kb()
+    start = time.perf_counter()
+    kept = builder(kml_path)
+    elapsed = time.perf_counter() - start
+    result = {
+        "seconds": elapsed,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "baseline_rss_kb": rss_before,
+    }
+    del kept
+    print(json.dumps(result))
+
+
+def child(mode: str, kml_path: str, traced: bool = False) -> dict:
+    cmd = [sys.executable, __file__, "--child", mode, kml_path]
+    if traced:
+        cmd.append("--traced")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 3 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3], traced="--traced" in sys.argv)
+        return
+
+    kml_path = sys.argv[1] if len(sys.argv) > 1 else "trails.kml"
+    print(f"Building trail representations from {kml_path} (fresh subprocesses)...")
+
+    results = []
+    for mode in MODES:
+        r = child(mode, kml_path)
+        r.update(child(mode, kml_path, traced=True))
+        results.append((mode, r))
+
+    legacy = results[0][1]
+    print()
+    print(
+        f"{'Representation':<16} {'Peak RSS (MB)':>14} {'Retained (MB)':>14} "
+        f"{'Build (s)':>10} {'Peak RSS':>9} {'Retained':>9}"
+    )
+    print("-" * 78)
+    for mode, r in results:
+        peak_ratio = (legacy["peak_rss_kb"] - legacy["baseline_rss_kb"]) / max(
+            r["peak_rss_kb"] - r["baseline_rss_kb"], 1
+        )
+        retained_ratio = legacy["retained_bytes"] / max(r["retained_bytes"], 1)
+        print(
+            f"{mode:<16} {r['peak_rss_kb'] / 1024:>14.1f} {r['retained_bytes'] / 2**20:>14.1f} "
+            f"{r['seconds']:>10.2f} {peak_ratio:>8.1f}x {retained_ratio:>8.1f}x"
+        )
+    print(
+        f"\n(Ratios vs legacy; peak RSS ratio excludes the "
+        f"{legacy['baseline_rss_kb'] / 1024:.1f} MB interpreter + imports baseline)"
+    )
+
+
+if __name__ == "__main__":
+    main()
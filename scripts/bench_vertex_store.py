@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: fetching a few trails' geometry
+Compares what create_treasure_map.py used to do to get a trail's
+coordinates (load every feature, index them by OSM ID, look up) against
+opening the memory-mapped vertex_store and looking up the same IDs. Also
+checks that pool workers handed the store read the same vertices from
+the shared mapping. Run from the repo root on the real trail data.
+
+Usage: python scripts/bench_vertex_store.py [--lookups 20,1000] [--workers 2]
+"""
+
+import argparse
+import random
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from feature_index import FeatureIndex
+from trail_store import iter_trail_features
+from vertex_store import open_vertex_store
+
+
+def vertex_sum(args):
+    store, osm_id = args
+    return float(store.by_osm_id(osm_id).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lookups", default="20,1000", help="lookup counts")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # Build (or refresh) the store outside the timings
+    store = open_vertex_store()
+    ids = [int(i) for i in store.arrays["osm_ids"].tolist()]
+
+    print(f"{'Lookups':>8} {'Load all (s)':>13} {'Store (s)':>10} {'Per lookup (us)':>16} {'Speedup':>9}")
+    print("-" * 62)
+    for count in (int(c) for c in args.lookups.split(",") if c):
+        sample = [str(i) for i in rng.choices(ids, k=count)]
+
+        start = time.perf_counter()
+        index = FeatureIndex(iter_trail_features())
+        legacy = [index.get(osm_id)["geometry"]["coordinates"] for osm_id in sample]
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mapped = open_vertex_store()
+        open_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        fetched = [mapped.by_osm_id(osm_id) for osm_id in sample]
+        lookup_seconds = time.perf_counter() - start
+        store_seconds = open_seconds + lookup_seconds
+
+        assert all(v.tolist() == c for v, c in zip(fetched, legacy)), "store disagrees"
+        print(
+            f"{count:>8,} {legacy_seconds:>13.3f} {store_seconds:>10.4f} "
+            f"{lookup_seconds / count * 1e6:>16.1f} {legacy_seconds / store_seconds:>8.0f}x"
+        )
+
+    if args.workers > 1:
+        sample = [str(i) for i in rng.choices(ids, k=200)]
+        with Pool(args.workers) as pool:
+            sums = pool.map(vertex_sum, [(store, osm_id) for osm_id in sample])
+        expected = [float(store.by_osm_id(osm_id).sum()) for osm_id in sample]
+        assert np.array_equal(sums, expected), "worker reads disagree"
+        print(f"\n{args.workers} workers read {len(sample)} trails from the shared mapping: OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+One-pass export of ranked candidates
+The top-N trail lists used to be written by separate code paths, one per
+format, each walking (and sometimes re-reading) the trail data again.
+CandidateExporter takes the ranked result set once and writes every
+requested format (CSV, GeoJSON, KML, trail columns) as it walks it,
+serializing each trail's geometry a single time for all of them.
+"""
+
+import csv
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from geojson_io import FeatureCollectionWriter, round_coordinates
+from kml_writer import KmlWriter, coordinates_text
+from trail_columns import TrailColumnsWriter
+
+
+@dataclass
+class Candidate:
+    """
+    One ranked trail.
+
+    ``row`` is its CSV row (in the exporter's ``csv_header`` order).
+    ``properties`` and ``coordinates`` make the GeoJSON/KML/columns
+    feature; with either missing the trail goes to the CSV only.
+    ``kml_tags`` is the KML description table (default: properties).
+    """
+
+    name: Optional[str]
+    properties: Optional[Dict[str, Any]] = None
+    coordinates: Any = None
+    row: Optional[Sequence[Any]] = None
+    kml_tags: Optional[Dict[str, Any]] = None
+
+
+class CandidateExporter:
+    """
+    Write ranked candidates to any mix of formats in one pass.
+
+        with CandidateExporter(csv_path="data/top.csv", csv_header=HEADER,
+                               geojson_path="data/top.geojson") as out:
+            out.write_all(candidates)
+
+    GeoJSON output matches geojson_io.write_feature_collection for the
+    same features; ``precision`` rounds coordinates for every format.
+    """
+
+    def __init__(
+        self,
+        csv_path=None,
+        csv_header: Optional[List[str]] = None,
+        geojson_path=None,
+        kml_path=None,
+        columns_path=None,
+        indent: Optional[int] = 2,
+        precision: Optional[int] = None,
+    ):
+        self.csv_path = csv_path
+        self.csv_header = csv_header
+        self.geojson_path = geojson_path
+        self.kml_path = kml_path
+        self.columns_path = columns_path
+        self.indent = indent
+        self.precision = precision
+        self.count = 0
+        self.geometry_count = 0
+        self._stack: Optional[ExitStack] = None
+        self._csv = None
+        self._geojson = None
+        self._kml = None
+        self._columns = None
+
+    def __enter__(self) -> "CandidateExporter":
+        stack = ExitStack()
+        if self.csv_path:
+            f = stack.enter_context(open(self.csv_path, "w", newline=""))
+            self._csv = csv.writer(f)
+            if self.csv_header:
+                self._csv.writerow(self.csv_header)
+        if self.geojson_path:
+            self._geojson = stack.enter_context(
+                FeatureCollectionWriter(self.geojson_path, indent=self.indent)
+            )
+        if self.kml_path:
+            self._kml = stack.enter_context(KmlWriter(self.kml_path))
+        if self.columns_path:
+            self._columns = stack.enter_context(
+                TrailColumnsWriter(self.columns_path, **self._columns_options())
+            )
+        self._stack = stack
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stack.__exit__(*exc)
+
+    def _columns_options(self) -> Dict[str, Any]:
+        return {} if self.precision is None else {"precision": self.precision}
+
+    def write(self, candidate: Candidate) -> None:
+        self.count += 1
+        if self._csv is not None and candidate.row is not None:
+            self._csv.writerow(candidate.row)
+        if candidate.properties is None or candidate.coordinates is None:
+            return
+
+        # Serialize the geometry once for every format
+        coordinates = candidate.coordinates
+        if isinstance(coordinates, np.ndarray):
+            vertices = coordinates
+            if self.precision is not None:
+                vertices = np.round(vertices, self.precision)
+            coordinates = vertices.tolist()
+        else:
+            if self.precision is not None:
+                coordinates = round_coordinates(coordinates, self.precision)
+            vertices = None
+
+        if self._geojson is not None:
+            self._geojson.write(
+                {
+                    "type": "Feature",
+                    "properties": candidate.properties,
+                    "geometry": {"type": "LineString", "coordinates": coordinates},
+                }
+            )
+        if self._kml is not None:
+            tags = candidate.kml_tags if candidate.kml_tags is not None else candidate.properties
+            self._kml.write(candidate.name, tags, coordinates_text(coordinates))
+        if self._columns is not None:
+            self._columns.add(
+                candidate.properties, vertices if vertices is not None else np.asarray(coordinates)
+            )
+        self.geometry_count += 1
+
+    def write_all(self, candidates: Iterable[Candidate]) -> int:
+        for candidate in candidates:
+            self.write(candidate)
+        return self.count
@@ -3,13 +3,39 @@
 Create interactive map with all treasure hunt data layers
 """
 
-import json
+import sys
+
+import numpy as np
 import pandas as pd
 import folium
 from folium import plugins
 
-def create_treasure_map():
-    """Create comprehensive interactive map"""
+from output_cache import StagedOutputs
+from trail_geometry import simplify_lines
+from trail_store import trail_source
+from vertex_store import open_vertex_store
+
+# Polylines drop vertices closer than this to the line (invisible at map zooms)
+MAP_SIMPLIFY_METERS = 2.0
+
+def create_treasure_map(force=False):
+    """Create comprehensive interactive map, unless its inputs are unchanged"""
+    output_file = 'treasure_map.html'
+    # Folium gives every element a random ID, so the HTML differs on each
+    # save; only the input fingerprint can tell that a rebuild is unneeded
+    inputs = ['data/final_top_20.csv', trail_source()]
+    with StagedOutputs('treasure_map', inputs, force=force, code=[__file__]) as outputs:
+        if outputs.unchanged():
+            print(f"Inputs unchanged since the last run; keeping {output_file}")
+        else:
+            build_treasure_map().save(outputs.path(output_file))
+            print(f"Map saved to: {output_file}")
+    outputs.report()
+
+    return output_file
+
+def build_treasure_map():
+    """Build the folium map with every data layer"""
     print("Creating treasure hunt interactive map...")
 
     # Center on Day 8 search area
@@ -60,31 +86,18 @@ def create_treasure_map():
         print("Warning: final_top_20.csv not found, skipping candidates")
         top_candidates = None
 
-    # Load GeoJSON trail data to get coordinates
-    with open('data/trails.geojson') as f:
-        trail_geojson = json.load(f)
-
-    # Create a mapping of OSM IDs to trail features
-    trail_map = {}
-    for feature in trail_geojson['features']:
-        osm_id = feature['properties'].get('id', '')
-        trail_map[osm_id] = feature
+    # Memory-mapped trail geometry: each candidate's coordinates are read
+    # by OSM ID without loading the other trails
+    trail_vertices = open_vertex_store()
 
     # Add top 20 candidates as markers
     if top_candidates is not None:
         for i, row in top_candidates.head(20).iterrows():
-            osm_id = row['osm_id']
-            if osm_id in trail_map:
-                trail_feature = trail_map[osm_id]
-                coords = trail_feature['geometry']['coordinates']
-
+            coords = trail_vertices.by_osm_id(row['osm_id'])
+            if coords is not None:
                 # Get midpoint of trail for marker
                 if len(coords) > 0:
-                    if len(coords) == 1:
-                        mid_lat, mid_lon = coords[0][1], coords[0][0]
-                    else:
-                        mid_idx = len(coords) // 2
-                        mid_lon, mid_lat = coords[mid_idx]
+                    mid_lon, mid_lat = coords[len(coords) // 2].tolist()
 
                     # Color code by rank
                     if i < 3:
@@ -118,7 +131,10 @@ def create_treasure_map():
                     ).add_to(m)
 
                     # Add the trail polyline
-                    trail_coords = [[coord[1], coord[0]] for coord in coords]
+                    vertices, _ = simplify_lines(
+                        coords, np.array([0, len(coords)]), MAP_SIMPLIFY_METERS
+                    )
+                    trail_coords = vertices[:, ::-1].tolist()
                     folium.PolyLine(
                         trail_coords,
                         color=icon_color,
@@ -148,12 +164,7 @@ def create_treasure_map():
     # Add fullscreen button
     plugins.Fullscreen().add_to(m)
 
-    # Save map
-    output_file = 'treasure_map.html'
-    m.save(output_file)
-    print(f"Map saved to: {output_file}")
-
-    return output_file
+    return m
 
 if __name__ == '__main__':
-    create_treasure_map()
+    create_treasure_map(force='--force' in sys.argv)
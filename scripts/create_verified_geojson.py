@@ -1,128 +1,189 @@
 #!/usr/bin/env python3
 """
 Create GeoJSON file for verified public trails by extracting coordinates from KML.
+Without the KML, geometry comes from analyze_trails.py --columnar output.
 """
 
-import json
-import re
-import xml.etree.ElementTree as ET
+import argparse
+from contextlib import closing
 from pathlib import Path
 
 import pandas as pd
 
+from candidate_export import Candidate, CandidateExporter
+from feature_index import row_index
+from kml_reader import PlacemarkReader
+from osm_tags import parse_osm_tags
+from trail_columns import TrailColumns
+from trail_geometry import coordinate_lists, parse_coordinate_texts
 
-def parse_kml_description(description):
-    """Parse CDATA description field to extract OSM tags."""
-    tags = {}
-    cdata_match = re.search(r"<!\[CDATA\[(.*?)\]\]>", description, re.DOTALL)
-    if not cdata_match:
-        return tags
+# OSM tags this script copies into the verified GeoJSON
+VERIFIED_TAG_KEYS = ("OSM ID", "foot", "bicycle", "horse")
 
-    cdata_content = cdata_match.group(1)
-    tag_pattern = r"<b>(.*?):</b>\s*(.*?)(?:<br/>|$)"
-    matches = re.findall(tag_pattern, cdata_content)
 
-    for key, value in matches:
-        tags[key.strip()] = value.strip()
-
-    return tags
+def parse_kml_description(description):
+    """Parse CDATA description field to extract OSM tags."""
+    return parse_osm_tags(description)
 
 
 def parse_coordinates(coord_string):
     """Parse KML coordinate string into list of [lon, lat] pairs."""
-    if not coord_string:
-        return []
-
-    coords = []
-    points = coord_string.strip().split()
-    for point in points:
-        parts = point.split(",")
-        if len(parts) >= 2:
-            lon, lat = float(parts[0]), float(parts[1])
-            coords.append([lon, lat])
-    return coords
+    vertices, offsets = parse_coordinate_texts([coord_string])
+    return coordinate_lists(vertices, offsets)[0]
+
+
+def verified_feature(trail_info, osm_id, tags, coordinates):
+    """GeoJSON feature for one verified trail"""
+    return {
+        "type": "Feature",
+        "properties": {
+            "trail_name": trail_info["trail_name"],
+            "osm_id": osm_id,
+            "rank": int(trail_info["new_rank"]),
+            "total_score": int(trail_info["total_score"]),
+            "distance_miles": float(trail_info["distance_miles"]),
+            "surface": trail_info["surface"],
+            "difficulty": trail_info["difficulty"],
+            "highway_type": trail_info["highway_type"],
+            "county": trail_info["county"],
+            "ref": trail_info["ref"] if pd.notna(trail_info["ref"]) else None,
+            "access_category": trail_info["access_category"],
+            "foot": tags.get("foot", ""),
+            "bicycle": tags.get("bicycle", ""),
+            "horse": tags.get("horse", ""),
+        },
+        "geometry": {"type": "LineString", "coordinates": coordinates},
+    }
+
+
+def write_verified(features, output_path, columns_path=None, kml_path=None):
+    """Write the verified GeoJSON, plus .tcol and KML copies if asked, in one pass"""
+    with CandidateExporter(
+        geojson_path=output_path, kml_path=kml_path, columns_path=columns_path
+    ) as out:
+        for feature in features:
+            props = feature["properties"]
+            name = f"#{props['rank']} - {props['trail_name']} (Score: {props['total_score']})"
+            out.write(Candidate(name, props, feature["geometry"]["coordinates"]))
+
+
+def load_verified(verified_csv_path):
+    """Verified rows as records plus an osm_id -> record position index"""
+    verified_df = pd.read_csv(verified_csv_path)
+    return verified_df.to_dict("records"), row_index(verified_df["osm_id"])
 
 
-def create_geojson_from_kml(kml_path, verified_csv_path, output_path):
+def create_geojson_from_kml(
+    kml_path, verified_csv_path, output_path, columns_path=None, priority_kml_path=None
+):
     """Create GeoJSON from KML for verified trails."""
     # Load verified trails
-    verified_df = pd.read_csv(verified_csv_path)
-    verified_osm_ids = set(verified_df["osm_id"].astype(str))
+    verified_records, verified_rows = load_verified(verified_csv_path)
+    pending = set(verified_rows)
 
-    # Parse KML
-    tree = ET.parse(kml_path)
-    root = tree.getroot()
-    ns = {"kml": "http://www.opengis.net/kml/2.2"}
+    # Stream KML placemarks
+    reader = PlacemarkReader(kml_path, tag_keys=VERIFIED_TAG_KEYS)
 
     features = []
 
-    for placemark in root.findall(".//kml:Placemark", ns):
-        name_elem = placemark.find("kml:name", ns)
-        desc_elem = placemark.find("kml:description", ns)
-        linestring_elem = placemark.find(".//kml:LineString/kml:coordinates", ns)
+    with closing(iter(reader)) as placemarks:
+        for placemark in placemarks:
+            if placemark.name is None or not placemark.has_linestring:
+                continue
 
-        if name_elem is None or desc_elem is None or linestring_elem is None:
-            continue
+            # Parse tags
+            tags = placemark.tags
+            osm_id = tags.get("OSM ID", "")
 
-        # Parse tags
-        tags = parse_kml_description(desc_elem.text)
-        osm_id = tags.get("OSM ID", "")
+            # Only include verified trails
+            row = verified_rows.get(osm_id)
+            if row is None:
+                continue
 
-        # Only include verified trails
-        if osm_id not in verified_osm_ids:
-            continue
+            # Parse coordinates
+            coordinates = parse_coordinates(placemark.coordinates_text)
 
-        # Get trail info from verified df
-        trail_info = verified_df[verified_df["osm_id"].astype(str) == osm_id].iloc[0]
+            if not coordinates:
+                continue
 
-        # Parse coordinates
-        coordinates = parse_coordinates(linestring_elem.text)
+            features.append(verified_feature(verified_records[row], osm_id, tags, coordinates))
 
-        if not coordinates:
-            continue
-
-        # Create GeoJSON feature
-        feature = {
-            "type": "Feature",
-            "geometry": {"type": "LineString", "coordinates": coordinates},
-            "properties": {
-                "trail_name": trail_info["trail_name"],
-                "osm_id": osm_id,
-                "rank": int(trail_info["new_rank"]),
-                "total_score": int(trail_info["total_score"]),
-                "distance_miles": float(trail_info["distance_miles"]),
-                "surface": trail_info["surface"],
-                "difficulty": trail_info["difficulty"],
-                "highway_type": trail_info["highway_type"],
-                "county": trail_info["county"],
-                "ref": trail_info["ref"] if pd.notna(trail_info["ref"]) else None,
-                "access_category": trail_info["access_category"],
-                "foot": tags.get("foot", ""),
-                "bicycle": tags.get("bicycle", ""),
-                "horse": tags.get("horse", ""),
-            },
-        }
-
-        features.append(feature)
+            # Stop reading once every verified trail has been emitted
+            pending.discard(osm_id)
+            if not pending:
+                break
 
     # Create GeoJSON
     geojson = {"type": "FeatureCollection", "features": features}
 
     # Save
-    with open(output_path, "w") as f:
-        json.dump(geojson, f, indent=2)
+    write_verified(features, output_path, columns_path, priority_kml_path)
+
+    print(f"  {reader.report()}")
+    print(f"Created GeoJSON with {len(features)} trails")
+    return geojson
+
+
+def create_geojson_from_columns(
+    trails_path, verified_csv_path, output_path, columns_path=None, priority_kml_path=None
+):
+    """Create GeoJSON for verified trails from a trail columns (.tcol) file."""
+    verified_records, verified_rows = load_verified(verified_csv_path)
+
+    # Only the verified rows are decoded
+    trails = TrailColumns(trails_path)
+    rows = trails.rows_where("osm_id", verified_rows)
+
+    features = []
+    for row, trail in zip(rows.tolist(), trails.iter_features(rows)):
+        props = trail["properties"]
+        # Unnamed placemarks are skipped on the KML path too
+        if trail["geometry"] is None or trails.name_missing[row]:
+            continue
+        coordinates = trail["geometry"]["coordinates"]
+        if not coordinates:
+            continue
+        osm_id = props["osm_id"]
+        features.append(
+            verified_feature(verified_records[verified_rows[osm_id]], osm_id, props, coordinates)
+        )
 
+    geojson = {"type": "FeatureCollection", "features": features}
+    write_verified(features, output_path, columns_path, priority_kml_path)
+
+    print(f"  Read {len(rows)} of {len(trails):,} trails from {trails_path}")
     print(f"Created GeoJSON with {len(features)} trails")
     return geojson
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="also write data/top_20_verified.tcol (binary trail columns)",
+    )
+    parser.add_argument(
+        "--write-kml", action="store_true", help="also write data/top_20_priority.kml"
+    )
+    args = parser.parse_args()
+
     base_dir = Path(".")
     kml_path = base_dir / "trails.kml"
+    trails_path = base_dir / "data" / "trails.tcol"
     verified_csv = base_dir / "data" / "top_20_verified.csv"
     output_path = base_dir / "data" / "top_20_verified.geojson"
-
-    create_geojson_from_kml(kml_path, verified_csv, output_path)
+    columns_path = output_path.with_suffix(".tcol") if args.columnar else None
+    priority_kml_path = base_dir / "data" / "top_20_priority.kml" if args.write_kml else None
+
+    if kml_path.exists() or not trails_path.exists():
+        create_geojson_from_kml(
+            kml_path, verified_csv, output_path, columns_path, priority_kml_path
+        )
+    else:
+        create_geojson_from_columns(
+            trails_path, verified_csv, output_path, columns_path, priority_kml_path
+        )
     print(f"Saved GeoJSON to {output_path}")
 
 
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Ensemble of trail scoring models, with rank variance and disagreement
+The composite score of filter_and_score_trails.py and the recommendation
+score of generate_final_recommendations.py rank the same trails
+differently, and the only way to compare them was to run both scripts.
+This stage runs every registered scorer over one shared score table
+(load_score_table) in a single pass across a process pool, ranks the
+trails under each, and reports per trail its mean rank, the variance of
+its ranks and whether the scorers disagree about it. Every scorer reads
+the same trail attributes (the score table's, e.g. the feature names
+score_trail uses rather than trails_summary.csv's), so rank differences
+come from the models and not from their inputs.
+
+A scorer takes a slice of the score table and the rules file and returns
+one score per row and whether the row passes the hard constraints of the
+scorer's rule sets (RuleSet.check); register more with
+@register_scorer("name"). Workers get the table once, when the pool
+starts, and score (scorer, chunk) tasks. Scorers registered outside this
+module reach the workers only where the pool forks (Linux).
+
+Only trails passing every scorer's constraints are ranked (--all-trails
+ranks every trail): a trail one model eliminates has no rank to compare
+under it. Ranks are competition ranks over the ranked trails (1 + the
+number scoring strictly higher). A trail is flagged when it is in the top
+K under some scorers but not all, or when its best and worst rank are
+further apart than --gap of the ranked trail count.
+
+Usage: python scripts/ensemble_scoring.py [--workers 4] [--top 50] [--gap 0.25] [--all-trails]
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from filter_and_score_trails import RULE_SET, load_score_table, score_columns
+from scoring_rules import DEFAULT_RULES_PATH, RuleSet, load_rules
+
+RANKS_CSV = Path("data/ensemble_ranks.csv")
+REPORT_PATH = Path("data/ensemble_report.json")
+CHUNK = 1 << 15  # trails per task
+LISTED_TRAILS = 10
+
+Scorer = Callable[[pd.DataFrame, str], Tuple[np.ndarray, np.ndarray]]
+SCORERS: Dict[str, Scorer] = {}
+
+
+def register_scorer(name: str) -> Callable[[Scorer], Scorer]:
+    """Decorator adding a scorer(table, rules_path) -> (scores, passes) to the ensemble"""
+
+    def register(scorer: Scorer) -> Scorer:
+        SCORERS[name] = scorer
+        return scorer
+
+    return register
+
+
+@lru_cache(maxsize=None)
+def _rules(rules_path: str) -> Dict[str, RuleSet]:
+    return load_rules(rules_path)
+
+
+def _passes(table: pd.DataFrame, *rule_sets: RuleSet) -> np.ndarray:
+    """Rows passing every constraint of the given rule sets"""
+    passes = np.ones(len(table), dtype=bool)
+    for rule_set in rule_sets:
+        for column in rule_set.check(table).values():
+            passes &= column
+    return passes
+
+
+@register_scorer("composite")
+def composite_score(table: pd.DataFrame, rules_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """The 130-point composite score (filter_and_score_trails.py)"""
+    scores = score_columns(table, _rules(rules_path)[RULE_SET])
+    return scores["score"].to_numpy(), scores["passes"].to_numpy()
+
+
+@register_scorer("recommendation")
+def recommendation_score(table: pd.DataFrame, rules_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """The probability score plus camera boost (generate_final_recommendations.py)"""
+    rules = _rules(rules_path)
+    _, total = rules["recommendation"].score(table, len(table))
+    _, boost = rules["camera_boost"].score(table, len(table))
+    return total + boost, _passes(table, rules["recommendation"], rules["camera_boost"])
+
+
+# Worker state: the shared score table, set once per worker by the pool
+_table: Optional[pd.DataFrame] = None
+
+
+def _init_worker(table: pd.DataFrame) -> None:
+    global _table
+    _table = table
+
+
+def _score_chunk(name: str, start: int, stop: int, rules_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    return SCORERS[name](_table.iloc[start:stop], rules_path)
+
+
+def run_scorers(
+    table: pd.DataFrame, names: Sequence[str], rules_path: str, workers: int
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """
+    Every named scorer's score for every row, and whether the row passes
+    its constraints, scored a chunk per task
+    """
+    tasks = [
+        (name, start, min(start + CHUNK, len(table)))
+        for name in names
+        for start in range(0, len(table), CHUNK)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(table,)) as pool:
+            futures = [pool.submit(_score_chunk, *task, rules_path) for task in tasks]
+            chunks = [future.result() for future in futures]
+    else:
+        _init_worker(table)
+        chunks = [_score_chunk(*task, rules_path) for task in tasks]
+
+    scores = {name: [] for name in names}
+    passes = {name: [] for name in names}
+    for (name, _, _), (chunk, chunk_passes) in zip(tasks, chunks):
+        scores[name].append(np.asarray(chunk, dtype=np.float64))
+        passes[name].append(np.asarray(chunk_passes, dtype=bool))
+    return (
+        {name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in scores.items()},
+        {name: np.concatenate(parts) if parts else np.zeros(0, dtype=bool) for name, parts in passes.items()},
+    )
+
+
+def competition_ranks(scores: np.ndarray) -> np.ndarray:
+    """1 + the number of rows scoring strictly higher, per row"""
+    ordered = np.sort(scores)
+    return len(scores) - np.searchsorted(ordered, scores, side="right") + 1
+
+
+def ensemble(scores: Dict[str, np.ndarray], top_k: int, gap: float) -> Dict[str, np.ndarray]:
+    """Per-trail ranks under each scorer, their mean and variance, and the flags"""
+    ranks = np.column_stack([competition_ranks(s) for s in scores.values()])
+    in_top = ranks <= top_k
+    spread = ranks.max(axis=1) - ranks.min(axis=1)
+    top_k_split = in_top.any(axis=1) & ~in_top.all(axis=1)
+    rank_gap = spread > gap * len(ranks)
+    return {
+        "ranks": ranks,
+        "mean_rank": ranks.mean(axis=1),
+        "rank_variance": ranks.var(axis=1),
+        "rank_spread": spread,
+        "top_k_split": top_k_split,
+        "rank_gap": rank_gap,
+        "disagree": top_k_split | rank_gap,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--scorers",
+        default=",".join(SCORERS),
+        help="comma-separated registered scorers (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=f"scoring processes (this machine has {os.cpu_count() or 1} CPUs; default: %(default)s)",
+    )
+    parser.add_argument("--top", type=int, default=50, help="K for the top-K disagreement flag")
+    parser.add_argument(
+        "--gap",
+        type=float,
+        default=0.25,
+        help="flag trails whose best and worst rank differ by more than this fraction of trails",
+    )
+    parser.add_argument(
+        "--all-trails",
+        action="store_true",
+        help="rank every trail, not only those passing every scorer's hard constraints",
+    )
+    parser.add_argument("--rules", default=str(DEFAULT_RULES_PATH), help="scoring rules file")
+    parser.add_argument("--output", default=RANKS_CSV, help="per-trail ranks CSV")
+    parser.add_argument("--report", default=REPORT_PATH, help="summary JSON")
+    args = parser.parse_args()
+    names = [name for name in args.scorers.split(",") if name]
+    unknown = [name for name in names if name not in SCORERS]
+    if unknown or len(names) < 2:
+        parser.error(f"give at least two of {sorted(SCORERS)} (unknown: {unknown})")
+
+    table, _ = load_score_table()
+    print(f"Scoring {len(table):,} trails with {', '.join(names)} on {args.workers} workers...")
+    start = time.perf_counter()
+    scores, passes = run_scorers(table, names, args.rules, args.workers)
+    scored = len(table)
+    if not args.all_trails:
+        keep = np.flatnonzero(np.logical_and.reduce([passes[name] for name in names]))
+        table = table.iloc[keep]
+        scores = {name: values[keep] for name, values in scores.items()}
+    result = ensemble(scores, args.top, args.gap)
+    elapsed = time.perf_counter() - start
+
+    order = np.lexsort((np.arange(len(table)), result["mean_rank"]))
+    osm_ids = table["osm_id"].tolist()
+    trail_names = table["name"].tolist()
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["osm_id", "name"]
+            + [f"{name}_{col}" for name in names for col in ("score", "rank")]
+            + ["mean_rank", "rank_variance", "rank_spread", "top_k_split", "rank_gap", "disagree"]
+        )
+        score_lists = [scores[name].tolist() for name in names]
+        rank_lists = result["ranks"].T.tolist()
+        stats = {key: result[key].tolist() for key in result if key != "ranks"}
+        for i in order.tolist():
+            per_scorer: List = []
+            for s, r in zip(score_lists, rank_lists):
+                per_scorer += [f"{s[i]:g}", r[i]]
+            writer.writerow(
+                [osm_ids[i], trail_names[i]]
+                + per_scorer
+                + [
+                    f"{stats['mean_rank'][i]:.1f}",
+                    f"{stats['rank_variance'][i]:.1f}",
+                    stats["rank_spread"][i],
+                    int(stats["top_k_split"][i]),
+                    int(stats["rank_gap"][i]),
+                    int(stats["disagree"][i]),
+                ]
+            )
+
+    correlation = np.corrcoef(result["ranks"], rowvar=False) if len(table) > 1 else None
+    most_divergent = np.argsort(-result["rank_variance"], kind="stable")[:LISTED_TRAILS]
+    summary = {
+        "trails": scored,
+        "passing": {name: int(passes[name].sum()) for name in names},
+        "ranked": len(table),
+        "all_trails": args.all_trails,
+        "scorers": names,
+        "workers": args.workers,
+        "top_k": args.top,
+        "gap": args.gap,
+        "seconds": round(elapsed, 3),
+        "rank_correlation": {
+            f"{a}~{b}": round(float(correlation[i, j]), 4)
+            for i, a in enumerate(names)
+            for j, b in enumerate(names)
+            if i < j and correlation is not None
+        },
+        "flagged": {
+            "top_k_split": int(result["top_k_split"].sum()),
+            "rank_gap": int(result["rank_gap"].sum()),
+            "disagree": int(result["disagree"].sum()),
+        },
+        "top_k_overlap": int((result["ranks"] <= args.top).all(axis=1).sum()),
+        "most_divergent": [
+            {
+                "osm_id": str(osm_ids[i]),
+                "name": str(trail_names[i]),
+                "ranks": dict(zip(names, result["ranks"][i].tolist())),
+                "rank_variance": round(float(result["rank_variance"][i]), 1),
+            }
+            for i in most_divergent
+        ],
+    }
+    with open(args.report, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"  Scored and ranked in {elapsed:.2f}s")
+    passing = ", ".join(f"{count:,} pass {name}" for name, count in summary["passing"].items())
+    print(f"  Ranked {len(table):,} of {scored:,} trails ({passing})")
+    for pair, value in summary["rank_correlation"].items():
+        print(f"  Rank correlation {pair.replace('~', ' vs ')}: {value:.3f}")
+    print(
+        f"  {summary['top_k_overlap']:,} trails are in every scorer's top {args.top}; "
+        f"{summary['flagged']['top_k_split']:,} in some but not all"
+    )
+    print(
+        f"  {summary['flagged']['disagree']:,} trails flagged "
+        f"({summary['flagged']['rank_gap']:,} with ranks more than {args.gap:.0%} of trails apart)"
+    )
+    print(f"\n{'Variance':>12}  {'Ranks':<24} Trail")
+    print("-" * 60)
+    for entry in summary["most_divergent"]:
+        ranks = " / ".join(str(r) for r in entry["ranks"].values())
+        print(f"{entry['rank_variance']:>12,.1f}  {ranks:<24} {entry['name']}")
+    print(f"\nWrote {output} and {args.report}")
+
+
+if __name__ == "__main__":
+    main()
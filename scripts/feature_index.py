@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+OSM ID lookup for trail features and table rows
+Writers and joiners used to find the feature for each kept trail by
+scanning the whole feature list, which is O(trails x candidates). A
+FeatureIndex is built once in O(trails) and answers each lookup from a
+dict. IDs are compared as strings, so 12345, "12345" and 12345.0 (a pandas
+column that picked up a NaN) all match.
+"""
+
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+def osm_id_key(value: Any) -> str:
+    """Canonical string form of an OSM ID from properties, CSV or pandas"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def row_index(values: Iterable[Any]) -> Dict[str, int]:
+    """osm_id -> position of its first occurrence in ``values``"""
+    index: Dict[str, int] = {}
+    for row, value in enumerate(values):
+        index.setdefault(osm_id_key(value), row)
+    return index
+
+
+class FeatureIndex:
+    """
+    GeoJSON features keyed by a property (``osm_id`` by default).
+
+    When an ID repeats, the first feature wins, as it did for the linear
+    scans this replaces.
+    """
+
+    def __init__(self, features: Iterable[Dict[str, Any]], key: str = "osm_id"):
+        self.key = key
+        self.features: List[Dict[str, Any]] = list(features)
+        self.rows = row_index(f["properties"].get(key, "") for f in self.features)
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def __contains__(self, osm_id: Any) -> bool:
+        return osm_id_key(osm_id) in self.rows
+
+    def row(self, osm_id: Any) -> Optional[int]:
+        return self.rows.get(osm_id_key(osm_id))
+
+    def get(self, osm_id: Any) -> Optional[Dict[str, Any]]:
+        row = self.rows.get(osm_id_key(osm_id))
+        return None if row is None else self.features[row]
+
+    def join(self, osm_ids: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """Features for ``osm_ids`` in the order given, skipping unknown IDs"""
+        for osm_id in osm_ids:
+            feature = self.get(osm_id)
+            if feature is not None:
+                yield feature
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Content hashes of pipeline files
+SHA-256 of source and output files, memoised in the cache directory against
+each file's (size, mtime) so unchanged files are hashed once. Shared by the
+trail store, the vertex store and output_cache.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path("data/cache")
+HASH_INDEX_NAME = "source_hashes.json"
+
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hash(path, cache_dir=DEFAULT_CACHE_DIR) -> str:
+    """
+    Content hash of the source file.
+
+    The hash is memoised against (size, mtime) in the cache directory so
+    unchanged files are not re-read on every run; any change to the file
+    forces a fresh hash.
+    """
+    path = Path(path)
+    stat = path.stat()
+    index_path = Path(cache_dir) / HASH_INDEX_NAME
+    index = {}
+    if index_path.exists():
+        with open(index_path) as f:
+            index = json.load(f)
+
+    key = str(path.resolve())
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = file_sha256(path)
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+    return digest
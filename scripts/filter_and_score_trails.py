@@ -4,17 +4,43 @@ Agent C1: Multi-Constraint Filter and Location Scorer
 Systematically apply all constraints to 11,954 trail segments
 """
 
-import csv
+import argparse
 import json
-import sys
 from dataclasses import dataclass
+from functools import lru_cache
 from math import asin, cos, radians, sin, sqrt
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from candidate_export import Candidate, CandidateExporter
+from feature_index import FeatureIndex
+from geojson_io import write_feature_collection
+from output_cache import StagedOutputs
+from scoring_rules import DEFAULT_RULES_PATH, RuleSet, load_rule_set
+from top_k import TopK
+from trail_store import (
+    DEFAULT_KML_PATH,
+    TrailStore,
+    iter_trail_features,
+    load_trail_store,
+    trail_source,
+)
 
 # Charlotte coordinates (search origin)
 CHARLOTTE_LAT = 35.227
 CHARLOTTE_LON = -80.843
 
+# The rule set of scoring_rules.json this script scores with (its
+# criteria, weights and hard constraints)
+RULE_SET = "composite"
+
+# The per-feature reference scorer's weights and thresholds (score_trail
+# and apply_hard_constraints below). The pipeline scores with RULE_SET;
+# bench_scoring.py checks that it reproduces these.
+
 # Constraint thresholds
 MIN_ELEVATION = 3000  # feet
 MAX_ELEVATION = 4500  # feet
@@ -40,6 +66,43 @@ MODERATE_DIFFICULTIES = {"grade2", "grade3", "hiking"}
 # Buncombe County variations
 BUNCOMBE_VARIATIONS = {"buncombe", "buncombe county"}
 
+# Japanese stilt grass habitat
+STILT_GRASS_MAX_ELEVATION = 4000  # feet
+STILT_GRASS_SURFACES = {"ground", "dirt", "unpaved"}
+STILT_GRASS_DIFFICULTIES = {"grade2", "grade3"}
+
+TOP_CANDIDATES = 50
+TOP_CANDIDATES_KML = "data/top_50_candidates.kml"
+SCORE_CHUNK = 1 << 16  # trails scored at a time
+# Largest difference, in units in the last place, allowed between
+# drive_times and the scalar haversine_distance/estimate_drive_time (up
+# to 4 on the NumPy builds measured; bench_scoring.py checks it)
+DRIVE_TIME_ULPS = 8
+TOP_CANDIDATES_HEADER = [
+    "rank",
+    "name",
+    "score",
+    "osm_id",
+    "latitude",
+    "longitude",
+    "elevation_ft",
+    "drive_time_min",
+    "distance_miles",
+    "county",
+    "surface",
+    "difficulty",
+    "highway_type",
+    "ref",
+    "score_surface",
+    "score_difficulty",
+    "score_buncombe",
+    "score_stilt_grass",
+    "score_forest_service",
+    "score_named",
+    "score_cell",
+    "score_elevation",
+]
+
 
 @dataclass
 class TrailScore:
@@ -168,13 +231,13 @@ def has_japanese_stilt_grass_habitat(
     - Moist, shaded areas
     - Ground/dirt surfaces more likely
     """
-    if elevation > 4000:
+    if elevation > STILT_GRASS_MAX_ELEVATION:
         return False
 
-    if surface in {"ground", "dirt", "unpaved"}:
+    if surface in STILT_GRASS_SURFACES:
         return True
 
-    if difficulty in {"grade2", "grade3"}:
+    if difficulty in STILT_GRASS_DIFFICULTIES:
         return True
 
     return False
@@ -218,7 +281,10 @@ def calculate_cell_coverage_score(lat: float, lon: float, elevation: float) -> i
 
 
 def score_trail(feature: Dict) -> TrailScore:
-    """Calculate composite score for a trail based on all constraints"""
+    """
+    Calculate composite score for a trail based on all constraints (the
+    per-feature reference for score_columns with the composite rules)
+    """
     props = feature["properties"]
     coords = feature["geometry"]["coordinates"]
 
@@ -342,55 +408,337 @@ def apply_hard_constraints(trail_score: TrailScore) -> bool:
     return True
 
 
-def main():
-    print("Agent C1: Multi-Constraint Filter and Location Scorer")
-    print("=" * 60)
-    print()
+# ----------------------------------------------------------------------
+# Columnar scoring: a rule set from scoring_rules.json over a whole table
+# of trails at once (score_trail and apply_hard_constraints above are the
+# per-feature reference it reproduces)
+# ----------------------------------------------------------------------
 
-    # Load trails data
-    print("Loading trails.geojson...")
-    with open("data/trails.geojson", "r") as f:
-        trails_data = json.load(f)
 
-    total_trails = len(trails_data["features"])
-    print(f"Loaded {total_trails:,} trail segments")
-    print()
+def drive_times(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """
+    estimate_drive_time(haversine_distance(Charlotte, center)), per center,
+    in NumPy throughout. NumPy's SIMD sin/cos/arcsin can differ from libm in
+    the last bits, so values agree with the scalar functions to within
+    DRIVE_TIME_ULPS rather than exactly (see drive_times_match)
+    """
+    lon1, lat1 = radians(CHARLOTTE_LON), radians(CHARLOTTE_LAT)
+    lon2, lat2 = np.radians(longitude), np.radians(latitude)
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.square(np.sin(dlat / 2)) + cos(lat1) * np.cos(lat2) * np.square(np.sin(dlon / 2))
+    straight_line_miles = 2 * np.arcsin(np.sqrt(a)) * 3959
+    return (straight_line_miles * 1.4 / 45.0) * 60
+
+
+def drive_times_match(values, reference) -> np.ndarray:
+    """Whether each drive time is within DRIVE_TIME_ULPS of the scalar reference's"""
+    values = np.asarray(values, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    return np.abs(values - reference) <= DRIVE_TIME_ULPS * np.spacing(np.abs(reference))
+
+
+def estimate_elevations(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """estimate_elevation_from_lat_lon per center, as int32 feet"""
+    # The bands are nested, so each threshold passed adds its step:
+    # 800, 800 + 400 = 1200, 1200 + 300 = 1500 and 300, 300 + 200 = 500
+    elevation = np.full(len(latitude), 2000, dtype=np.int32)
+    elevation += (latitude > 35.5) * np.int32(800)
+    elevation += (latitude > 35.8) * np.int32(400)
+    elevation += (latitude > 36.2) * np.int32(300)
+    elevation += (longitude < -82.0) * np.int32(300)
+    elevation += (longitude < -82.5) * np.int32(200)
+    return elevation
+
+
+def cell_coverage_scores(
+    latitude: np.ndarray, longitude: np.ndarray, elevation: np.ndarray
+) -> np.ndarray:
+    """calculate_cell_coverage_score per center, as int16"""
+    boone = (36.0 <= latitude) & (latitude <= 36.3) & (-82.0 <= longitude) & (longitude <= -81.6)
+    asheville = (35.5 <= latitude) & (latitude <= 35.7) & (-82.7 <= longitude) & (longitude <= -82.4)
+    # Boone lies north of 35.8 (6 + 4 = 10) and Asheville south of it (8)
+    score = (latitude > 35.8) * np.int16(6)
+    score += boone * np.int16(4)
+    score += asheville * np.int16(8)
+    score += (elevation > 3500) * np.int16(2)
+    score -= (longitude < -82.8) * np.int16(10)
+    return np.clip(score, 0, 10, out=score)
+
+
+@lru_cache(maxsize=None)
+def default_rules() -> RuleSet:
+    """The composite rule set of the default scoring_rules.json, loaded once"""
+    return load_rule_set(RULE_SET)
+
+
+def score_columns(table: pd.DataFrame, rules: Optional[RuleSet] = None) -> pd.DataFrame:
+    """
+    Score every row of a score table (see score_table_from_store) with a
+    rule set (default: the composite rules). Columns: elevation_est,
+    drive_time_minutes, score_<criterion> per criterion, score,
+    constraint_<name> per hard constraint, and passes (all of them).
 
-    # Score all trails
-    print("Scoring all trails with composite criteria...")
-    all_scored_trails = []
+    Rules see the table's columns plus elevation_est, drive_time_minutes
+    and cell_coverage, computed from each trail's center.
+    """
+    if rules is None:
+        rules = default_rules()
+    latitude = table["latitude"].to_numpy(dtype=np.float64)
+    longitude = table["longitude"].to_numpy(dtype=np.float64)
+    elevation = estimate_elevations(latitude, longitude)
+    inputs = dict(table.items())
+    inputs["elevation_est"] = elevation
+    inputs["drive_time_minutes"] = drive_times(latitude, longitude)
+    inputs["cell_coverage"] = cell_coverage_scores(latitude, longitude, elevation)
+
+    columns = {
+        "elevation_est": elevation,
+        "drive_time_minutes": inputs["drive_time_minutes"],
+    }
+    points, columns["score"] = rules.score(inputs, len(table))
+    for criterion, column in points.items():
+        columns[f"score_{criterion}"] = column
+    passes = np.ones(len(table), dtype=bool)
+    for constraint, column in rules.check(inputs).items():
+        columns[f"constraint_{constraint}"] = column
+        passes &= column
+    columns["passes"] = passes
+    return pd.DataFrame(columns, index=table.index, copy=False)
+
+
+def trail_scores(table: pd.DataFrame, scores: pd.DataFrame, rows: Sequence[int]) -> List[TrailScore]:
+    """A TrailScore for each of the given table rows"""
+    picked = table.iloc[rows]
+    picked_scores = scores.iloc[rows]
+    fields = {col: picked[col].tolist() for col in picked.columns}
+    criteria = [c[len("score_") :] for c in scores.columns if c.startswith("score_")]
+    breakdowns = [picked_scores[f"score_{c}"].tolist() for c in criteria]
+    return [
+        TrailScore(
+            name=fields["name"][j],
+            osm_id=fields["osm_id"][j],
+            score=score,
+            distance_miles=fields["distance_miles"][j],
+            drive_time_minutes=drive_time,
+            latitude=fields["latitude"][j],
+            longitude=fields["longitude"][j],
+            elevation_est=elevation,
+            county=fields["county"][j],
+            surface=fields["surface"][j].lower(),
+            difficulty=fields["difficulty"][j].lower(),
+            highway_type=fields["highway_type"][j],
+            ref=fields["ref"][j],
+            score_breakdown={c: points[j] for c, points in zip(criteria, breakdowns)},
+        )
+        for j, (score, drive_time, elevation) in enumerate(
+            zip(
+                picked_scores["score"].tolist(),
+                picked_scores["drive_time_minutes"].tolist(),
+                picked_scores["elevation_est"].tolist(),
+            )
+        )
+    ]
+
+
+def score_table_from_features(features: Iterable[Dict]) -> pd.DataFrame:
+    """The inputs score_columns needs, read from GeoJSON-style features"""
+    columns = {
+        col: []
+        for col in (
+            "name",
+            "osm_id",
+            "county",
+            "distance_miles",
+            "surface",
+            "difficulty",
+            "highway_type",
+            "ref",
+            "latitude",
+            "longitude",
+        )
+    }
+    for feature in features:
+        props = feature["properties"]
+        center_lat, center_lon = get_trail_center(feature["geometry"]["coordinates"])
+        columns["name"].append(props.get("name", f"Trail {props.get('osm_id', 'Unknown')}"))
+        columns["osm_id"].append(str(props.get("osm_id", "")))
+        columns["county"].append(props.get("county", "Unknown"))
+        columns["distance_miles"].append(float(props.get("distance_miles", 0)))
+        columns["surface"].append(props.get("surface", "unknown"))
+        columns["difficulty"].append(props.get("difficulty", "unknown"))
+        columns["highway_type"].append(props.get("highway_type", "unknown"))
+        columns["ref"].append(props.get("ref", ""))
+        columns["latitude"].append(center_lat)
+        columns["longitude"].append(center_lon)
+    return pd.DataFrame(columns)
+
+
+def score_table_from_store(store: TrailStore, rows: np.ndarray) -> pd.DataFrame:
+    """
+    score_table_from_features for the store's features at ``rows`` without
+    building them: string columns come from the store's columns (as
+    categoricals) and centers from its precomputed vertex means
+    """
+    table = pd.DataFrame(
+        {
+            col: pd.Categorical(np.asarray(store.property_column(col), dtype=object)[rows])
+            for col in ("name", "osm_id", "county", "surface", "difficulty", "highway_type", "ref")
+        }
+    )
+    table["distance_miles"] = [round(d, 3) for d in store.distance_miles[rows].tolist()]
+    table["latitude"] = store.centers[rows, 1]
+    table["longitude"] = store.centers[rows, 0]
+    return table
 
-    for i, feature in enumerate(trails_data["features"]):
-        if (i + 1) % 1000 == 0:
-            print(f"  Processed {i + 1:,} / {total_trails:,} trails...")
 
-        trail_score = score_trail(feature)
-        all_scored_trails.append(trail_score)
+def load_score_table(
+    kml_path=DEFAULT_KML_PATH,
+) -> Tuple[pd.DataFrame, Callable[[Sequence[int]], List[Dict]]]:
+    """
+    Score table for every trail iter_trail_features yields, plus a function
+    returning the features at given (ascending) table rows
+    """
+    if Path(kml_path).exists():
+        store = load_trail_store(kml_path)
+        rows = np.flatnonzero(store.has_geometry)
+        table = score_table_from_store(store, rows)
+        return table, lambda picked: [store.feature(int(rows[i])) for i in picked]
+
+    def features_at(picked: Sequence[int]) -> List[Dict]:
+        wanted = set(picked)
+        return [f for i, f in enumerate(iter_trail_features(kml_path)) if i in wanted]
+
+    return score_table_from_features(iter_trail_features(kml_path)), features_at
+
+
+def leaderboard_printer(table: pd.DataFrame, shown: int = 10) -> Callable[[TopK], None]:
+    """TopK callback printing the current leaders (items are table rows)"""
+    names = table["name"]
+
+    def show(top: TopK) -> None:
+        print(f"  Leaderboard after {top.seen:,} passing trails:")
+        for rank, (score, row) in enumerate(top.leaders()[:shown], 1):
+            print(f"    {rank:>2}. {names.iat[row]} ({score})")
+
+    return show
+
+
+def top_candidate_row(rank: int, trail: TrailScore) -> List:
+    """One top_50_candidates.csv row, in TOP_CANDIDATES_HEADER order"""
+    return [
+        rank,
+        trail.name,
+        trail.score,
+        trail.osm_id,
+        f"{trail.latitude:.6f}",
+        f"{trail.longitude:.6f}",
+        f"{trail.elevation_est:.0f}",
+        f"{trail.drive_time_minutes:.0f}",
+        f"{trail.distance_miles:.2f}",
+        trail.county,
+        trail.surface,
+        trail.difficulty,
+        trail.highway_type,
+        trail.ref,
+        trail.score_breakdown.get("surface", 0),
+        trail.score_breakdown.get("difficulty", 0),
+        trail.score_breakdown.get("buncombe", 0),
+        trail.score_breakdown.get("stilt_grass", 0),
+        trail.score_breakdown.get("forest_service", 0),
+        trail.score_breakdown.get("named", 0),
+        trail.score_breakdown.get("cell_coverage", 0),
+        trail.score_breakdown.get("elevation", 0),
+    ]
 
-    print(f"  Completed scoring {len(all_scored_trails):,} trails")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--write-kml", action="store_true", help=f"also write the top 50 to {TOP_CANDIDATES_KML}"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rescore even if the trails are unchanged"
+    )
+    parser.add_argument(
+        "--leaderboard-every",
+        type=int,
+        metavar="N",
+        help="print the current top 10 after every N trails that pass the hard constraints",
+    )
+    parser.add_argument(
+        "--rules",
+        default=str(DEFAULT_RULES_PATH),
+        help=f'scoring rules file (its "{RULE_SET}" rule set; default: %(default)s)',
+    )
+    args = parser.parse_args()
+
+    source = trail_source()
+    inputs = [source, args.rules]
+    with StagedOutputs(
+        "filter_and_score", inputs, {"write_kml": args.write_kml}, args.force, code=[__file__]
+    ) as outputs:
+        if outputs.unchanged():
+            print(f"{source} unchanged since the last run; nothing to rescore")
+        else:
+            filter_and_score(args, outputs)
+    outputs.report()
+
+
+def filter_and_score(args: argparse.Namespace, outputs: StagedOutputs) -> None:
+    print("Agent C1: Multi-Constraint Filter and Location Scorer")
+    print("=" * 60)
     print()
 
-    # Apply hard constraints
-    print("Applying hard constraints...")
-    filtered_trails = [t for t in all_scored_trails if apply_hard_constraints(t)]
+    # Score the columnar table a chunk at a time. The top 50 are selected
+    # as the passing trails stream past and only they become TrailScores;
+    # for the rest only the row, score, drive time and elevation are kept,
+    # which filtered_trails.geojson (every passing trail) needs
+    print("Loading and scoring trails with composite criteria...")
+    rules = load_rule_set(RULE_SET, args.rules)
+    table, features_at = load_score_table()
+    total_trails = len(table)
+    constraint_fails = {c.name: 0 for c in rules.constraints}
+    passing_chunks: List[pd.DataFrame] = []
+    top = TopK(TOP_CANDIDATES, args.leaderboard_every, leaderboard_printer(table))
+    for start in range(0, total_trails, SCORE_CHUNK):
+        chunk = table.iloc[start : start + SCORE_CHUNK]
+        scores = score_columns(chunk, rules)
+        for name in constraint_fails:
+            constraint_fails[name] += int((~scores[f"constraint_{name}"].to_numpy()).sum())
+        rows = np.flatnonzero(scores["passes"].to_numpy())
+        top.offer_many(scores["score"].to_numpy()[rows], (rows + start).tolist())
+        passed = scores.iloc[rows][["score", "drive_time_minutes", "elevation_est"]]
+        passing_chunks.append(passed.set_axis(rows + start))
+    passed = pd.concat(passing_chunks)
+    passing = passed.index.tolist()
+    candidate_features = features_at(passing)
+
+    print(f"  Completed scoring {total_trails:,} trail segments")
+    print()
 
-    eliminated_count = total_trails - len(filtered_trails)
+    print("Hard constraints:")
+    eliminated_count = total_trails - len(passing)
     print(f"  Hard constraints eliminated {eliminated_count:,} trails")
-    print(f"  {len(filtered_trails):,} trails pass all hard constraints")
+    print(f"  {len(passing):,} trails pass all hard constraints")
     print()
 
-    # Sort by score
-    filtered_trails.sort(key=lambda x: x.score, reverse=True)
+    # Sort by score, highest first and in table order among equal scores
+    # (filtered_trails.geojson lists every passing trail in score order;
+    # the top 50 come from the streaming selection)
+    passed = passed.iloc[np.argsort(-passed["score"].to_numpy(), kind="stable")]
 
     # Statistics
     print("Filter Statistics:")
     print(f"  Total trails: {total_trails:,}")
-    print(f"  Passed hard constraints: {len(filtered_trails):,}")
+    print(f"  Passed hard constraints: {len(passing):,}")
     print(f"  Elimination rate: {(eliminated_count / total_trails) * 100:.1f}%")
     print()
 
     # Top 50 candidates
-    top_50 = filtered_trails[:50]
+    top_rows = [row for _, row in top.leaders()]
+    top_table = table.iloc[top_rows]
+    top_50 = trail_scores(top_table, score_columns(top_table, rules), range(len(top_rows)))
 
     print("Top 10 Candidates:")
     print("-" * 60)
@@ -405,162 +753,81 @@ def main():
 
     # Save filtered trails GeoJSON
     print("Saving filtered trails...")
+    candidates = FeatureIndex(candidate_features)
+    osm_ids = table["osm_id"].iloc[passed.index].tolist()
     filtered_features = []
-    for trail_score in filtered_trails:
-        # Find original feature
-        for feature in trails_data["features"]:
-            if str(feature["properties"].get("osm_id", "")) == trail_score.osm_id:
-                # Add score to properties
-                feature["properties"]["composite_score"] = trail_score.score
-                feature["properties"]["drive_time_minutes"] = (
-                    trail_score.drive_time_minutes
-                )
-                feature["properties"]["elevation_est"] = trail_score.elevation_est
-                filtered_features.append(feature)
-                break
-
-    filtered_geojson = {"type": "FeatureCollection", "features": filtered_features}
-
-    with open("data/filtered_trails.geojson", "w") as f:
-        json.dump(filtered_geojson, f, indent=2)
+    for osm_id, score, drive_time, elevation in zip(
+        osm_ids,
+        passed["score"].tolist(),
+        passed["drive_time_minutes"].tolist(),
+        passed["elevation_est"].tolist(),
+    ):
+        feature = candidates.get(osm_id)
+        if feature is None:
+            continue
+        # Add score to properties
+        feature["properties"]["composite_score"] = score
+        feature["properties"]["drive_time_minutes"] = drive_time
+        feature["properties"]["elevation_est"] = elevation
+        filtered_features.append(feature)
+
+    write_feature_collection(outputs.path("data/filtered_trails.geojson"), filtered_features)
     print(f"  Saved {len(filtered_features):,} trails to filtered_trails.geojson")
 
-    # Save top 50 CSV
-    print("Saving top 50 candidates CSV...")
-    with open("data/top_50_candidates.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(
-            [
-                "rank",
-                "name",
-                "score",
-                "osm_id",
-                "latitude",
-                "longitude",
-                "elevation_ft",
-                "drive_time_min",
-                "distance_miles",
-                "county",
-                "surface",
-                "difficulty",
-                "highway_type",
-                "ref",
-                "score_surface",
-                "score_difficulty",
-                "score_buncombe",
-                "score_stilt_grass",
-                "score_forest_service",
-                "score_named",
-                "score_cell",
-                "score_elevation",
-            ]
-        )
-
-        for i, trail in enumerate(top_50, 1):
-            writer.writerow(
-                [
-                    i,
-                    trail.name,
-                    trail.score,
-                    trail.osm_id,
-                    f"{trail.latitude:.6f}",
-                    f"{trail.longitude:.6f}",
-                    f"{trail.elevation_est:.0f}",
-                    f"{trail.drive_time_minutes:.0f}",
-                    f"{trail.distance_miles:.2f}",
-                    trail.county,
-                    trail.surface,
-                    trail.difficulty,
-                    trail.highway_type,
-                    trail.ref,
-                    trail.score_breakdown.get("surface", 0),
-                    trail.score_breakdown.get("difficulty", 0),
-                    trail.score_breakdown.get("buncombe", 0),
-                    trail.score_breakdown.get("stilt_grass", 0),
-                    trail.score_breakdown.get("forest_service", 0),
-                    trail.score_breakdown.get("named", 0),
-                    trail.score_breakdown.get("cell_coverage", 0),
-                    trail.score_breakdown.get("elevation", 0),
-                ]
+    # Save top 50 CSV and GeoJSON (and KML) in one pass
+    print("Saving top 50 candidates...")
+    with CandidateExporter(
+        csv_path=outputs.path("data/top_50_candidates.csv"),
+        csv_header=TOP_CANDIDATES_HEADER,
+        geojson_path=outputs.path("data/top_50_candidates.geojson"),
+        kml_path=outputs.path(TOP_CANDIDATES_KML) if args.write_kml else None,
+    ) as out:
+        for rank, trail_score in enumerate(top_50, 1):
+            properties = coordinates = None
+            feature = candidates.get(trail_score.osm_id)
+            if feature is not None:
+                properties = feature["properties"]
+                properties["rank"] = rank
+                properties["composite_score"] = trail_score.score
+                properties["drive_time_minutes"] = trail_score.drive_time_minutes
+                properties["elevation_est"] = trail_score.elevation_est
+                coordinates = feature["geometry"]["coordinates"]
+            out.write(
+                Candidate(
+                    trail_score.name,
+                    properties,
+                    coordinates,
+                    row=top_candidate_row(rank, trail_score),
+                )
             )
 
     print("  Saved top 50 to top_50_candidates.csv")
-
-    # Save top 50 GeoJSON
-    print("Saving top 50 candidates GeoJSON...")
-    top_50_features = []
-    for trail_score in top_50:
-        for feature in trails_data["features"]:
-            if str(feature["properties"].get("osm_id", "")) == trail_score.osm_id:
-                feature["properties"]["rank"] = top_50.index(trail_score) + 1
-                feature["properties"]["composite_score"] = trail_score.score
-                feature["properties"]["drive_time_minutes"] = (
-                    trail_score.drive_time_minutes
-                )
-                feature["properties"]["elevation_est"] = trail_score.elevation_est
-                top_50_features.append(feature)
-                break
-
-    top_50_geojson = {"type": "FeatureCollection", "features": top_50_features}
-
-    with open("data/top_50_candidates.geojson", "w") as f:
-        json.dump(top_50_geojson, f, indent=2)
     print("  Saved top 50 to top_50_candidates.geojson")
+    if args.write_kml:
+        print(f"  Saved top 50 to {TOP_CANDIDATES_KML}")
 
     # Save statistics
     print("Saving filter statistics...")
 
-    # Calculate statistics at each stage
-    elevation_fails = sum(
-        1
-        for t in all_scored_trails
-        if not (MIN_ELEVATION <= t.elevation_est <= MAX_ELEVATION)
-    )
-    drive_time_fails = sum(
-        1
-        for t in all_scored_trails
-        if not (MIN_DRIVE_TIME <= t.drive_time_minutes <= MAX_DRIVE_TIME)
-    )
-    cell_coverage_fails = sum(
-        1 for t in all_scored_trails if t.score_breakdown.get("cell_coverage", 0) < 3
-    )
-
     # Surface statistics
     surface_stats = {}
-    for trail in filtered_trails:
-        surface_stats[trail.surface] = surface_stats.get(trail.surface, 0) + 1
+    for surface in table["surface"].iloc[passed.index].tolist():
+        surface = surface.lower()
+        surface_stats[surface] = surface_stats.get(surface, 0) + 1
 
     # Difficulty statistics
     difficulty_stats = {}
-    for trail in filtered_trails:
-        difficulty_stats[trail.difficulty] = (
-            difficulty_stats.get(trail.difficulty, 0) + 1
-        )
+    for difficulty in table["difficulty"].iloc[passed.index].tolist():
+        difficulty = difficulty.lower()
+        difficulty_stats[difficulty] = difficulty_stats.get(difficulty, 0) + 1
 
     stats = {
         "total_trails": total_trails,
-        "passed_all_constraints": len(filtered_trails),
+        "passed_all_constraints": len(passing),
         "elimination_rate_percent": round((eliminated_count / total_trails) * 100, 2),
-        "constraints_applied": {
-            "elevation_range": f"{MIN_ELEVATION}-{MAX_ELEVATION} ft",
-            "drive_time_range": f"{MIN_DRIVE_TIME}-{MAX_DRIVE_TIME} minutes",
-            "cellular_coverage": "minimum 3/10 score",
-        },
-        "eliminated_by_constraint": {
-            "elevation": elevation_fails,
-            "drive_time": drive_time_fails,
-            "cellular_coverage": cell_coverage_fails,
-        },
-        "scoring_weights": {
-            "surface_suitable": SCORE_SURFACE_SUITABLE,
-            "difficulty_moderate": SCORE_DIFFICULTY_MODERATE,
-            "buncombe_county": SCORE_BUNCOMBE_COUNTY,
-            "stilt_grass_habitat": SCORE_STILT_GRASS,
-            "forest_service_road": SCORE_FOREST_SERVICE,
-            "named_trail": SCORE_NAMED_TRAIL,
-            "cell_coverage": SCORE_GOOD_CELL_COVERAGE,
-            "optimal_elevation": SCORE_OPTIMAL_ELEVATION,
-        },
+        "constraints_applied": {c.label: c.description for c in rules.constraints},
+        "eliminated_by_constraint": constraint_fails,
+        "scoring_weights": rules.weights(),
         "filtered_trails_surface_distribution": surface_stats,
         "filtered_trails_difficulty_distribution": difficulty_stats,
         "top_candidate": {
@@ -575,7 +842,7 @@ def main():
         else None,
     }
 
-    with open("data/filter_statistics.json", "w") as f:
+    with open(outputs.path("data/filter_statistics.json"), "w") as f:
         json.dump(stats, f, indent=2)
     print("  Saved statistics to filter_statistics.json")
     print()
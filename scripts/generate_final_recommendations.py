@@ -4,11 +4,14 @@ Agent D1: Master Synthesizer and Recommendation Generator
 Combines all agent findings to generate top 20 candidate locations
 """
 
-import json
+import argparse
+
 import pandas as pd
 import numpy as np
-from pathlib import Path
-from collections import defaultdict
+
+from scoring_rules import DEFAULT_RULES_PATH, load_rules
+from top_k import top_k_indices
+from trail_store import iter_trail_features
 
 def load_trail_data():
     """Load trail data from CSV"""
@@ -18,140 +21,55 @@ def load_trail_data():
     return df
 
 def load_geojson_data():
-    """Load trail GeoJSON data"""
-    print("Loading GeoJSON trail data...")
-    with open('data/trails.geojson') as f:
-        geojson = json.load(f)
-    print(f"Loaded {len(geojson['features']):,} trail features")
-    return geojson
-
-def apply_constraint_filters(df):
+    """Trail GeoJSON features as an iterator, read one at a time"""
+    print("Streaming GeoJSON trail data...")
+    return iter_trail_features()
+
+def apply_constraint_filters(df, rules):
     """Apply hard constraint filters based on agent findings"""
     print("\n=== APPLYING CONSTRAINT FILTERS ===")
 
     initial_count = len(df)
     print(f"Starting trails: {initial_count:,}")
 
-    # Filter 1: Suitable surface types (ground, dirt, gravel, unpaved)
-    # These surfaces allow for burying items
-    suitable_surfaces = ['ground', 'dirt', 'gravel', 'unpaved']
-    df_filtered = df[df['surface'].isin(suitable_surfaces)].copy()
-    print(f"After surface filter (ground/dirt/gravel/unpaved): {len(df_filtered):,} ({len(df_filtered)/initial_count*100:.1f}%)")
-
-    # Filter 2: Trail types (prefer path, track, footway - not cycleway)
-    suitable_types = ['path', 'track', 'footway']
-    df_filtered = df_filtered[df_filtered['highway_type'].isin(suitable_types)]
-    print(f"After trail type filter: {len(df_filtered):,} ({len(df_filtered)/initial_count*100:.1f}%)")
+    # Each constraint of the "recommendation" rule set narrows the trails
+    # left by the ones before it (suitable surfaces for burying items,
+    # trail types, then length limits for camera setup access)
+    keep = np.ones(len(df), dtype=bool)
+    for constraint in rules.constraints:
+        keep &= constraint.test(df)
+        kept = int(keep.sum())
+        print(f"After {constraint.description}: {kept:,} ({kept/initial_count*100:.1f}%)")
 
-    # Filter 3: Minimum length (at least 0.1 miles - too short might be urban connectors)
-    df_filtered = df_filtered[df_filtered['distance_miles'] >= 0.1]
-    print(f"After minimum length filter: {len(df_filtered):,} ({len(df_filtered)/initial_count*100:.1f}%)")
+    return df[keep].copy()
 
-    # Filter 4: Exclude extremely long trails (>10 miles - likely wilderness backcountry)
-    # Camera needs to be accessible for setup
-    df_filtered = df_filtered[df_filtered['distance_miles'] <= 10.0]
-    print(f"After maximum length filter (<10 miles): {len(df_filtered):,} ({len(df_filtered)/initial_count*100:.1f}%)")
-
-    return df_filtered
-
-def calculate_scores(df):
+def calculate_scores(df, rules):
     """Calculate probability scores for each trail segment"""
     print("\n=== CALCULATING PROBABILITY SCORES ===")
 
-    scores = []
-
-    for idx, row in df.iterrows():
-        score = 0
-        score_breakdown = {}
-
-        # Factor 1: Surface type (40 points max)
-        # Ground and dirt are best for burying
-        if row['surface'] == 'ground':
-            surface_score = 40
-        elif row['surface'] == 'dirt':
-            surface_score = 35
-        elif row['surface'] == 'gravel':
-            surface_score = 25
-        elif row['surface'] == 'unpaved':
-            surface_score = 20
-        else:
-            surface_score = 0
-        score += surface_score
-        score_breakdown['surface'] = surface_score
-
-        # Factor 2: Difficulty level (25 points max)
-        # Moderate difficulty is ideal - accessible but not too popular
-        difficulty = str(row['difficulty']).lower()
-        if difficulty in ['grade2', 'grade3', 'hiking']:
-            difficulty_score = 25
-        elif difficulty in ['mountain_hiking', 'grade4']:
-            difficulty_score = 15
-        elif difficulty == 'grade1':
-            difficulty_score = 10
-        else:
-            difficulty_score = 5  # Unknown difficulty
-        score += difficulty_score
-        score_breakdown['difficulty'] = difficulty_score
-
-        # Factor 3: Trail type (20 points max)
-        # Tracks (old roads) are ideal - moderate traffic, easy access
-        if row['highway_type'] == 'track':
-            type_score = 20
-        elif row['highway_type'] == 'path':
-            type_score = 15
-        elif row['highway_type'] == 'footway':
-            type_score = 10
-        else:
-            type_score = 5
-        score += type_score
-        score_breakdown['trail_type'] = type_score
-
-        # Factor 4: Trail length (15 points max)
-        # Prefer moderate length trails (0.5-3 miles) - not too short, not wilderness
-        length = row['distance_miles']
-        if 0.5 <= length <= 3.0:
-            length_score = 15
-        elif 0.25 <= length <= 0.5 or 3.0 <= length <= 5.0:
-            length_score = 10
-        elif 0.1 <= length <= 0.25 or 5.0 <= length <= 7.0:
-            length_score = 5
-        else:
-            length_score = 2
-        score += length_score
-        score_breakdown['length'] = length_score
-
-        # Bonus points for named trails (not generic "Trail XXXX")
-        name = str(row['name'])
-        if name != 'nan' and not name.startswith('Trail '):
-            score += 10
-            score_breakdown['named'] = 10
-        else:
-            score_breakdown['named'] = 0
-
-        # Bonus points for Forest Service roads (reliable access)
-        ref = str(row['ref'])
-        if 'FS' in ref or 'Forest Service' in name:
-            score += 10
-            score_breakdown['forest_service'] = 10
-        else:
-            score_breakdown['forest_service'] = 0
-
-        scores.append({
-            'trail_name': name,
-            'osm_id': row['osm_id'],
-            'total_score': score,
-            'breakdown': score_breakdown,
-            'distance_miles': row['distance_miles'],
-            'surface': row['surface'],
-            'difficulty': row['difficulty'],
-            'highway_type': row['highway_type'],
-            'county': row['county'],
-            'ref': ref
-        })
-
-    return pd.DataFrame(scores)
-
-def integrate_camera_constraints(scored_df):
+    # Surface, difficulty, trail type and length tiers plus the named and
+    # Forest Service bonuses, as the "recommendation" rule set defines them
+    points, total = rules.score(df, len(df))
+    points = {criterion: column.tolist() for criterion, column in points.items()}
+    breakdowns = [
+        {criterion: column[i] for criterion, column in points.items()}
+        for i in range(len(df))
+    ]
+
+    return pd.DataFrame({
+        'trail_name': [str(name) for name in df['name'].tolist()],
+        'osm_id': df['osm_id'].tolist(),
+        'total_score': total.tolist(),
+        'breakdown': breakdowns,
+        'distance_miles': df['distance_miles'].tolist(),
+        'surface': df['surface'].tolist(),
+        'difficulty': df['difficulty'].tolist(),
+        'highway_type': df['highway_type'].tolist(),
+        'county': df['county'].tolist(),
+        'ref': [str(ref) for ref in df['ref'].tolist()],
+    })
+
+def integrate_camera_constraints(scored_df, rules):
     """Apply camera-specific constraints from Agent B2 findings"""
     print("\n=== APPLYING CAMERA CONSTRAINTS ===")
     print("From Agent B2 findings:")
@@ -164,12 +82,13 @@ def integrate_camera_constraints(scored_df):
     # But we can prioritize certain trail characteristics
 
     # Boost scores for trails likely to have good cell coverage
-    # (named trails, forest service roads, near Asheville)
-    for idx, row in scored_df.iterrows():
-        # Buncombe County (Asheville area) has best coverage
-        if row['county'] == 'Buncombe':
-            scored_df.at[idx, 'total_score'] += 20
-            print(f"Boosting Buncombe County trail: {row['trail_name']}")
+    # (the "camera_boost" rule set: Buncombe County, the Asheville area,
+    # has the best coverage)
+    for criterion in rules.criteria:
+        boost = criterion.points(scored_df)
+        for i in np.flatnonzero(boost):
+            print(f"Boosting {criterion.description} trail: {scored_df['trail_name'].iat[i]}")
+        scored_df['total_score'] += boost
 
     return scored_df
 
@@ -177,8 +96,9 @@ def generate_top_candidates(scored_df, top_n=20):
     """Generate final ranked list of top candidates"""
     print(f"\n=== GENERATING TOP {top_n} CANDIDATES ===")
 
-    # Sort by total score
-    top_candidates = scored_df.nlargest(top_n, 'total_score')
+    # Highest total scores, earlier trails first among ties (as nlargest)
+    rows = top_k_indices(scored_df['total_score'].to_numpy(), top_n)
+    top_candidates = scored_df.iloc[rows]
 
     print(f"\nTop {top_n} Trail Segments by Probability Score:")
     print("="*100)
@@ -198,21 +118,29 @@ def generate_top_candidates(scored_df, top_n=20):
 
 def main():
     """Main analysis pipeline"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('--rules', default=str(DEFAULT_RULES_PATH),
+                        help='scoring rules file (its "recommendation" and "camera_boost" '
+                             'rule sets; default: %(default)s)')
+    args = parser.parse_args()
+
     print("="*80)
     print("AGENT D1: MASTER SYNTHESIZER AND RECOMMENDATION GENERATOR")
     print("="*80)
 
+    rules = load_rules(args.rules)
+
     # Load data
     df = load_trail_data()
 
     # Apply constraint filters
-    df_filtered = apply_constraint_filters(df)
+    df_filtered = apply_constraint_filters(df, rules['recommendation'])
 
     # Calculate scores
-    scored_df = calculate_scores(df_filtered)
+    scored_df = calculate_scores(df_filtered, rules['recommendation'])
 
     # Apply camera constraints
-    scored_df = integrate_camera_constraints(scored_df)
+    scored_df = integrate_camera_constraints(scored_df, rules['camera_boost'])
 
     # Generate top candidates
     top_candidates = generate_top_candidates(scored_df, top_n=20)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Synthetic trails KML generator
+Writes a KML in the OSM export's layout (escaped CDATA tag table, one
+LineString per Placemark) with any number of placemarks, for benchmarking
+ingest beyond the one real file we have.
+
+Each placemark draws a row of data/trails_summary.csv, which fixes its
+vertex count, county, highway type, surface, difficulty, ref and whether it
+is named, so those follow the real joint distribution. The remaining tags
+(access, bicycle, horse, ...) come from a random placemark of the template
+KML. Geometry is a random walk with ~15 m steps inside the study area.
+Output is deterministic for a given seed.
+
+Usage: python scripts/generate_synthetic_kml.py OUT.kml [--placemarks N] [--seed S]
+"""
+
+import argparse
+import csv
+import time
+from html import escape
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from kml_reader import PlacemarkReader
+from kml_writer import FOOTER, HEADER, placemark
+
+DEFAULT_PROFILE_CSV = "data/trails_summary.csv"
+DEFAULT_TEMPLATE_KML = "trails_priority_only.kml"
+
+# Western NC study area (lon_min, lat_min, lon_max, lat_max)
+STUDY_AREA = (-83.6, 35.0, -81.6, 36.3)
+STEP_DEGREES = 1.5e-4
+FIRST_OSM_ID = 900_000_000
+
+# Tags the profile row decides; everything else comes from the template
+PROFILE_KEYS = {"OSM ID", "name", "highway", "surface", "sac_scale", "tracktype", "ref", "tiger:county"}
+
+def load_profile(csv_path) -> List[Dict[str, str]]:
+    with open(csv_path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def load_template_tags(kml_path) -> List[Dict[str, str]]:
+    return [
+        {k: v for k, v in placemark.tags.items() if k not in PROFILE_KEYS}
+        for placemark in PlacemarkReader(kml_path)
+    ]
+
+
+def profile_tags(row: Dict[str, str], osm_id: int, extra: Dict[str, str]) -> Dict[str, str]:
+    """Tags for one placemark in export layout: OSM ID first, then sorted"""
+    tags = dict(extra)
+    named = not row["name"].startswith("Trail ")
+    if named:
+        tags["name"] = row["name"]
+    if row["highway_type"] != "unknown":
+        tags["highway"] = row["highway_type"]
+    if row["surface"] != "unknown":
+        tags["surface"] = row["surface"]
+    difficulty = row["difficulty"]
+    if difficulty.startswith("grade"):
+        tags["tracktype"] = difficulty
+    elif difficulty != "unknown":
+        tags["sac_scale"] = difficulty
+    if row["ref"]:
+        tags["ref"] = row["ref"]
+    if row["county"] != "Unknown":
+        tags["tiger:county"] = f"{row['county']}, NC"
+    ordered = {"OSM ID": str(osm_id)}
+    for key in sorted(tags):
+        ordered[key] = tags[key]
+    return ordered
+
+
+def random_walks(rng: np.random.Generator, counts: np.ndarray) -> np.ndarray:
+    """(sum(counts), 2) lon/lat array: one random walk per trail"""
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    steps = rng.normal(0.0, STEP_DEGREES, size=(int(offsets[-1]), 2))
+    lon_min, lat_min, lon_max, lat_max = STUDY_AREA
+    starts = rng.uniform([lon_min, lat_min], [lon_max, lat_max], size=(len(counts), 2))
+    steps[offsets[:-1]] = starts
+    # Segmented cumulative sum: restart at the first vertex of each trail
+    walk = np.cumsum(steps, axis=0)
+    before = np.zeros((len(counts), 2))
+    before[1:] = walk[offsets[1:-1] - 1]
+    return walk - np.repeat(before, counts, axis=0)
+
+
+def generate(
+    out_path,
+    placemarks: int,
+    seed: int = 0,
+    profile_csv=DEFAULT_PROFILE_CSV,
+    template_kml=DEFAULT_TEMPLATE_KML,
+    chunk_size: int = 10_000,
+) -> Path:
+    """Write a synthetic KML with ``placemarks`` placemarks; returns its path"""
+    rng = np.random.default_rng(seed)
+    profile = load_profile(profile_csv)
+    templates = load_template_tags(template_kml) if Path(template_kml).exists() else [{}]
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    coord_formats: Dict[int, str] = {}
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(HEADER.format(folder=escape(out_path.stem)))
+        for chunk_start in range(0, placemarks, chunk_size):
+            n = min(chunk_size, placemarks - chunk_start)
+            rows = [profile[i] for i in rng.integers(0, len(profile), n).tolist()]
+            extras = [templates[i] for i in rng.integers(0, len(templates), n).tolist()]
+            counts = np.array([max(int(row["num_coordinates"]), 2) for row in rows])
+            flat = random_walks(rng, counts).ravel().tolist()
+
+            parts = []
+            pos = 0
+            for j, (row, extra, count) in enumerate(zip(rows, extras, counts.tolist())):
+                index = chunk_start + j + 1
+                tags = profile_tags(row, FIRST_OSM_ID + index, extra)
+                fmt = coord_formats.get(count)
+                if fmt is None:
+                    fmt = coord_formats[count] = " ".join(["%.7f,%.7f,0"] * count)
+                coordinates = fmt % tuple(flat[pos : pos + 2 * count])
+                pos += 2 * count
+
+                parts.append(
+                    placemark(f"{out_path.stem}.{index}", tags.get("name"), tags, coordinates)
+                )
+            f.write("".join(parts))
+        f.write(FOOTER)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("out", help="KML file to write")
+    parser.add_argument("--placemarks", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", default=DEFAULT_PROFILE_CSV, help="trails_summary.csv to sample")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE_KML, help="KML to take extra tags from")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = generate(args.out, args.placemarks, args.seed, args.profile, args.template)
+    size_mb = path.stat().st_size / 2**20
+    print(
+        f"Wrote {args.placemarks:,} placemarks to {path} ({size_mb:,.1f} MB) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
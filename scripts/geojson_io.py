@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+GeoJSON FeatureCollection I/O
+FeatureCollectionWriter streams features to disk as they are produced
+instead of building the whole collection and calling json.dump on it.
+It writes either the indented layout json.dump(..., indent=2) produced
+(byte for byte) or compact JSON with no whitespace, gzips paths ending in
+.gz, and can round geometry coordinates to a fixed number of decimals.
+It records where each feature's text lies in the (uncompressed) output,
+so a later run writing the same layout can copy unchanged features
+verbatim with write_text instead of encoding them again.
+
+iter_features goes the other way: it yields a collection's features one at
+a time while reading the file in chunks, so memory is bounded by the
+largest feature rather than the file.
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+COMPACT_SEPARATORS = (",", ":")
+READ_CHUNK_CHARS = 1 << 20
+WHITESPACE = " \t\n\r"
+
+
+def open_text(path, mode: str = "r"):
+    """Open a UTF-8 text file, (de)compressing transparently for *.gz"""
+    path = Path(path)
+    if path.suffix != ".gz":
+        return open(path, mode, encoding="utf-8")
+    if "r" in mode:
+        return gzip.open(path, "rt", encoding="utf-8")
+    # mtime=0 keeps the compressed bytes reproducible
+    return io.TextIOWrapper(
+        gzip.GzipFile(filename=str(path), mode="wb", compresslevel=6, mtime=0),
+        encoding="utf-8",
+    )
+
+
+def round_coordinates(coordinates, precision: int):
+    """Round every number in a (nested) GeoJSON coordinates array"""
+    if isinstance(coordinates, list):
+        return [round_coordinates(c, precision) for c in coordinates]
+    return round(coordinates, precision)
+
+
+class FeatureCollectionWriter:
+    """
+    Write a FeatureCollection one feature at a time.
+
+    ``indent=None`` gives compact output; an integer gives the same text as
+    json.dump with that indent. ``precision`` rounds geometry coordinates
+    (the feature passed in is not modified). ``spans`` holds each feature's
+    [start, end) offset in the uncompressed text; json.dumps escapes
+    non-ASCII, so these are byte offsets too. Use as a context manager:
+
+        with FeatureCollectionWriter("data/trails.geojson.gz", indent=None) as out:
+            for feature in features:
+                out.write(feature)
+    """
+
+    def __init__(self, path, indent: Optional[int] = 2, precision: Optional[int] = None):
+        self.path = Path(path)
+        self.indent = indent
+        self.precision = precision
+        self.count = 0
+        self.spans: List[Tuple[int, int]] = []
+        self._offset = 0
+        self._file = None
+
+    def __enter__(self) -> "FeatureCollectionWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open_text(self.path, "w")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _dumps(self, obj: Any) -> str:
+        if self.indent is None:
+            return json.dumps(obj, separators=COMPACT_SEPARATORS)
+        return json.dumps(obj, indent=self.indent)
+
+    def write(self, feature: Dict[str, Any]) -> None:
+        if self.precision is not None and feature.get("geometry"):
+            geometry = feature["geometry"]
+            feature = {
+                **feature,
+                "geometry": {
+                    **geometry,
+                    "coordinates": round_coordinates(geometry["coordinates"], self.precision),
+                },
+            }
+
+        if self.indent is None:
+            self.write_text(self._dumps(feature))
+        else:
+            # Nest the feature two levels deep, as json.dump would
+            pad = " " * (2 * self.indent)
+            self.write_text(pad + self._dumps(feature).replace("\n", "\n" + pad))
+
+    def write_text(self, text: str) -> None:
+        """A feature already encoded in this writer's layout, written verbatim"""
+        if self.indent is None:
+            separator = '{"type":"FeatureCollection","features":[' if not self.count else ","
+        elif not self.count:
+            pad = " " * self.indent
+            separator = f'{{\n{pad}"type": "FeatureCollection",\n{pad}"features": [\n'
+        else:
+            separator = ",\n"
+        start = self._offset + len(separator)
+        self._file.write(separator)
+        self._file.write(text)
+        self._offset = start + len(text)
+        self.spans.append((start, self._offset))
+        self.count += 1
+
+    def write_all(self, features: Iterable[Dict[str, Any]]) -> int:
+        for feature in features:
+            self.write(feature)
+        return self.count
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        if not self.count:
+            self._file.write(self._dumps({"type": "FeatureCollection", "features": []}))
+        elif self.indent is None:
+            self._file.write("]}")
+        else:
+            self._file.write(f"\n{' ' * self.indent}]\n}}")
+        self._file.close()
+        self._file = None
+
+
+def write_feature_collection(
+    path, features: Iterable[Dict[str, Any]], indent: Optional[int] = 2, precision: Optional[int] = None
+) -> int:
+    """Write features as a FeatureCollection; returns the feature count"""
+    with FeatureCollectionWriter(path, indent=indent, precision=precision) as out:
+        return out.write_all(features)
+
+
+class _JsonStream:
+    """Text buffer over a file that json values are decoded from in place"""
+
+    def __init__(self, f, chunk_size: int):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of file), not consumed"""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._read_more():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading ahead until it is complete"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue
+                raise
+            # A number running to the end of the buffer may continue past it
+            if end == len(self.buf) and self._read_more():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_features(path, chunk_size: int = READ_CHUNK_CHARS) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the features of a FeatureCollection file one at a time.
+
+    Other top-level members are read and discarded. Raises ValueError if
+    the file is not a JSON object or is malformed.
+    """
+    with open_text(path) as f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == "features":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield stream.value()
+                        if stream.peek() == "]":
+                            stream.pos += 1
+                            break
+                        stream.expect(",")
+            else:
+                stream.value()
+            if stream.peek() == "}":
+                return
+            stream.expect(",")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Streaming KML Placemark reader
+Yields one record per Placemark using iterparse, clearing each element
+once it has been read so memory stays flat regardless of file size
+"""
+
+import hashlib
+import sys
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from osm_tags import parse_osm_tags
+from trail_geometry import parse_coordinate_texts
+
+# KML namespace
+KML_NS = "http://www.opengis.net/kml/2.2"
+NS = {"kml": KML_NS}
+
+PLACEMARK_TAG = f"{{{KML_NS}}}Placemark"
+NAME_TAG = f"{{{KML_NS}}}name"
+DESCRIPTION_TAG = f"{{{KML_NS}}}description"
+COORDINATES_PATH = ".//kml:LineString/kml:coordinates"
+
+
+def parse_description(description: Optional[str]) -> Dict[str, str]:
+    """Parse the CDATA description field to extract OSM tags"""
+    return parse_osm_tags(description)
+
+
+def parse_coordinates(coord_string: Optional[str]) -> List[Tuple[float, float]]:
+    """Parse KML coordinate string into list of (lon, lat) tuples"""
+    if not coord_string:
+        return []
+
+    coords = []
+    for coord in coord_string.strip().split():
+        parts = coord.split(",")
+        if len(parts) >= 2:
+            lon, lat = float(parts[0]), float(parts[1])
+            coords.append((lon, lat))
+    return coords
+
+
+def placemark_hash(name: Optional[str], tags: Dict[str, str], geometry: bytes) -> str:
+    """Digest of name, tags and geometry; independent of file position"""
+    digest = hashlib.sha1()
+    digest.update(repr(name).encode("utf-8"))
+    for key, value in tags.items():
+        digest.update(f"\x1f{key}\x1e{value}".encode("utf-8"))
+    digest.update(b"\x1d")
+    digest.update(geometry)
+    return digest.hexdigest()
+
+
+@dataclass
+class Placemark:
+    """One KML Placemark: name, OSM tags and raw LineString coordinates"""
+
+    index: int
+    name: Optional[str]
+    tags: Dict[str, str]
+    coordinates_text: Optional[str]
+
+    @property
+    def has_linestring(self) -> bool:
+        return self.coordinates_text is not None
+
+    @property
+    def coordinates(self) -> List[Tuple[float, float]]:
+        """(lon, lat) pairs, parsed on demand"""
+        return parse_coordinates(self.coordinates_text)
+
+    def content_hash(self) -> str:
+        return placemark_hash(
+            self.name, self.tags, repr(self.coordinates_text).encode("utf-8")
+        )
+
+
+@dataclass
+class PlacemarkBatch:
+    """
+    A run of consecutive Placemarks with geometry in ragged-array form.
+
+    Trail j's (lon, lat) vertices are vertices[offsets[j]:offsets[j + 1]];
+    placemarks without a LineString have an empty slice and
+    has_linestring[j] False.
+    """
+
+    indices: List[int]
+    names: List[Optional[str]]
+    tags: List[Dict[str, str]]
+    has_linestring: np.ndarray
+    vertices: np.ndarray
+    offsets: np.ndarray
+    hashes: List[str]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def num_coordinates(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @classmethod
+    def from_placemarks(cls, placemarks: List[Placemark]) -> "PlacemarkBatch":
+        vertices, offsets = parse_coordinate_texts(
+            [p.coordinates_text for p in placemarks]
+        )
+        return cls(
+            indices=[p.index for p in placemarks],
+            names=[p.name for p in placemarks],
+            tags=[p.tags for p in placemarks],
+            has_linestring=np.array([p.has_linestring for p in placemarks], dtype=bool),
+            vertices=vertices,
+            offsets=offsets,
+            hashes=[p.content_hash() for p in placemarks],
+        )
+
+
+class PlacemarkReader:
+    """
+    Iterate over the Placemarks of a KML file at constant memory.
+
+    Each Placemark element is detached from its parent as soon as it has been
+    converted into a record, so the tree never holds more than one trail.
+    Throughput is tracked while iterating and available via
+    ``placemarks_per_second`` / ``report()``. Pass ``tag_keys`` to extract
+    only the OSM tags a stage actually uses.
+
+    ``kml_path`` may also be a binary file object (e.g. one shard of a larger
+    file); ``index_start`` is the number of placemarks that precede it.
+    """
+
+    def __init__(
+        self,
+        kml_path,
+        progress_every: int = 0,
+        tag_keys: Optional[Iterable[str]] = None,
+        index_start: int = 0,
+    ):
+        self.kml_path = kml_path
+        self.progress_every = progress_every
+        self.index_start = index_start
+        self.tag_keys = tuple(tag_keys) if tag_keys is not None else None
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __iter__(self) -> Iterator[Placemark]:
+        self.count = 0
+        self.elapsed = 0.0
+        start = time.perf_counter()
+
+        # Track open elements so a finished Placemark can be removed from its
+        # parent; clearing alone would leave empty shells attached to <Folder>
+        stack = []
+        source = self.kml_path if hasattr(self.kml_path, "read") else str(self.kml_path)
+        try:
+            for event, elem in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    stack.append(elem)
+                    continue
+
+                stack.pop()
+                if elem.tag != PLACEMARK_TAG:
+                    continue
+
+                self.count += 1
+                record = self._to_record(
+                    elem, self.index_start + self.count, self.tag_keys
+                )
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+
+                if self.progress_every and self.count % self.progress_every == 0:
+                    self.elapsed = time.perf_counter() - start
+                    print(
+                        f"  Read {self.count:,} placemarks "
+                        f"({self.placemarks_per_second:,.0f} placemarks/sec)..."
+                    )
+
+                yield record
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    def iter_batches(self, batch_size: int = 4096) -> Iterator[PlacemarkBatch]:
+        """Stream Placemarks in batches with bulk-parsed coordinates"""
+        pending = []
+        for placemark in self:
+            pending.append(placemark)
+            if len(pending) >= batch_size:
+                yield PlacemarkBatch.from_placemarks(pending)
+                pending = []
+        if pending:
+            yield PlacemarkBatch.from_placemarks(pending)
+
+    @staticmethod
+    def _to_record(
+        elem: ET.Element, index: int, tag_keys: Optional[Iterable[str]] = None
+    ) -> Placemark:
+        name_elem = elem.find(NAME_TAG)
+        desc_elem = elem.find(DESCRIPTION_TAG)
+        coords_elem = elem.find(COORDINATES_PATH, NS)
+
+        return Placemark(
+            index=index,
+            name=name_elem.text if name_elem is not None else None,
+            tags=parse_osm_tags(
+                desc_elem.text if desc_elem is not None else None, tag_keys
+            ),
+            coordinates_text=(coords_elem.text or "") if coords_elem is not None else None,
+        )
+
+    @property
+    def placemarks_per_second(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.count / self.elapsed
+
+    def report(self) -> str:
+        """One-line throughput summary for the last pass"""
+        return (
+            f"Read {self.count:,} placemarks in {self.elapsed:.2f}s "
+            f"({self.placemarks_per_second:,.0f} placemarks/sec)"
+        )
+
+
+def iter_placemarks(
+    kml_path, progress_every: int = 0, tag_keys: Optional[Iterable[str]] = None
+) -> Iterator[Placemark]:
+    """Convenience wrapper: stream Placemark records from a KML file"""
+    return iter(
+        PlacemarkReader(kml_path, progress_every=progress_every, tag_keys=tag_keys)
+    )
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "trails.kml"
+    reader = PlacemarkReader(path, progress_every=1000)
+    for _ in reader:
+        pass
+    print(reader.report())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Byte-range sharding for large KML files
+Splits a KML into contiguous byte ranges that start on a <Placemark> tag so
+each range can be parsed independently in a worker process. Shards are
+numbered in file order and carry the global index of their first placemark,
+so merged results are identical to a serial pass.
+"""
+
+import io
+import mmap
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+PLACEMARK_OPEN = re.compile(rb"<Placemark[\s>]")
+PLACEMARK_CLOSE = b"</Placemark>"
+XML_DECLARATION = re.compile(rb"<\?xml[^>]*\?>")
+KML_ROOT = re.compile(rb"<kml\b[^>]*>")
+DEFAULT_ROOT = b'<kml xmlns="http://www.opengis.net/kml/2.2">'
+
+
+@dataclass
+class Shard:
+    """Byte range [start, end) of a KML file holding whole Placemarks"""
+
+    shard_id: int
+    start: int
+    end: int
+    first_index: int  # placemarks before this shard
+    num_placemarks: int
+
+
+def plan_shards(kml_path, num_shards: int) -> List[Shard]:
+    """
+    Cut the file into about num_shards ranges aligned on <Placemark> tags.
+
+    Each candidate cut point is moved forward to the next opening tag, so no
+    placemark straddles two shards. Empty ranges are dropped.
+    """
+    with open(kml_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        first = PLACEMARK_OPEN.search(mm)
+        if first is None:
+            return []
+        last_close = mm.rfind(PLACEMARK_CLOSE)
+        data_start = first.start()
+        data_end = last_close + len(PLACEMARK_CLOSE)
+
+        cuts = [data_start]
+        span = data_end - data_start
+        for k in range(1, max(num_shards, 1)):
+            target = data_start + span * k // num_shards
+            match = PLACEMARK_OPEN.search(mm, max(target, cuts[-1] + 1), data_end)
+            if match is None:
+                break
+            if match.start() > cuts[-1]:
+                cuts.append(match.start())
+        cuts.append(data_end)
+
+        shards = []
+        first_index = 0
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            count = len(PLACEMARK_OPEN.findall(mm, start, end))
+            shards.append(Shard(len(shards), start, end, first_index, count))
+            first_index += count
+    return shards
+
+
+def read_shard(kml_path, shard: Shard) -> io.BytesIO:
+    """
+    Return the shard's Placemarks wrapped in a minimal standalone KML document.
+
+    Only the Placemark elements are kept, so folder boundaries that fall
+    inside a range can't unbalance the fragment. The file's own <kml> root
+    tag and XML declaration are reused so namespace prefixes and the declared
+    encoding still apply.
+    """
+    path = Path(kml_path)
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        declaration = XML_DECLARATION.match(head.lstrip())
+        root = KML_ROOT.search(head)
+        f.seek(shard.start)
+        data = f.read(shard.end - shard.start)
+
+    parts = [
+        declaration.group(0) if declaration else b"",
+        root.group(0) if root else DEFAULT_ROOT,
+        b"<Document>",
+    ]
+    pos = 0
+    while True:
+        match = PLACEMARK_OPEN.search(data, pos)
+        if match is None:
+            break
+        close = data.find(PLACEMARK_CLOSE, match.start())
+        if close < 0:
+            break
+        pos = close + len(PLACEMARK_CLOSE)
+        parts.append(data[match.start() : pos])
+    parts.append(b"</Document></kml>")
+    return io.BytesIO(b"".join(parts))
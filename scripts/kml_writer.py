@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+KML writer in the OSM export's layout
+The inverse of kml_reader: one LineString Placemark per trail, with the
+tags as an escaped CDATA "<b>key:</b> value<br/>" table, so files written
+here read back through PlacemarkReader like the original export.
+"""
+
+from html import escape
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+HEADER = (
+    '<?xml version="1.0" encoding="utf-8" ?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+    '<Document id="root_doc">\n'
+    "<Folder><name>{folder}</name>\n"
+)
+FOOTER = "</Folder>\n</Document></kml>\n"
+STYLE = (
+    "\t<Style><LineStyle><color>ff0000ff</color></LineStyle>"
+    "<PolyStyle><fill>0</fill></PolyStyle></Style>\n"
+)
+
+
+def description(tags: Dict[str, Any]) -> str:
+    body = "".join(f"<b>{key}:</b> {value}<br/>" for key, value in tags.items())
+    return escape(f"<![CDATA[{body}]]>", quote=False)
+
+
+def placemark(
+    placemark_id: str, name: Optional[str], tags: Dict[str, Any], coordinates_text: str
+) -> str:
+    """One <Placemark> element; ``name`` None omits <name> like unnamed ways"""
+    parts = [f'  <Placemark id="{escape(placemark_id)}">\n']
+    if name is not None:
+        parts.append(f"\t<name>{escape(name, quote=False)}</name>\n")
+    parts.append(f"\t<description>{description(tags)}</description>\n")
+    parts.append(STYLE)
+    parts.append(f"      <LineString><coordinates>{coordinates_text}</coordinates></LineString>\n")
+    parts.append("  </Placemark>\n")
+    return "".join(parts)
+
+
+def coordinates_text(coordinates) -> str:
+    """KML coordinate text for [[lon, lat], ...] (shortest round-trip floats)"""
+    return " ".join(f"{lon!r},{lat!r}" for lon, lat in coordinates)
+
+
+class KmlWriter:
+    """Write Placemarks to a KML file one at a time (use as a context manager)"""
+
+    def __init__(self, path, folder: Optional[str] = None):
+        self.path = Path(path)
+        self.folder = folder if folder is not None else self.path.stem
+        self.count = 0
+        self._file = None
+
+    def __enter__(self) -> "KmlWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(HEADER.format(folder=escape(self.folder, quote=False)))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, name: Optional[str], tags: Dict[str, Any], coordinates: str) -> None:
+        """Add a Placemark; ``coordinates`` is KML coordinate text"""
+        self.count += 1
+        self._file.write(placemark(f"{self.folder}.{self.count}", name, tags, coordinates))
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._file.write(FOOTER)
+        self._file.close()
+        self._file = None
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+OSM tag extractor for KML Placemark descriptions
+The OSM KML export stores tags as HTML inside a CDATA block:
+
+    <![CDATA[<b>OSM ID:</b> 16417691<br/><b>highway:</b> track<br/>...]]>
+
+parse_osm_tags splits that block with plain string operations instead of
+running a regex per placemark, and can look up just the keys a caller needs
+without materialising the rest.
+"""
+
+from typing import Dict, Iterable, Optional
+
+CDATA_OPEN = "<![CDATA["
+CDATA_CLOSE = "]]>"
+KEY_OPEN = "<b>"
+KEY_CLOSE = ":</b>"
+VALUE_CLOSE = "<br/>"
+
+
+def cdata_content(description: Optional[str]) -> Optional[str]:
+    """Return the text inside the first CDATA block, or None"""
+    if not description:
+        return None
+    start = description.find(CDATA_OPEN)
+    if start < 0:
+        return None
+    start += len(CDATA_OPEN)
+    end = description.find(CDATA_CLOSE, start)
+    if end < 0:
+        return None
+    return description[start:end]
+
+
+def parse_osm_tags(
+    description: Optional[str], keys: Optional[Iterable[str]] = None
+) -> Dict[str, str]:
+    """
+    Extract OSM tags from a CDATA description.
+
+    Agrees with the legacy ``<b>(.*?):</b>\\s*(.*?)(?:<br/>|$)`` regex on the
+    single-line blocks the exporter writes. With ``keys`` only those tags are
+    looked up, each with one substring search, and nothing else is built.
+    """
+    content = cdata_content(description)
+    if content is None:
+        return {}
+
+    if keys is not None:
+        return _lookup_keys(content, keys)
+
+    tags = {}
+    for item in content.split(VALUE_CLOSE):
+        key, sep, value = item.partition(KEY_CLOSE)
+        if not sep:
+            continue
+        key_start = key.find(KEY_OPEN)
+        if key_start < 0:
+            continue
+        tags[key[key_start + len(KEY_OPEN) :].strip()] = value.strip()
+    return tags
+
+
+def _lookup_keys(content: str, keys: Iterable[str]) -> Dict[str, str]:
+    tags = {}
+    for key in keys:
+        marker = f"{KEY_OPEN}{key}{KEY_CLOSE}"
+        start = content.find(marker)
+        if start < 0:
+            continue
+        start += len(marker)
+        end = content.find(VALUE_CLOSE, start)
+        tags[key] = (content[start:end] if end >= 0 else content[start:]).strip()
+    return tags
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Skip rewriting pipeline outputs that would not change
+Re-running a script used to rewrite every output even when nothing had
+changed. Each stage now records in data/cache/output_manifest.json:
+
+- an input fingerprint: SHA-256 over the stage's input files, its
+  parameters and its code (the scripts it names and every pipeline module
+  they import, so editing an unrelated script does not rerun it). When it
+  matches and the recorded outputs are untouched on disk, the stage is
+  skipped entirely.
+- a content hash of every output. When a stage does run, outputs are
+  written to a .staging/ directory beside the target under the same file
+  name (so writers that key off the name, like .gz, behave the same); a
+  staged file whose content matches the existing output is discarded, so
+  the old file (and its mtime) is kept.
+
+Either way the stage reports which outputs were written and which reused.
+
+    with StagedOutputs("filter", [kml_path], vars(args), code=[__file__]) as outputs:
+        if outputs.unchanged():
+            return
+        write_geojson(outputs.path("data/filtered_trails.geojson"))
+"""
+
+import ast
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from file_hashes import DEFAULT_CACHE_DIR, file_sha256, source_hash
+
+DEFAULT_MANIFEST_PATH = DEFAULT_CACHE_DIR / "output_manifest.json"
+MANIFEST_VERSION = 1
+CODE_DIR = Path(__file__).resolve().parent
+STAGING_DIR = ".staging"
+
+
+def code_files(scripts: Iterable[Any]) -> List[Path]:
+    """The given scripts and every module of CODE_DIR they import, directly or not"""
+    pending = [Path(script).resolve() for script in scripts]
+    seen = set()
+    while pending:
+        script = pending.pop()
+        if script in seen:
+            continue
+        seen.add(script)
+        for node in ast.walk(ast.parse(script.read_bytes(), str(script))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = CODE_DIR / f"{name.split('.')[0]}.py"
+                if module.exists():
+                    pending.append(module)
+    return sorted(seen)
+
+
+def fingerprint(
+    inputs: Iterable[Any],
+    params: Optional[Dict[str, Any]] = None,
+    code: Iterable[Any] = (),
+    cache_dir=DEFAULT_CACHE_DIR,
+) -> str:
+    """SHA-256 over the stage's code (see code_files), input files and parameters"""
+    digest = hashlib.sha256()
+    for script in code_files(code):
+        digest.update(f"{script.name}:{source_hash(script, cache_dir)}\n".encode())
+    for path in inputs:
+        path = Path(path)
+        content = source_hash(path, cache_dir) if path.exists() else "missing"
+        digest.update(f"{path}:{content}\n".encode())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(path=DEFAULT_MANIFEST_PATH) -> Dict[str, Any]:
+    path = Path(path)
+    if path.exists():
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "stages": {}}
+
+
+def _on_disk(path: Path, record: Dict[str, Any]) -> bool:
+    """True if the file is still the one the record describes"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return False
+    return stat.st_size == record["size"] and stat.st_mtime_ns == record["mtime_ns"]
+
+
+class StagedOutputs:
+    """
+    The outputs of one pipeline stage (see the module docstring).
+
+    ``code`` lists the scripts that write the outputs, normally just the
+    stage script's ``[__file__]``.
+
+    Use as a context manager: write each output to ``path(final)``; on a
+    clean exit the staged files are compared with the current outputs and
+    either discarded (same content) or moved into place, and the manifest
+    is updated. On an exception the staged files are deleted.
+    """
+
+    def __init__(
+        self,
+        stage: str,
+        inputs: Iterable[Any] = (),
+        params: Optional[Dict[str, Any]] = None,
+        force: bool = False,
+        manifest_path=DEFAULT_MANIFEST_PATH,
+        code: Iterable[Any] = (),
+    ):
+        self.stage = stage
+        self.force = force
+        self.manifest_path = Path(manifest_path)
+        self.manifest = load_manifest(self.manifest_path)
+        self.previous: Dict[str, Any] = self.manifest["stages"].get(stage, {})
+        self.fingerprint = fingerprint(inputs, params, code, self.manifest_path.parent)
+        self.staged: Dict[Path, Path] = {}
+        self.written: List[str] = []
+        self.reused: List[str] = []
+
+    def __enter__(self) -> "StagedOutputs":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            for staging in self.staged.values():
+                staging.unlink(missing_ok=True)
+            self._remove_staging_dirs()
+
+    def unchanged(self) -> bool:
+        """
+        True (and every recorded output marked reused) when the inputs match
+        the last run and none of its outputs were modified or removed since
+        """
+        if self.force or self.previous.get("fingerprint") != self.fingerprint:
+            return False
+        outputs = self.previous.get("outputs", {})
+        if not outputs or not all(_on_disk(Path(p), r) for p, r in outputs.items()):
+            return False
+        self.reused = list(outputs)
+        return True
+
+    def path(self, final) -> str:
+        """Staging path to write ``final`` to (same file name, in .staging/)"""
+        final = Path(final)
+        staging = final.parent / STAGING_DIR / final.name
+        staging.parent.mkdir(parents=True, exist_ok=True)
+        self.staged[final] = staging
+        return str(staging)
+
+    def _remove_staging_dirs(self) -> None:
+        for directory in {staging.parent for staging in self.staged.values()}:
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+        self.staged.clear()
+
+    def _current_hash(self, final: Path) -> Optional[str]:
+        if not final.exists():
+            return None
+        record = self.previous.get("outputs", {}).get(str(final))
+        if record and _on_disk(final, record):
+            return record["sha256"]
+        return file_sha256(final)
+
+    def commit(self) -> None:
+        """Move changed staged files into place and record the run"""
+        if not self.staged:
+            return
+        records: Dict[str, Any] = {}
+        for final, staging in self.staged.items():
+            if not staging.exists():
+                continue
+            digest = file_sha256(staging)
+            if digest == self._current_hash(final):
+                staging.unlink()
+                self.reused.append(str(final))
+            else:
+                os.replace(staging, final)
+                self.written.append(str(final))
+            stat = final.stat()
+            records[str(final)] = {
+                "sha256": digest,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        self._remove_staging_dirs()
+
+        self.manifest["stages"][self.stage] = {"fingerprint": self.fingerprint, "outputs": records}
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def report(self) -> None:
+        """Print which outputs were written and which were reused"""
+        if self.written:
+            print(f"\nOutputs written ({len(self.written)}):")
+            for path in self.written:
+                print(f"  {path}")
+        if self.reused:
+            print(f"\nOutputs reused, unchanged ({len(self.reused)}):")
+            for path in self.reused:
+                print(f"  {path}")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Declarative scoring rules, compiled to column expressions
+Criteria, weights and hard constraints live in scoring_rules.json rather
+than in module constants, so a new weighting is a JSON edit (or a copy
+passed with --rules) instead of a code change. Each named rule set there
+compiles into functions over whole columns: numeric tests are NumPy
+comparisons, and string tests run once per distinct value of their
+column, however many trails share it.
+
+A rule set has ``criteria`` (points per trail) and ``constraints``
+(pass/fail per trail). A criterion awards ``points`` when its ``when``
+test holds, takes the first matching of several ``tiers`` (else
+``otherwise``, default 0), or takes its points from a computed column
+(``points_from``, at most ``max_points``). Tests:
+
+    {"column": "surface", "lower": true, "in": ["dirt", "ground"]}
+    {"column": "name", "startswith": "Trail "}
+    {"column": "ref", "upper": true, "contains": ["FS ", "FR "]}
+    {"column": "elevation_est", "between": [3000, 4500]}
+    {"column": "cell_coverage", ">=": 3}
+    {"column": "name", "notnull": true}
+    {"all": [...]}, {"any": [...]}, {"not": {...}}
+
+String tests compare ``str(value)``, after ``lower``/``upper`` if given.
+A missing value (None or NaN) fails every string test, so a ``not`` of one
+holds for it; rules that need a value say so with ``notnull``. A
+list-valued argument may instead name one of the file's ``sets`` as
+"$name".
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RULES_PATH = Path(__file__).with_name("scoring_rules.json")
+RULES_VERSION = 1
+
+STRING_TESTS = ("in", "startswith", "contains")
+NUMERIC_TESTS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+# A compiled test maps the input columns to one bool per row
+Columns = Mapping[str, Any]
+Test = Callable[[Columns], np.ndarray]
+
+
+def by_value(values, predicate: Callable[[Any], bool]) -> np.ndarray:
+    """predicate(value) for every row, evaluated once per distinct value"""
+    if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+        # Missing values have code -1: the NaN appended last
+        codes = values.cat.codes.to_numpy()
+        uniques = list(values.cat.categories) + [np.nan]
+    else:
+        if isinstance(values, (list, tuple)):
+            values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.array([predicate(value) for value in uniques], dtype=bool)[codes]
+
+
+def _string_test(node: Dict[str, Any], sets: Dict[str, List[Any]]) -> Callable[[Any], bool]:
+    """One value -> bool function for a string test node, False for a missing value"""
+    test = _present_string_test(node, sets)
+    return lambda value: not pd.isna(value) and test(value)
+
+
+def _present_string_test(node: Dict[str, Any], sets: Dict[str, List[Any]]) -> Callable[[Any], bool]:
+    """The same, for values known to be present"""
+    def resolve(arg):
+        if isinstance(arg, str) and arg.startswith("$"):
+            return sets[arg[1:]]
+        return arg
+
+    if node.get("lower"):
+        normalize = lambda value: str(value).lower()
+    elif node.get("upper"):
+        normalize = lambda value: str(value).upper()
+    else:
+        normalize = str
+
+    (kind,) = [key for key in STRING_TESTS if key in node]
+    arg = resolve(node[kind])
+    if kind == "in":
+        members = set(arg)
+        return lambda value: normalize(value) in members
+    if kind == "startswith":
+        prefixes = arg if isinstance(arg, str) else tuple(arg)
+        return lambda value: normalize(value).startswith(prefixes)
+    parts = [arg] if isinstance(arg, str) else list(arg)
+    return lambda value: any(part in normalize(value) for part in parts)
+
+
+def _numeric_test(node: Dict[str, Any]) -> Test:
+    tests = []
+    if "between" in node:
+        low, high = node["between"]
+        tests += [(np.greater_equal, low), (np.less_equal, high)]
+    tests += [(op, node[key]) for key, op in NUMERIC_TESTS.items() if key in node]
+    if not tests:
+        raise ValueError(f"test on {node['column']!r} has no comparison: {node}")
+    column = node["column"]
+
+    def test(columns: Columns) -> np.ndarray:
+        values = np.asarray(columns[column])
+        result = tests[0][0](values, tests[0][1])
+        for op, bound in tests[1:]:
+            result &= op(values, bound)
+        return result
+
+    return test
+
+
+def _compile(node: Dict[str, Any], sets) -> Tuple[Optional[str], Callable]:
+    """
+    (column, value -> bool) when the whole test reads one string column,
+    so it can run once per distinct value; else (None, columns -> bools)
+    """
+    if "column" in node:
+        if "notnull" in node:
+            wanted = bool(node["notnull"])
+            return node["column"], lambda value: pd.isna(value) != wanted
+        if any(key in node for key in STRING_TESTS):
+            return node["column"], _string_test(node, sets)
+        return None, _numeric_test(node)
+
+    if "not" in node:
+        column, inner = _compile(node["not"], sets)
+        if column is not None:
+            return column, lambda value: not inner(value)
+        return None, lambda columns: ~inner(columns)
+
+    (kind,) = [key for key in ("all", "any") if key in node]
+    parts = [_compile(part, sets) for part in node[kind]]
+    combine = all if kind == "all" else any
+    if len({column for column, _ in parts}) == 1 and parts[0][0] is not None:
+        tests = [test for _, test in parts]
+        return parts[0][0], lambda value: combine(test(value) for test in tests)
+
+    tests = [_as_column_test(column, test) for column, test in parts]
+    reduce = np.logical_and if kind == "all" else np.logical_or
+
+    def test(columns: Columns) -> np.ndarray:
+        result = tests[0](columns)
+        for other in tests[1:]:
+            result = reduce(result, other(columns), out=result)
+        return result
+
+    return None, test
+
+
+def _as_column_test(column: Optional[str], test: Callable) -> Test:
+    if column is None:
+        return test
+    return lambda columns: by_value(columns[column], test)
+
+
+def compile_test(node: Dict[str, Any], sets: Optional[Dict[str, List[Any]]] = None) -> Test:
+    """A rule-file test as a function of the input columns"""
+    return _as_column_test(*_compile(node, sets or {}))
+
+
+@dataclass
+class Criterion:
+    name: str
+    label: str
+    tiers: List[Tuple[int, Test]] = field(default_factory=list)
+    otherwise: int = 0
+    points_from: Optional[str] = None
+    max_points: int = 0
+    description: str = ""
+
+    def points(self, columns: Columns) -> np.ndarray:
+        """Points per row, as int32"""
+        if self.points_from is not None:
+            return np.asarray(columns[self.points_from]).astype(np.int32, copy=False)
+        if len(self.tiers) == 1 and self.otherwise == 0:
+            points, test = self.tiers[0]
+            return test(columns) * np.int32(points)
+        result = None
+        for points, test in reversed(self.tiers):
+            otherwise = np.int32(self.otherwise) if result is None else result
+            result = np.where(test(columns), np.int32(points), otherwise)
+        return result
+
+
+@dataclass
+class Constraint:
+    name: str
+    label: str
+    description: str
+    test: Test
+
+
+@dataclass
+class RuleSet:
+    name: str
+    description: str
+    criteria: List[Criterion]
+    constraints: List[Constraint]
+
+    def weights(self) -> Dict[str, int]:
+        """Most points each criterion can award, by label"""
+        return {criterion.label: criterion.max_points for criterion in self.criteria}
+
+    def score(self, columns: Columns, rows: int) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Points per criterion (by name) and their total, for ``rows`` rows of ``columns``"""
+        points = {criterion.name: criterion.points(columns) for criterion in self.criteria}
+        total = np.zeros(rows, dtype=np.int32)
+        for column in points.values():
+            total += column
+        return points, total
+
+    def check(self, columns: Columns) -> Dict[str, np.ndarray]:
+        """Pass/fail per constraint (by name)"""
+        return {constraint.name: constraint.test(columns) for constraint in self.constraints}
+
+
+def _criterion(spec: Dict[str, Any], sets) -> Criterion:
+    name = spec["name"]
+    if "points_from" in spec:
+        return Criterion(
+            name,
+            spec.get("label", name),
+            points_from=spec["points_from"],
+            max_points=spec["max_points"],
+            description=spec.get("description", ""),
+        )
+    tiers = spec.get("tiers") or [{"points": spec["points"], "when": spec["when"]}]
+    compiled = [(tier["points"], compile_test(tier["when"], sets)) for tier in tiers]
+    otherwise = spec.get("otherwise", 0)
+    return Criterion(
+        name,
+        spec.get("label", name),
+        compiled,
+        otherwise,
+        max_points=max([points for points, _ in compiled] + [otherwise]),
+        description=spec.get("description", ""),
+    )
+
+
+def load_rules(path=DEFAULT_RULES_PATH) -> Dict[str, RuleSet]:
+    """Every rule set in a rules file, compiled, by name"""
+    with open(path) as f:
+        spec = json.load(f)
+    if spec.get("version") != RULES_VERSION:
+        raise ValueError(f"{path}: unsupported rules version {spec.get('version')!r}")
+    sets = spec.get("sets", {})
+    return {
+        name: RuleSet(
+            name,
+            rule_set.get("description", ""),
+            [_criterion(criterion, sets) for criterion in rule_set.get("criteria", [])],
+            [
+                Constraint(
+                    c["name"],
+                    c.get("label", c["name"]),
+                    c.get("description", ""),
+                    compile_test(c["when"], sets),
+                )
+                for c in rule_set.get("constraints", [])
+            ],
+        )
+        for name, rule_set in spec["rule_sets"].items()
+    }
+
+
+def load_rule_set(name: str, path=DEFAULT_RULES_PATH) -> RuleSet:
+    """One rule set of a rules file"""
+    rule_sets = load_rules(path)
+    if name not in rule_sets:
+        raise KeyError(f"{path} has no rule set {name!r} (has {sorted(rule_sets)})")
+    return rule_sets[name]
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Precomputed simplified trail geometry
+Trails keep every OSM vertex from the KML all the way to map polylines.
+This stage ranks every vertex of every trail once per algorithm
+(Douglas-Peucker and Visvalingam, each one vectorized pass over the ragged
+vertex arrays in trail_geometry), writes the simplified geometry at each
+tolerance to one .npz, and reports the vertex reduction at each tolerance.
+
+Tolerances are in meters: Douglas-Peucker drops vertices within t meters of
+the simplified line, Visvalingam those with an effective area under t² m².
+
+Usage: python scripts/simplify_trails.py [--tolerances 1,2,5,10,25,50] [--output data/trails_simplified.npz]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from trail_geometry import SIMPLIFIERS, keep_vertices, local_meters, simplify_threshold
+from trail_store import DEFAULT_GEOJSON_PATH, DEFAULT_KML_PATH, load_trail_geometry
+
+DEFAULT_OUTPUT = Path("data/trails_simplified.npz")
+REPORT_PATH = Path("data/simplification_report.json")
+DEFAULT_TOLERANCES = [1.0, 2.0, 5.0, 10.0, 25.0, 50.0]
+METHOD_KEYS = {"douglas-peucker": "dp", "visvalingam": "vw"}
+
+
+def level_key(method: str, tolerance_meters: float) -> str:
+    """Array name prefix of one simplification level, e.g. dp_5m"""
+    return f"{METHOD_KEYS[method]}_{tolerance_meters:g}m"
+
+
+def simplify_trails(
+    vertices: np.ndarray, offsets: np.ndarray, tolerances: Sequence[float]
+) -> Tuple[Dict[str, np.ndarray], List[Dict[str, Any]]]:
+    """
+    Level arrays for every method, plus one report row per tolerance.
+
+    Both algorithms keep nested vertex sets as the tolerance grows, so each
+    method is stored as one uint8 per vertex (how many of the ascending
+    ``tolerances`` the vertex survives) and the offsets of each level:
+    level k is vertices[levels > k] with ``{key}_offsets``.
+    """
+    meters = local_meters(vertices, offsets)
+    total = len(vertices)
+    arrays: Dict[str, np.ndarray] = {}
+    report = []
+    for method, significance_of in SIMPLIFIERS.items():
+        start = time.perf_counter()
+        significance = significance_of(meters, offsets)
+        seconds = time.perf_counter() - start
+
+        levels = np.zeros(total, dtype=np.uint8)
+        for tolerance in tolerances:
+            keep = significance > simplify_threshold(method, tolerance)
+            levels += keep
+            kept_vertices, kept_offsets = keep_vertices(vertices, offsets, keep)
+            arrays[f"{level_key(method, tolerance)}_offsets"] = kept_offsets
+            kept = len(kept_vertices)
+            report.append(
+                {
+                    "method": method,
+                    "tolerance_m": tolerance,
+                    "vertices": kept,
+                    "kept_fraction": round(kept / total, 4) if total else 0.0,
+                    "reduction_ratio": round(total / kept, 2) if kept else 0.0,
+                    "significance_seconds": round(seconds, 3),
+                }
+            )
+        arrays[f"{METHOD_KEYS[method]}_levels"] = levels
+    return arrays, report
+
+
+def load_simplified(
+    tolerance_meters: float, method: str = "douglas-peucker", path=DEFAULT_OUTPUT
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """(vertices, offsets, osm_ids) of one precomputed level"""
+    with np.load(path, allow_pickle=False) as data:
+        tolerances = data["tolerances_m"].tolist()
+        if tolerance_meters not in tolerances:
+            raise KeyError(f"{path} has no level at {tolerance_meters:g} m (has {tolerances})")
+        k = tolerances.index(tolerance_meters)
+        keep = data[f"{METHOD_KEYS[method]}_levels"] > k
+        offsets = data[f"{level_key(method, tolerance_meters)}_offsets"]
+        return data["vertices"][keep], offsets, data["osm_id"].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--tolerances",
+        default=",".join(f"{t:g}" for t in DEFAULT_TOLERANCES),
+        help="comma-separated tolerances in meters",
+    )
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="simplified geometry .npz")
+    parser.add_argument("--report", default=REPORT_PATH, help="reduction report JSON")
+    parser.add_argument("--kml", default=DEFAULT_KML_PATH, help="OSM trail export")
+    parser.add_argument("--geojson", default=DEFAULT_GEOJSON_PATH, help="used when the KML is absent")
+    args = parser.parse_args()
+    tolerances = sorted({float(t) for t in args.tolerances.split(",") if t})
+    if not 0 < len(tolerances) < 256:
+        parser.error("give between 1 and 255 tolerances")
+
+    print("Simplifying trail geometry...")
+    vertices, offsets, osm_ids = load_trail_geometry(args.kml, args.geojson)
+    start = time.perf_counter()
+    arrays, report = simplify_trails(vertices, offsets, tolerances)
+    elapsed = time.perf_counter() - start
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "wb") as f:
+        np.savez(
+            f,
+            osm_id=np.asarray(osm_ids, dtype=str),
+            tolerances_m=np.asarray(tolerances),
+            vertices=vertices,
+            offsets=offsets,
+            **arrays,
+        )
+
+    summary = {
+        "trails": len(offsets) - 1,
+        "vertices": len(vertices),
+        "seconds": round(elapsed, 3),
+        "levels": report,
+    }
+    with open(args.report, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"{len(offsets) - 1:,} trails, {len(vertices):,} vertices, simplified in {elapsed:.2f}s")
+    print(f"{'Method':<16} {'Tolerance':>10} {'Vertices':>11} {'Kept':>7} {'Reduction':>10}")
+    print("-" * 58)
+    for row in report:
+        print(
+            f"{row['method']:<16} {row['tolerance_m']:>8g} m {row['vertices']:>11,} "
+            f"{row['kept_fraction']:>7.1%} {row['reduction_ratio']:>9.1f}x"
+        )
+    print(f"\nWrote {output} ({output.stat().st_size / 2**20:,.1f} MB) and {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Streaming top-K selection
+Ranked lists (the top 50 candidates, the final top 20) used to come from
+sorting every scored trail and slicing off the first K. TopK consumes
+scored trails as they are produced, one at a time or a NumPy batch at a
+time, and only ever holds the best K plus any trails tied with the K-th,
+so memory is bounded by K however many trails stream past. It can report
+the current leaderboard every N trails during long runs.
+
+Order is that of a stable sort by descending score: higher scores first,
+and among equal scores the trail offered first wins, so the result is the
+same as ``sorted(trails, key=score, reverse=True)[:k]`` (or
+``DataFrame.nlargest(k, keep="first")``).
+"""
+
+import heapq
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class TopK:
+    """
+    The best ``k`` (score, item) pairs offered so far, plus ties with the
+    k-th.
+
+    ``on_leaderboard(topk)`` is called each time another ``every`` trails
+    have been offered (counting all of them, not just the ones kept).
+    """
+
+    def __init__(
+        self,
+        k: int,
+        every: Optional[int] = None,
+        on_leaderboard: Optional[Callable[["TopK"], None]] = None,
+    ):
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        self.every = every
+        self.on_leaderboard = on_leaderboard
+        self.seen = 0
+        # Min-heap of the best k as (score, -arrival, item): its root is the
+        # worst kept entry. Entries tied with the root but ranked below the
+        # k-th are kept aside.
+        self._heap: List[Tuple[Any, int, Any]] = []
+        self._ties: List[Tuple[Any, int, Any]] = []
+
+    def threshold(self):
+        """Lowest score that can still make the list (None until k are held)"""
+        return self._heap[0][0] if len(self._heap) == self.k else None
+
+    def _push(self, score, arrival: int, item) -> None:
+        entry = (score, -arrival, item)
+        heap = self._heap
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif score > heap[0][0]:
+            displaced = heapq.heapreplace(heap, entry)
+            if displaced[0] == heap[0][0]:
+                self._ties.append(displaced)
+            else:
+                self._ties.clear()
+        elif score == heap[0][0]:
+            self._ties.append(entry)
+
+    def _report(self, before: int) -> None:
+        if self.every and self.on_leaderboard and self.seen // self.every > before // self.every:
+            self.on_leaderboard(self)
+
+    def offer(self, score, item: Any = None) -> None:
+        """One scored trail (``item`` defaults to its position in the stream)"""
+        before = self.seen
+        self._push(score, before, before if item is None else item)
+        self.seen += 1
+        self._report(before)
+
+    def offer_many(self, scores: np.ndarray, items: Optional[Sequence[Any]] = None) -> None:
+        """
+        A batch of scored trails, in stream order. Only those that can make
+        the list are looked at one by one: the ones at or above the current
+        threshold, or, before k are held, the batch's own best k and ties
+        (found with argpartition). With a leaderboard, the batch is split
+        wherever another ``every`` trails have been offered, so each
+        leaderboard shows the trails offered up to that point.
+        """
+        scores = np.asarray(scores)
+        if not (self.every and self.on_leaderboard):
+            self._offer_batch(scores, items)
+            return
+        start = 0
+        while start < len(scores):
+            stop = min(len(scores), start + self.every - self.seen % self.every)
+            self._offer_batch(scores[start:stop], None if items is None else items[start:stop])
+            start = stop
+
+    def _offer_batch(self, scores: np.ndarray, items: Optional[Sequence[Any]]) -> None:
+        before = self.seen
+        threshold = self.threshold()
+        if threshold is None and len(scores) > self.k:
+            threshold = np.partition(scores, len(scores) - self.k)[len(scores) - self.k]
+        if threshold is None:
+            candidates = range(len(scores))
+        else:
+            candidates = np.flatnonzero(scores >= threshold).tolist()
+        values = scores.tolist()
+        for i in candidates:
+            self._push(values[i], before + i, before + i if items is None else items[i])
+        self.seen += len(scores)
+        self._report(before)
+
+    def leaders(self, ties: bool = False) -> List[Tuple[Any, Any]]:
+        """(score, item) best first; with ``ties``, also those tied with the k-th"""
+        entries = sorted(self._heap, reverse=True)
+        if ties:
+            entries += sorted(self._ties, reverse=True)
+        return [(score, item) for score, _, item in entries]
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def top_k_indices(scores: np.ndarray, k: int, ties: bool = False) -> np.ndarray:
+    """
+    Positions of the ``k`` highest scores, best first and earlier positions
+    first among equals (plus everything tied with the k-th, with ``ties``)
+    """
+    scores = np.asarray(scores)
+    if len(scores) > k > 0:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(len(scores))
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return order if ties else order[:k]
@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+"""
+Binary trail exchange format (.tcol)
+A column-oriented, spatially indexed alternative to text GeoJSON for
+handing trails between scripts. One file holds:
+
+- geometry as zigzag varint deltas of coordinates quantized to
+  ``precision`` decimals (7 by default, OSM's own precision, ~1 cm)
+- per-feature bounding boxes plus a packed Hilbert R-tree level (node
+  bounding boxes over runs of Hilbert-sorted features), so a bbox query
+  reads a few hundred boxes instead of every geometry
+- properties as a sparse (feature, key, value) table with typed values and
+  interned strings, readable one feature or one column at a time
+- a per-feature ``name_missing`` flag for placemarks that had no name
+  (analyze_trails names them "Trail N"), kept out of the properties
+
+The file is an 8-byte magic, a JSON header, then raw little-endian arrays
+at 8-byte aligned offsets. Readers memory-map it and decode only the rows
+they ask for.
+
+Usage: python scripts/trail_columns.py data/trails.geojson data/trails.tcol
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from trail_geometry import coordinate_lists, line_centroids
+
+MAGIC = b"TCOL\x00\x00\x00\x01"
+FORMAT_VERSION = 1
+DEFAULT_PRECISION = 7
+DEFAULT_NODE_SIZE = 64
+HILBERT_BITS = 16
+DECODE_CHUNK_ROWS = 4096
+
+GEOM_NONE, GEOM_POINT, GEOM_LINESTRING = 0, 1, 2
+GEOM_TYPES = {"Point": GEOM_POINT, "LineString": GEOM_LINESTRING}
+GEOM_NAMES = {code: name for name, code in GEOM_TYPES.items()}
+
+# Property value kinds
+KIND_NULL, KIND_STR, KIND_INT, KIND_FLOAT, KIND_BOOL, KIND_JSON = range(6)
+MAX_EXACT_INT = 1 << 53
+
+
+# ----------------------------------------------------------------------
+# Encoding helpers
+# ----------------------------------------------------------------------
+
+
+def zigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def varint_lengths(values: np.ndarray) -> np.ndarray:
+    """Encoded size in bytes of each unsigned 64-bit integer"""
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1 << (7 * k))
+    return lengths
+
+
+def encode_varints(values: np.ndarray) -> np.ndarray:
+    """LEB128-encode unsigned 64-bit integers into one byte array"""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = varint_lengths(values)
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max()) if len(values) else 0):
+        idx = np.flatnonzero(lengths > k)
+        low = (values[idx] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (lengths[idx] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[idx] + k] = (low | more).astype(np.uint8)
+    return out
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse of encode_varints"""
+    if not len(data):
+        return np.empty(0, dtype=np.uint64)
+    last = data < 0x80
+    ends = np.flatnonzero(last)
+    starts = np.zeros(len(ends), dtype=np.int64)
+    starts[1:] = ends[:-1] + 1
+    value_index = np.cumsum(last) - last
+    shift = ((np.arange(len(data)) - starts[value_index]) * 7).astype(np.uint64)
+    parts = (data & 0x7F).astype(np.uint64) << shift
+    return np.add.reduceat(parts, starts)
+
+
+def hilbert_keys(x: np.ndarray, y: np.ndarray, bits: int = HILBERT_BITS) -> np.ndarray:
+    """Distance along a Hilbert curve of integer grid points in [0, 2**bits)"""
+    n = 1 << bits
+    x = x.astype(np.int64)
+    y = y.astype(np.int64)
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return d
+
+
+def _pack_strings(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob plus byte offsets (byte offsets allow decoding one string)"""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class _Strings:
+    """Lazily decoded view of a packed string table"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._cache: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        value = self._cache.get(code)
+        if value is None:
+            start, end = int(self._offsets[code]), int(self._offsets[code + 1])
+            value = self._cache[code] = self._blob[start:end].tobytes().decode("utf-8")
+        return value
+
+    def tolist(self) -> List[str]:
+        return [self[code] for code in range(len(self))]
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+
+class TrailColumnsWriter:
+    """
+    Collect features and write them as a .tcol file on close.
+
+        with TrailColumnsWriter("data/trails.tcol") as out:
+            for feature in features:
+                out.add_feature(feature)
+
+    ``add`` takes properties and an (n, 2) vertex array directly, which
+    skips building coordinate lists when the caller already has arrays.
+    """
+
+    def __init__(
+        self,
+        path,
+        precision: int = DEFAULT_PRECISION,
+        node_size: int = DEFAULT_NODE_SIZE,
+    ):
+        self.path = Path(path)
+        self.precision = precision
+        self.node_size = node_size
+        self.count = 0
+
+        self._geom_types: List[int] = []
+        self._vertex_chunks: List[np.ndarray] = []
+        self._vertex_counts: List[int] = []
+        self._name_missing: List[bool] = []
+
+        self._prop_counts: List[int] = []
+        self._keys: Dict[str, int] = {}
+        self._prop_keys: List[int] = []
+        self._prop_kinds: List[int] = []
+        self._prop_nums: List[float] = []
+        self._prop_strs: List[int] = []
+        self._strings: Dict[str, int] = {}
+
+    def __enter__(self) -> "TrailColumnsWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+
+    def _string(self, value: str) -> int:
+        code = self._strings.get(value)
+        if code is None:
+            code = self._strings[value] = len(self._strings)
+        return code
+
+    def _add_value(self, value: Any) -> None:
+        num, string = 0.0, -1
+        if value is None:
+            kind = KIND_NULL
+        elif isinstance(value, str):
+            kind, string = KIND_STR, self._string(value)
+        elif isinstance(value, bool):
+            kind, num = KIND_BOOL, float(value)
+        elif isinstance(value, int) and -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+            kind, num = KIND_INT, float(value)
+        elif isinstance(value, float):
+            kind, num = KIND_FLOAT, value
+        else:
+            kind, string = KIND_JSON, self._string(json.dumps(value))
+        self._prop_kinds.append(kind)
+        self._prop_nums.append(num)
+        self._prop_strs.append(string)
+
+    def add(
+        self,
+        properties: Dict[str, Any],
+        vertices: Optional[np.ndarray],
+        geometry_type: str = "LineString",
+        name_missing: bool = False,
+    ) -> None:
+        self._name_missing.append(name_missing)
+        if vertices is None:
+            self._geom_types.append(GEOM_NONE)
+            self._vertex_counts.append(0)
+        else:
+            vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+            self._geom_types.append(GEOM_TYPES[geometry_type])
+            self._vertex_counts.append(len(vertices))
+            if len(vertices):
+                self._vertex_chunks.append(vertices)
+
+        for key, value in properties.items():
+            code = self._keys.get(key)
+            if code is None:
+                code = self._keys[key] = len(self._keys)
+            self._prop_keys.append(code)
+            self._add_value(value)
+        self._prop_counts.append(len(properties))
+        self.count += 1
+
+    def add_feature(self, feature: Dict[str, Any]) -> None:
+        geometry = feature.get("geometry")
+        properties = feature.get("properties") or {}
+        if not geometry:
+            self.add(properties, None)
+            return
+        kind = geometry["type"]
+        if kind not in GEOM_TYPES:
+            raise ValueError(f"unsupported geometry type {kind!r}")
+        self.add(properties, np.asarray(geometry["coordinates"], dtype=np.float64), kind)
+
+    def _geometry_arrays(self) -> Dict[str, np.ndarray]:
+        counts = np.asarray(self._vertex_counts, dtype=np.int64)
+        vertex_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=vertex_offsets[1:])
+        vertices = np.concatenate(self._vertex_chunks) if self._vertex_chunks else np.empty((0, 2))
+
+        quantized = np.rint(vertices * 10.0**self.precision).astype(np.int64)
+        deltas = quantized.copy()
+        deltas[1:] -= quantized[:-1]
+        firsts = vertex_offsets[:-1][counts > 0]
+        deltas[firsts] = quantized[firsts]
+        values = zigzag(deltas.ravel())
+        geom = encode_varints(values)
+
+        # Byte offset of each feature's first value
+        value_ends = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(varint_lengths(values), out=value_ends[1:])
+        geom_offsets = value_ends[2 * vertex_offsets]
+
+        # Bounding boxes in the quantized (stored) coordinates
+        bbox = np.full((len(counts), 4), np.nan)
+        nonempty = counts > 0
+        if nonempty.any():
+            stored = quantized / 10.0**self.precision
+            starts = vertex_offsets[:-1][nonempty]
+            bbox[nonempty, :2] = np.minimum.reduceat(stored, starts, axis=0)
+            bbox[nonempty, 2:] = np.maximum.reduceat(stored, starts, axis=0)
+
+        index_rows, node_bbox = self._spatial_index(bbox, nonempty)
+        return {
+            "geom_type": np.asarray(self._geom_types, dtype=np.uint8),
+            "name_missing": np.asarray(self._name_missing, dtype=bool),
+            "vertex_offsets": vertex_offsets,
+            "geom_offsets": geom_offsets,
+            "geom": geom,
+            "bbox": bbox,
+            "index_rows": index_rows,
+            "node_bbox": node_bbox,
+        }
+
+    def _spatial_index(self, bbox: np.ndarray, nonempty: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.flatnonzero(nonempty)
+        if not len(rows):
+            return rows.astype(np.int64), np.empty((0, 4))
+        boxes = bbox[rows]
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        low = centers.min(axis=0)
+        span = np.maximum(centers.max(axis=0) - low, 1e-12)
+        grid = ((centers - low) / span * ((1 << HILBERT_BITS) - 1)).astype(np.int64)
+        order = np.argsort(hilbert_keys(grid[:, 0], grid[:, 1]), kind="stable")
+        rows = rows[order]
+        boxes = boxes[order]
+        starts = np.arange(0, len(rows), self.node_size)
+        node_bbox = np.empty((len(starts), 4))
+        node_bbox[:, :2] = np.minimum.reduceat(boxes[:, :2], starts, axis=0)
+        node_bbox[:, 2:] = np.maximum.reduceat(boxes[:, 2:], starts, axis=0)
+        return rows.astype(np.int64), node_bbox
+
+    def _property_arrays(self) -> Dict[str, np.ndarray]:
+        prop_offsets = np.zeros(len(self._prop_counts) + 1, dtype=np.int64)
+        np.cumsum(self._prop_counts, out=prop_offsets[1:])
+        key_blob, key_offsets = _pack_strings(list(self._keys))
+        str_blob, str_offsets = _pack_strings(list(self._strings))
+        return {
+            "prop_offsets": prop_offsets,
+            "prop_keys": np.asarray(self._prop_keys, dtype=np.int32),
+            "prop_kind": np.asarray(self._prop_kinds, dtype=np.uint8),
+            "prop_num": np.asarray(self._prop_nums, dtype=np.float64),
+            "prop_str": np.asarray(self._prop_strs, dtype=np.int32),
+            "key_blob": key_blob,
+            "key_offsets": key_offsets,
+            "str_blob": str_blob,
+            "str_offsets": str_offsets,
+        }
+
+    def close(self) -> None:
+        arrays = self._geometry_arrays()
+        arrays.update(self._property_arrays())
+        bbox = arrays["node_bbox"]
+        bounds = (
+            [*bbox[:, :2].min(axis=0).tolist(), *bbox[:, 2:].max(axis=0).tolist()]
+            if len(bbox)
+            else None
+        )
+
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = [array.dtype.str, list(array.shape), offset]
+            offset += -(-array.nbytes // 8) * 8
+        header = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "count": self.count,
+                "precision": self.precision,
+                "node_size": self.node_size,
+                "bounds": bounds,
+                "arrays": layout,
+            }
+        ).encode("utf-8")
+        header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for array in arrays.values():
+                data = np.ascontiguousarray(array).tobytes()
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 8))
+
+
+def write_trail_columns(
+    path,
+    features: Iterable[Dict[str, Any]],
+    precision: int = DEFAULT_PRECISION,
+    node_size: int = DEFAULT_NODE_SIZE,
+) -> int:
+    """Write GeoJSON-style features as a .tcol file; returns the feature count"""
+    with TrailColumnsWriter(path, precision, node_size) as out:
+        for feature in features:
+            out.add_feature(feature)
+    return out.count
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+
+class TrailColumns:
+    """
+    Memory-mapped reader for a .tcol file.
+
+    Row numbers are the order features were written in. Nothing is decoded
+    up front: geometry, strings and property values are decoded for the
+    rows a caller asks for (``query`` finds rows by bounding box).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        data = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if data[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path}: not a .tcol file")
+        header_len = int(data[len(MAGIC) : len(MAGIC) + 8].view(np.uint64)[0])
+        base = len(MAGIC) + 8
+        header = json.loads(data[base : base + header_len].tobytes())
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported .tcol version {header['version']}")
+        base += header_len
+
+        self.count: int = header["count"]
+        self.precision: int = header["precision"]
+        self.node_size: int = header["node_size"]
+        self.bounds: Optional[List[float]] = header["bounds"]
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, (dtype, shape, offset) in header["arrays"].items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            self.arrays[name] = np.frombuffer(
+                data, dtype=dtype, count=count, offset=base + offset
+            ).reshape(shape)
+
+        a = self.arrays
+        # Files written before the flag existed read as all named
+        self.name_missing: np.ndarray = a.get("name_missing", np.zeros(self.count, dtype=bool))
+        self.keys = _Strings(a["key_blob"], a["key_offsets"]).tolist()
+        self._key_codes = {key: code for code, key in enumerate(self.keys)}
+        self._strings = _Strings(a["str_blob"], a["str_offsets"])
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def bboxes(self) -> np.ndarray:
+        """(N, 4) min lon, min lat, max lon, max lat per row (NaN without geometry)"""
+        return self.arrays["bbox"]
+
+    @property
+    def num_coordinates(self) -> np.ndarray:
+        return np.diff(self.arrays["vertex_offsets"])
+
+    # ------------------------------------------------------------------
+    # Spatial index
+    # ------------------------------------------------------------------
+
+    def query(self, bbox: Sequence[float]) -> np.ndarray:
+        """Rows whose bounding box intersects (min lon, min lat, max lon, max lat)"""
+        min_x, min_y, max_x, max_y = bbox
+        nodes = self.arrays["node_bbox"]
+        hit = np.flatnonzero(
+            (nodes[:, 0] <= max_x)
+            & (nodes[:, 2] >= min_x)
+            & (nodes[:, 1] <= max_y)
+            & (nodes[:, 3] >= min_y)
+        )
+        if not len(hit):
+            return np.empty(0, dtype=np.int64)
+        index_rows = self.arrays["index_rows"]
+        candidates = np.concatenate(
+            [index_rows[n * self.node_size : (n + 1) * self.node_size] for n in hit.tolist()]
+        )
+        boxes = self.bboxes[candidates]
+        keep = (
+            (boxes[:, 0] <= max_x)
+            & (boxes[:, 2] >= min_x)
+            & (boxes[:, 1] <= max_y)
+            & (boxes[:, 3] >= min_y)
+        )
+        return np.sort(candidates[keep])
+
+    # ------------------------------------------------------------------
+    # Geometry
+    # ------------------------------------------------------------------
+
+    def vertices(self, rows: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Decoded (vertices, offsets) for the given rows (default: all)"""
+        a = self.arrays
+        vertex_offsets = a["vertex_offsets"]
+        geom_offsets = a["geom_offsets"]
+        if rows is None:
+            data = a["geom"]
+            counts = np.diff(vertex_offsets)
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            bounds = zip(geom_offsets[rows].tolist(), geom_offsets[rows + 1].tolist())
+            data = np.concatenate([a["geom"][start:end] for start, end in bounds] or [a["geom"][:0]])
+            counts = vertex_offsets[rows + 1] - vertex_offsets[rows]
+
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        deltas = unzigzag(decode_varints(data)).reshape(-1, 2)
+        # Segmented cumulative sum: each trail's first vertex is absolute
+        walk = np.cumsum(deltas, axis=0)
+        before = np.zeros((len(counts), 2), dtype=np.int64)
+        nonempty = counts > 0
+        starts = offsets[:-1][nonempty]
+        previous = np.zeros((len(starts), 2), dtype=np.int64)
+        previous[starts > 0] = walk[starts[starts > 0] - 1]
+        before[nonempty] = previous
+        quantized = walk - np.repeat(before, counts, axis=0)
+        return quantized / 10.0**self.precision, offsets
+
+    def coordinates(self, i: int) -> List[List[float]]:
+        vertices, _ = self.vertices([i])
+        return vertices.tolist()
+
+    def centroids(self, rows: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Length-weighted (lon, lat) centroid of each row's line"""
+        return line_centroids(*self.vertices(rows))
+
+    # ------------------------------------------------------------------
+    # Properties
+    # ------------------------------------------------------------------
+
+    def _values(self, start: int, end: int) -> List[Any]:
+        """Decoded property values for entries [start, end)"""
+        a = self.arrays
+        strings = self._strings
+        values: List[Any] = []
+        for kind, num, string in zip(
+            a["prop_kind"][start:end].tolist(),
+            a["prop_num"][start:end].tolist(),
+            a["prop_str"][start:end].tolist(),
+        ):
+            if kind == KIND_STR:
+                values.append(strings[string])
+            elif kind == KIND_INT:
+                values.append(int(num))
+            elif kind == KIND_FLOAT:
+                values.append(num)
+            elif kind == KIND_BOOL:
+                values.append(bool(num))
+            elif kind == KIND_JSON:
+                values.append(json.loads(strings[string]))
+            else:
+                values.append(None)
+        return values
+
+    def properties(self, i: int) -> Dict[str, Any]:
+        a = self.arrays
+        start, end = int(a["prop_offsets"][i]), int(a["prop_offsets"][i + 1])
+        keys = self.keys
+        return {
+            keys[code]: value
+            for code, value in zip(a["prop_keys"][start:end].tolist(), self._values(start, end))
+        }
+
+    def column(self, key: str) -> List[Any]:
+        """One property for every row (None where a row lacks it)"""
+        values: List[Any] = [None] * self.count
+        code = self._key_codes.get(key)
+        if code is None:
+            return values
+        entries = np.flatnonzero(self.arrays["prop_keys"] == code)
+        rows = np.searchsorted(self.arrays["prop_offsets"], entries, side="right") - 1
+        for row, j in zip(rows.tolist(), entries.tolist()):
+            values[row] = self._values(j, j + 1)[0]
+        return values
+
+    def rows_where(self, key: str, values: Iterable[Any]) -> np.ndarray:
+        """Rows whose ``key`` property is one of ``values``, in row order"""
+        wanted = set(values)
+        return np.asarray(
+            [row for row, value in enumerate(self.column(key)) if value in wanted],
+            dtype=np.int64,
+        )
+
+    # ------------------------------------------------------------------
+    # Features
+    # ------------------------------------------------------------------
+
+    def iter_features(
+        self, rows: Optional[Sequence[int]] = None, bbox: Optional[Sequence[float]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """GeoJSON features for ``rows``, rows intersecting ``bbox``, or every row"""
+        if bbox is not None:
+            rows = self.query(bbox)
+        elif rows is None:
+            rows = np.arange(self.count)
+        rows = np.asarray(rows, dtype=np.int64)
+        geom_types = self.arrays["geom_type"]
+
+        for chunk_start in range(0, len(rows), DECODE_CHUNK_ROWS):
+            chunk = rows[chunk_start : chunk_start + DECODE_CHUNK_ROWS]
+            coordinates = coordinate_lists(*self.vertices(chunk))
+            for row, coords in zip(chunk.tolist(), coordinates):
+                kind = int(geom_types[row])
+                if kind == GEOM_NONE:
+                    geometry = None
+                elif kind == GEOM_POINT:
+                    geometry = {"type": "Point", "coordinates": coords[0]}
+                else:
+                    geometry = {"type": GEOM_NAMES[kind], "coordinates": coords}
+                yield {"type": "Feature", "properties": self.properties(row), "geometry": geometry}
+
+    def feature(self, i: int) -> Dict[str, Any]:
+        return next(self.iter_features([i]))
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    from geojson_io import iter_features
+
+    source, target = sys.argv[1], sys.argv[2]
+    count = write_trail_columns(target, iter_features(source))
+    print(
+        f"Wrote {count:,} features to {target} "
+        f"({Path(target).stat().st_size / 2**20:,.1f} MB, "
+        f"source {Path(source).stat().st_size / 2**20:,.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory trail table
+analyze_trails used to hold every trail as a dict with its tags, plus a
+GeoJSON feature dict carrying the same tags again and every vertex as a
+two-element Python list. TrailTable keeps the same information as columns:
+
+- name / osm_id / ref as lists of strings (ref interned), plus a flag for
+  placemarks that had no name (named "Trail N" here)
+- county / highway_type / surface / difficulty as int32 codes into a
+  Categories list
+- OSM tags once, as a sparse (trail, key code, interned value) table
+- geometry as one flat float64 (lon, lat) buffer with per-trail offsets
+
+Rows, CSV summaries and GeoJSON features are rebuilt on demand when the
+outputs are written.
+"""
+
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+CATEGORICAL_COLUMNS = ("county", "highway_type", "surface", "difficulty")
+STRING_COLUMNS = ("name", "osm_id", "ref")
+
+
+class Categories:
+    """String <-> small integer code mapping, codes in first-seen order"""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def recode(self, other: "Categories") -> np.ndarray:
+        """Map other's codes onto this mapping, adding unseen values"""
+        return np.array([self.code(value) for value in other.values], dtype=np.int32)
+
+
+def extract_county(tags: Dict[str, str]) -> str:
+    """Extract county from tiger:county tag"""
+    county_raw = tags.get("tiger:county", "Unknown")
+    # Parse "Buncombe, NC" -> "Buncombe"
+    if "," in county_raw:
+        return county_raw.split(",")[0].strip()
+    return county_raw
+
+
+def describe_trail(
+    name: str, tags: Dict[str, str], num_coordinates: int, distance_miles: float
+) -> Dict[str, Any]:
+    """Derive the summary fields for one trail (distance left unrounded)"""
+    return {
+        "name": name,
+        "osm_id": tags.get("OSM ID", "unknown"),
+        "county": extract_county(tags),
+        "distance_miles": distance_miles,
+        "highway_type": tags.get("highway", "unknown"),
+        "surface": tags.get("surface", "unknown"),
+        "difficulty": tags.get("sac_scale", tags.get("tracktype", "unknown")),
+        "ref": tags.get("ref", ""),
+        "num_coordinates": num_coordinates,
+    }
+
+
+class TrailTable:
+    """
+    Struct-of-arrays store for every trail an ingest produces.
+
+    Rows are appended in file order with ``append`` (scalar fields and tags)
+    while whole batches of vertices go in with ``add_vertices``; the vertex
+    counts given to ``append`` must add up to what ``add_vertices`` receives.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.osm_ids: List[str] = []
+        self.refs: List[str] = []
+        self.categories = {col: Categories() for col in CATEGORICAL_COLUMNS}
+        self._codes = {col: array("i") for col in CATEGORICAL_COLUMNS}
+        self._distance = array("d")
+        self._name_missing = bytearray()
+        self.indices = array("q")
+        self._hashes = bytearray()
+
+        self.tag_keys = Categories()
+        self._tag_key_codes = array("i")
+        self.tag_values: List[str] = []
+        self._tag_offsets = array("q", [0])
+
+        self._vertex_chunks: List[np.ndarray] = []
+        self._vertex_offsets = array("q", [0])
+        self._vertices: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def append(
+        self,
+        summary: Dict[str, Any],
+        tags: Dict[str, str],
+        num_vertices: int,
+        index: int,
+        content_hash: str,
+        name_missing: bool = False,
+    ) -> None:
+        """Add one trail from its describe_trail summary (unrounded distance)"""
+        intern = sys.intern
+        self.names.append(summary["name"])
+        self._name_missing.append(name_missing)
+        self.osm_ids.append(summary["osm_id"])
+        self.refs.append(intern(summary["ref"]))
+        for col in CATEGORICAL_COLUMNS:
+            self._codes[col].append(self.categories[col].code(summary[col]))
+        self._distance.append(summary["distance_miles"])
+        self.indices.append(index)
+        self._hashes += bytes.fromhex(content_hash)
+
+        for key, value in tags.items():
+            self._tag_key_codes.append(self.tag_keys.code(key))
+            self.tag_values.append(intern(value))
+        self._tag_offsets.append(len(self.tag_values))
+
+        self._vertex_offsets.append(self._vertex_offsets[-1] + num_vertices)
+
+    def add_vertices(self, vertices: np.ndarray) -> None:
+        if len(vertices):
+            self._vertex_chunks.append(vertices)
+            self._vertices = None
+
+    def extend(self, other: "TrailTable") -> None:
+        """Append every row of another table (e.g. the next shard)"""
+        self.names.extend(other.names)
+        self.osm_ids.extend(other.osm_ids)
+        self.refs.extend(other.refs)
+        for col in CATEGORICAL_COLUMNS:
+            mapping = self.categories[col].recode(other.categories[col])
+            self._codes[col].extend(mapping[other.codes(col)].tolist())
+        self._distance.extend(other._distance)
+        self._name_missing += other._name_missing
+        self.indices.extend(other.indices)
+        self._hashes += other._hashes
+
+        key_map = self.tag_keys.recode(other.tag_keys)
+        tag_base = len(self.tag_values)
+        self._tag_key_codes.extend(key_map[np.frombuffer(other._tag_key_codes, dtype=np.int32)].tolist())
+        self.tag_values.extend(other.tag_values)
+        self._tag_offsets.extend((other.tag_offsets[1:] + tag_base).tolist())
+
+        vertex_base = self._vertex_offsets[-1]
+        self._vertex_offsets.extend((other.vertex_offsets[1:] + vertex_base).tolist())
+        self.add_vertices(other.vertices)
+
+    # ------------------------------------------------------------------
+    # Columns
+    # ------------------------------------------------------------------
+
+    def codes(self, col: str) -> np.ndarray:
+        return np.frombuffer(self._codes[col], dtype=np.int32)
+
+    def column(self, col: str) -> List[str]:
+        """Decoded values of a summary column, one per trail"""
+        if col in self.categories:
+            values = self.categories[col].values
+            return [values[code] for code in self._codes[col]]
+        return {"name": self.names, "osm_id": self.osm_ids, "ref": self.refs}[col]
+
+    @property
+    def distance_miles(self) -> np.ndarray:
+        """Unrounded trail lengths"""
+        return np.frombuffer(self._distance, dtype=np.float64)
+
+    @property
+    def name_missing(self) -> np.ndarray:
+        """True where the placemark had no name (and got "Trail N")"""
+        return np.frombuffer(bytes(self._name_missing), dtype=bool)
+
+    @property
+    def hashes(self) -> List[str]:
+        raw = bytes(self._hashes)
+        return [raw[i : i + 20].hex() for i in range(0, len(raw), 20)]
+
+    @property
+    def tag_offsets(self) -> np.ndarray:
+        return np.frombuffer(self._tag_offsets, dtype=np.int64)
+
+    @property
+    def vertex_offsets(self) -> np.ndarray:
+        return np.frombuffer(self._vertex_offsets, dtype=np.int64)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        if self._vertices is None:
+            if len(self._vertex_chunks) == 1:
+                self._vertices = self._vertex_chunks[0]
+            elif self._vertex_chunks:
+                self._vertices = np.concatenate(self._vertex_chunks)
+            else:
+                self._vertices = np.empty((0, 2))
+            self._vertex_chunks = [self._vertices] if len(self._vertices) else []
+        return self._vertices
+
+    @property
+    def num_coordinates(self) -> np.ndarray:
+        return np.diff(self.vertex_offsets)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the array-backed columns (not the string lists)"""
+        arrays = [self._distance, self.indices, self._tag_key_codes, self._tag_offsets, self._vertex_offsets]
+        arrays.extend(self._codes.values())
+        return (
+            sum(a.itemsize * len(a) for a in arrays)
+            + len(self._hashes)
+            + len(self._name_missing)
+            + sum(chunk.nbytes for chunk in self._vertex_chunks)
+        )
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+
+    def tags(self, i: int) -> Dict[str, str]:
+        start, end = self._tag_offsets[i], self._tag_offsets[i + 1]
+        keys = self.tag_keys.values
+        return {
+            keys[self._tag_key_codes[j]]: self.tag_values[j] for j in range(start, end)
+        }
+
+    def coordinates(self, i: int) -> List[List[float]]:
+        """[lon, lat] pairs for one trail, as written to GeoJSON"""
+        return self.vertices[self._vertex_offsets[i] : self._vertex_offsets[i + 1]].tolist()
+
+    def summary(self, i: int) -> Dict[str, Any]:
+        """One trails_summary.csv row (distance rounded to 3 places)"""
+        return {
+            "name": self.names[i],
+            "osm_id": self.osm_ids[i],
+            "county": self.categories["county"][self._codes["county"][i]],
+            "distance_miles": round(self._distance[i], 3),
+            "highway_type": self.categories["highway_type"][self._codes["highway_type"][i]],
+            "surface": self.categories["surface"][self._codes["surface"][i]],
+            "difficulty": self.categories["difficulty"][self._codes["difficulty"][i]],
+            "ref": self.refs[i],
+            "num_coordinates": self._vertex_offsets[i + 1] - self._vertex_offsets[i],
+        }
+
+    def properties(self, i: int) -> Dict[str, Any]:
+        """GeoJSON properties: summary fields, then every OSM tag"""
+        props = self.summary(i)
+        del props["num_coordinates"]
+        props.update(self.tags(i))
+        return props
+
+    def feature(self, i: int) -> Dict[str, Any]:
+        return {
+            "type": "Feature",
+            "properties": self.properties(i),
+            "geometry": {"type": "LineString", "coordinates": self.coordinates(i)},
+        }
+
+    def iter_features(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.feature(i)
+
+    def longest_first(self) -> List[int]:
+        """Row order for the summary outputs: rounded distance, descending, stable"""
+        rounded = [round(d, 3) for d in self._distance]
+        return sorted(range(len(rounded)), key=rounded.__getitem__, reverse=True)
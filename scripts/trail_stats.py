@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Mergeable trail statistics
+TrailStats accumulates the figures behind trails_statistics.json from
+TrailTable rows, a whole batch at a time, and two accumulators built over
+different parts of a file (shards, incremental runs) combine with merge().
+
+Mileage is summed as integer ticks of 2**-32 miles rather than floats, so
+totals don't depend on how the trails were split up or in which order the
+pieces are merged.
+"""
+
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from trail_records import TrailTable
+
+TICKS_PER_MILE = 1 << 32
+
+
+def miles_to_ticks(miles: np.ndarray) -> np.ndarray:
+    return np.rint(np.asarray(miles, dtype=np.float64) * TICKS_PER_MILE).astype(np.int64)
+
+
+class TrailStats:
+    """
+    Counts and mileage by county, highway type, surface and difficulty.
+
+    ``total_trails`` counts placemarks read, including ones without usable
+    geometry; every other figure covers the trails in the table. Counter
+    keys keep first-seen file order, which breaks ties in most_common().
+    """
+
+    def __init__(self):
+        self.total_trails = 0
+        self.named_trails = 0
+        self.unnamed_trails = 0
+        self.forest_service_roads = 0
+        self.has_surface_tag = 0
+        self.has_difficulty_tag = 0
+        self.county_counts: Counter = Counter()
+        self.highway_types: Counter = Counter()
+        self.surface_types: Counter = Counter()
+        self.difficulty_levels: Counter = Counter()
+        self._county_ticks: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Accumulating
+    # ------------------------------------------------------------------
+
+    def update(
+        self, table: TrailTable, start: int = 0, placemarks: Optional[int] = None
+    ) -> None:
+        """
+        Add rows table[start:] (e.g. the batch just appended).
+
+        ``placemarks`` is how many placemarks those rows came from; it
+        defaults to the number of rows.
+        """
+        rows = len(table) - start
+        self.total_trails += rows if placemarks is None else placemarks
+        if rows <= 0:
+            return
+
+        names = table.names[start:]
+        unnamed = sum(1 for name in names if name.startswith("Trail "))
+        self.unnamed_trails += unnamed
+        self.named_trails += rows - unnamed
+        self.forest_service_roads += sum(1 for ref in table.refs[start:] if "FS " in ref)
+
+        county = table.categories["county"]
+        county_codes = table.codes("county")[start:]
+        counts = np.bincount(county_codes, minlength=len(county))
+        ticks = np.zeros(len(county), dtype=np.int64)
+        np.add.at(ticks, county_codes, miles_to_ticks(table.distance_miles[start:]))
+        for code in np.flatnonzero(counts).tolist():
+            name = county[code]
+            self.county_counts[name] += int(counts[code])
+            self._county_ticks[name] = self._county_ticks.get(name, 0) + int(ticks[code])
+
+        self.has_surface_tag += self._count(table, "surface", start, self.surface_types)
+        self.has_difficulty_tag += self._count(
+            table, "difficulty", start, self.difficulty_levels
+        )
+        self._count(table, "highway_type", start, self.highway_types, skip_unknown=False)
+
+    @staticmethod
+    def _count(
+        table: TrailTable, col: str, start: int, counter: Counter, skip_unknown: bool = True
+    ) -> int:
+        """Add per-value counts of a categorical column; returns rows counted"""
+        categories = table.categories[col]
+        counts = np.bincount(table.codes(col)[start:], minlength=len(categories))
+        added = 0
+        # Codes are in first-seen order, so new keys land in file order
+        for code in np.flatnonzero(counts).tolist():
+            value = categories[code]
+            if skip_unknown and value == "unknown":
+                continue
+            counter[value] += int(counts[code])
+            added += int(counts[code])
+        return added
+
+    def merge(self, other: "TrailStats") -> "TrailStats":
+        """Fold in statistics for the trails that follow this accumulator's"""
+        for attr in (
+            "total_trails",
+            "named_trails",
+            "unnamed_trails",
+            "forest_service_roads",
+            "has_surface_tag",
+            "has_difficulty_tag",
+        ):
+            setattr(self, attr, getattr(self, attr) + getattr(other, attr))
+        for attr in ("county_counts", "highway_types", "surface_types", "difficulty_levels"):
+            getattr(self, attr).update(getattr(other, attr))
+        for county, ticks in other._county_ticks.items():
+            self._county_ticks[county] = self._county_ticks.get(county, 0) + ticks
+        return self
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    @property
+    def total_miles(self) -> float:
+        return sum(self._county_ticks.values()) / TICKS_PER_MILE
+
+    @property
+    def county_miles(self) -> Dict[str, float]:
+        miles = defaultdict(float)
+        for county, ticks in self._county_ticks.items():
+            miles[county] = ticks / TICKS_PER_MILE
+        return miles
+
+    def export(self, longest: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """trails_statistics.json contents; ``longest`` is summary rows, longest first"""
+        county_miles = self.county_miles
+        return {
+            "summary": {
+                "total_trails": self.total_trails,
+                "total_miles": round(self.total_miles, 2),
+                "named_trails": self.named_trails,
+                "unnamed_trails": self.unnamed_trails,
+                "forest_service_roads": self.forest_service_roads,
+                "trails_with_surface_tag": self.has_surface_tag,
+                "trails_with_difficulty_tag": self.has_difficulty_tag,
+            },
+            "by_county": {
+                county: {
+                    "trail_count": self.county_counts[county],
+                    "total_miles": round(county_miles[county], 2),
+                    "avg_miles_per_trail": round(
+                        county_miles[county] / self.county_counts[county], 2
+                    ),
+                }
+                for county in sorted(self.county_counts.keys())
+            },
+            "by_highway_type": dict(self.highway_types.most_common()),
+            "by_surface": dict(self.surface_types.most_common()),
+            "by_difficulty": dict(self.difficulty_levels.most_common()),
+            "top_10_longest_trails": [
+                {
+                    "name": t["name"],
+                    "county": t["county"],
+                    "distance_miles": t["distance_miles"],
+                    "highway_type": t["highway_type"],
+                }
+                for t in longest[:10]
+            ],
+            "buncombe_county_summary": {
+                "trail_count": self.county_counts["Buncombe"],
+                "total_miles": round(county_miles["Buncombe"], 2),
+                "percentage_of_total": round(
+                    100 * self.county_counts["Buncombe"] / self.total_trails, 2
+                ),
+            },
+        }
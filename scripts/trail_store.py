@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Parse-once columnar trail store
+Builds a binary (.npz) column store from trails.kml the first time it is
+needed and reloads it on later runs. The cache is keyed by the SHA-256 of the
+KML, so refreshing the source file invalidates it automatically; each file
+name also carries a key of the source's path, so stores built from other
+KML files share the cache directory.
+"""
+
+import hashlib
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from feature_index import osm_id_key
+from file_hashes import DEFAULT_CACHE_DIR, source_hash
+from geojson_io import iter_features
+from kml_reader import PlacemarkReader
+from trail_columns import TrailColumns
+from trail_geometry import centroids, trail_lengths_miles, vertex_means
+from trail_records import describe_trail
+
+# Bump when the on-disk layout changes so stale caches are rebuilt
+STORE_VERSION = 2
+
+DEFAULT_KML_PATH = Path("trails.kml")
+DEFAULT_GEOJSON_PATH = Path("data/trails.geojson")
+
+# Per-trail string columns, in trails_summary.csv order
+STRING_COLUMNS = [
+    "name",
+    "osm_id",
+    "county",
+    "highway_type",
+    "surface",
+    "difficulty",
+    "ref",
+]
+
+
+def encode_strings(values: List[str]) -> Dict[str, np.ndarray]:
+    """Pack a list of strings into one UTF-8 blob plus character offsets"""
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    blob = np.frombuffer("".join(values).encode("utf-8"), dtype=np.uint8)
+    return {"blob": blob, "offsets": offsets}
+
+
+def decode_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Inverse of encode_strings: one decode, then slice by character offset"""
+    text = blob.tobytes().decode("utf-8")
+    bounds = offsets.tolist()
+    return [text[bounds[i] : bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+class TrailStore:
+    """
+    Column-oriented view of every trail in the KML.
+
+    Summary fields are stored one array per column, OSM tags as a sparse
+    (trail, key, value) table, and geometry as one flat (lon, lat) vertex
+    buffer with per-trail offsets plus each trail's vertex mean (the center
+    score_trail uses).
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], source_sha256: str = ""):
+        self.arrays = arrays
+        self.source_sha256 = source_sha256
+
+        self.columns = {
+            col: decode_strings(arrays[f"{col}_blob"], arrays[f"{col}_offsets"])
+            for col in STRING_COLUMNS
+        }
+        self.distance_miles = arrays["distance_miles"]
+        self.name_missing = arrays["name_missing"]
+        self.vertices = arrays["vertices"]
+        self.vertex_offsets = arrays["vertex_offsets"]
+        self.centers = arrays["centers"]
+
+        self.tag_offsets = arrays["tag_offsets"]
+        self.tag_key_codes = arrays["tag_key_codes"]
+        self.tag_keys = decode_strings(arrays["tag_keys_blob"], arrays["tag_keys_offsets"])
+        self.tag_values = decode_strings(
+            arrays["tag_values_blob"], arrays["tag_values_offsets"]
+        )
+
+    def __len__(self) -> int:
+        return len(self.distance_miles)
+
+    @property
+    def num_coordinates(self) -> np.ndarray:
+        return np.diff(self.vertex_offsets)
+
+    @property
+    def has_geometry(self) -> np.ndarray:
+        return self.num_coordinates > 0
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, kml_path, source_sha256: str = "") -> "TrailStore":
+        """Parse the KML once and collect every placemark into columns"""
+        reader = PlacemarkReader(kml_path)
+
+        columns = {col: [] for col in STRING_COLUMNS}
+        distances = []
+        name_missing = []
+        vertex_chunks = []
+        vertex_offsets = [np.zeros(1, dtype=np.int64)]
+        vertex_total = 0
+        centers = []
+        tag_key_index: Dict[str, int] = {}
+        tag_key_codes = []
+        tag_values = []
+        tag_offsets = [0]
+
+        for batch in reader.iter_batches():
+            lengths = trail_lengths_miles(batch.vertices, batch.offsets).tolist()
+            counts = batch.num_coordinates.tolist()
+
+            for j in range(len(batch)):
+                raw_name = batch.names[j]
+                name = raw_name if raw_name is not None else f"Trail {batch.indices[j]}"
+                summary = describe_trail(name, batch.tags[j], counts[j], lengths[j])
+
+                for col in STRING_COLUMNS:
+                    columns[col].append(summary[col])
+                distances.append(summary["distance_miles"])
+                name_missing.append(raw_name is None)
+
+                for key, value in batch.tags[j].items():
+                    tag_key_codes.append(tag_key_index.setdefault(key, len(tag_key_index)))
+                    tag_values.append(value)
+                tag_offsets.append(len(tag_values))
+
+            vertex_chunks.append(batch.vertices)
+            centers.append(vertex_means(batch.vertices, batch.offsets))
+            vertex_offsets.append(batch.offsets[1:] + vertex_total)
+            vertex_total += len(batch.vertices)
+
+        arrays = {}
+        for col in STRING_COLUMNS:
+            packed = encode_strings(columns[col])
+            arrays[f"{col}_blob"] = packed["blob"]
+            arrays[f"{col}_offsets"] = packed["offsets"]
+
+        packed = encode_strings(list(tag_key_index))
+        arrays["tag_keys_blob"] = packed["blob"]
+        arrays["tag_keys_offsets"] = packed["offsets"]
+        packed = encode_strings(tag_values)
+        arrays["tag_values_blob"] = packed["blob"]
+        arrays["tag_values_offsets"] = packed["offsets"]
+        arrays["tag_key_codes"] = np.asarray(tag_key_codes, dtype=np.int32)
+        arrays["tag_offsets"] = np.asarray(tag_offsets, dtype=np.int64)
+
+        arrays["distance_miles"] = np.asarray(distances, dtype=np.float64)
+        arrays["name_missing"] = np.asarray(name_missing, dtype=bool)
+        arrays["vertices"] = (
+            np.concatenate(vertex_chunks) if vertex_chunks else np.empty((0, 2))
+        )
+        arrays["vertex_offsets"] = np.concatenate(vertex_offsets)
+        arrays["centers"] = np.concatenate(centers) if centers else np.empty((0, 2))
+
+        print(f"  {reader.report()}")
+        return cls(arrays, source_sha256=source_sha256)
+
+    def save(self, path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Uncompressed: loading is a straight read, which is the point
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                store_version=np.asarray(STORE_VERSION),
+                source_sha256=np.asarray(self.source_sha256),
+                **self.arrays,
+            )
+
+    @classmethod
+    def load(cls, path) -> "TrailStore":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["store_version"]) != STORE_VERSION:
+                raise ValueError(f"{path}: unsupported store version")
+            arrays = {
+                k: data[k] for k in data.files if k not in ("store_version", "source_sha256")
+            }
+            source_sha256 = str(data["source_sha256"])
+        return cls(arrays, source_sha256=source_sha256)
+
+    # ------------------------------------------------------------------
+    # Row access
+    # ------------------------------------------------------------------
+
+    def tags(self, i: int) -> Dict[str, str]:
+        start, end = int(self.tag_offsets[i]), int(self.tag_offsets[i + 1])
+        keys = self.tag_keys
+        return {
+            keys[code]: self.tag_values[j]
+            for j, code in zip(range(start, end), self.tag_key_codes[start:end].tolist())
+        }
+
+    def property_column(self, col: str) -> List[str]:
+        """
+        One string column as properties() reports it for every trail: an OSM
+        tag with the same key (e.g. ``name`` on placemarks without <name>)
+        takes precedence over the summary value
+        """
+        values = list(self.columns[col])
+        if col in self.tag_keys:
+            entries = np.flatnonzero(self.tag_key_codes == self.tag_keys.index(col))
+            rows = np.searchsorted(self.tag_offsets, entries, side="right") - 1
+            for row, entry in zip(rows.tolist(), entries.tolist()):
+                values[row] = self.tag_values[entry]
+        return values
+
+    def coordinates(self, i: int) -> List[List[float]]:
+        """[lon, lat] pairs for one trail, as written to GeoJSON"""
+        start, end = int(self.vertex_offsets[i]), int(self.vertex_offsets[i + 1])
+        return self.vertices[start:end].tolist()
+
+    def summary(self, i: int) -> Dict[str, Any]:
+        """One trails_summary.csv row"""
+        row = {col: self.columns[col][i] for col in STRING_COLUMNS}
+        row["distance_miles"] = round(float(self.distance_miles[i]), 3)
+        row["num_coordinates"] = int(self.vertex_offsets[i + 1] - self.vertex_offsets[i])
+        return row
+
+    def centroids(self) -> np.ndarray:
+        """Mean (lon, lat) of every trail, computed over the vertex buffer"""
+        return centroids(self.vertices, self.vertex_offsets)
+
+    def properties(self, i: int) -> Dict[str, Any]:
+        """GeoJSON properties exactly as analyze_trails writes them"""
+        props = {
+            "name": self.columns["name"][i],
+            "osm_id": self.columns["osm_id"][i],
+            "county": self.columns["county"][i],
+            "distance_miles": round(float(self.distance_miles[i]), 3),
+            "highway_type": self.columns["highway_type"][i],
+            "surface": self.columns["surface"][i],
+            "difficulty": self.columns["difficulty"][i],
+            "ref": self.columns["ref"][i],
+        }
+        props.update(self.tags(i))
+        return props
+
+    def feature(self, i: int) -> Dict[str, Any]:
+        return {
+            "type": "Feature",
+            "properties": self.properties(i),
+            "geometry": {"type": "LineString", "coordinates": self.coordinates(i)},
+        }
+
+    def iter_features(self) -> Iterator[Dict[str, Any]]:
+        """Features for every trail with geometry, in KML order"""
+        for i in np.flatnonzero(self.has_geometry).tolist():
+            yield self.feature(i)
+
+    def to_geojson(self) -> Dict[str, Any]:
+        return {"type": "FeatureCollection", "features": list(self.iter_features())}
+
+
+def source_key(kml_path) -> str:
+    """Short key of the source file's resolved path"""
+    return hashlib.sha256(str(Path(kml_path).resolve()).encode()).hexdigest()[:8]
+
+
+def store_path_for(kml_path, digest: str, cache_dir=DEFAULT_CACHE_DIR) -> Path:
+    key = source_key(kml_path)
+    return Path(cache_dir) / f"trail_store_v{STORE_VERSION}_{key}_{digest[:16]}.npz"
+
+
+def load_trail_store(
+    kml_path=DEFAULT_KML_PATH, cache_dir=DEFAULT_CACHE_DIR, rebuild: bool = False
+) -> TrailStore:
+    """
+    Return the column store for kml_path, building it if the KML changed.
+
+    Stores built from earlier versions of the same source file are removed
+    when a new one is written; stores of other sources are left alone.
+    """
+    start = time.perf_counter()
+    digest = source_hash(kml_path, cache_dir)
+    path = store_path_for(kml_path, digest, cache_dir)
+
+    if path.exists() and not rebuild:
+        store = TrailStore.load(path)
+        print(
+            f"Loaded trail store {path} ({len(store):,} trails) "
+            f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+        return store
+
+    print(f"Building trail store from {kml_path}...")
+    store = TrailStore.build(kml_path, source_sha256=digest)
+    for stale in Path(cache_dir).glob(f"trail_store_v*_{source_key(kml_path)}_*.npz"):
+        if stale != path:
+            stale.unlink()
+    store.save(path)
+    print(
+        f"Saved trail store {path} ({len(store):,} trails) "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return store
+
+
+def newest_trail_output(geojson_path=DEFAULT_GEOJSON_PATH) -> Path:
+    """
+    analyze_trails.py output, whichever was written last: plain or gzipped
+    (--gzip) GeoJSON, or the binary trail columns (--columnar)
+    """
+    geojson_path = Path(geojson_path)
+    candidates = [
+        path
+        for path in (
+            geojson_path,
+            geojson_path.with_name(geojson_path.name + ".gz"),
+            geojson_path.with_suffix(".tcol"),
+        )
+        if path.exists()
+    ]
+    if not candidates:
+        return geojson_path
+    return max(candidates, key=lambda path: path.stat().st_mtime_ns)
+
+
+def trail_source(kml_path=DEFAULT_KML_PATH, geojson_path=DEFAULT_GEOJSON_PATH) -> Path:
+    """The file downstream stages read trails from: the KML, else newest_trail_output"""
+    if Path(kml_path).exists():
+        return Path(kml_path)
+    return newest_trail_output(geojson_path)
+
+
+def iter_trail_features(
+    kml_path=DEFAULT_KML_PATH, geojson_path=DEFAULT_GEOJSON_PATH
+) -> Iterator[Dict[str, Any]]:
+    """
+    Trail features for downstream stages, one at a time.
+
+    Served from the column store when the source KML is present; otherwise
+    streamed from the output analyze_trails.py wrote last without loading
+    the whole file. Trail columns hold coordinates quantized to 7 decimals.
+    """
+    if Path(kml_path).exists():
+        return load_trail_store(kml_path).iter_features()
+    path = newest_trail_output(geojson_path)
+    if path.suffix == ".tcol":
+        return TrailColumns(path).iter_features()
+    return iter_features(path)
+
+
+def load_trail_geometry(
+    kml_path=DEFAULT_KML_PATH, geojson_path=DEFAULT_GEOJSON_PATH
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    (vertices, offsets, osm_ids) of every trail as ragged arrays (see
+    trail_geometry), read straight from the column store or trail columns
+    when available, from the same sources as iter_trail_features
+    """
+    if Path(kml_path).exists():
+        store = load_trail_store(kml_path)
+        return store.vertices, store.vertex_offsets, store.columns["osm_id"]
+    path = newest_trail_output(geojson_path)
+    if path.suffix == ".tcol":
+        columns = TrailColumns(path)
+        vertices, offsets = columns.vertices()
+        return vertices, offsets, [osm_id_key(value) for value in columns.column("osm_id")]
+
+    chunks = []
+    osm_ids = []
+    for feature in iter_features(path):
+        geometry = feature.get("geometry") or {}
+        coords = geometry.get("coordinates") if geometry.get("type") == "LineString" else None
+        chunks.append(np.asarray(coords or [], dtype=np.float64).reshape(-1, 2))
+        osm_ids.append(osm_id_key(feature["properties"].get("osm_id")))
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+    vertices = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.float64)
+    return vertices, offsets, osm_ids
+
+
+def load_trail_geojson(
+    kml_path=DEFAULT_KML_PATH, geojson_path=DEFAULT_GEOJSON_PATH
+) -> Dict[str, Any]:
+    """Trail FeatureCollection for downstream stages (see iter_trail_features)"""
+    return {
+        "type": "FeatureCollection",
+        "features": list(iter_trail_features(kml_path, geojson_path)),
+    }
+
+
+if __name__ == "__main__":
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    load_trail_store(paths[0] if paths else DEFAULT_KML_PATH, rebuild="--rebuild" in sys.argv)
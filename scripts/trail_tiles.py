@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Vector-tile pyramid of the whole trail network
+create_treasure_map.py can only afford to draw the top 20 trails as
+polylines. This stage cuts every trail into a z/x/y pyramid of Mapbox
+Vector Tiles held in a single MBTiles (SQLite) file, so the full network
+can be browsed in any MVT viewer (MapLibre, QGIS, tileserver-gl):
+
+- geometry is projected to Web Mercator and Douglas-Peucker simplified per
+  zoom to SIMPLIFY_PIXELS screen pixels, so low zooms stay small; trails
+  that would collapse to a single tile unit drop out at that zoom
+- each tile keeps the runs of segments within BUFFER tile units of it
+- every feature carries the composite score, the hard-constraint result
+  (score_columns with the --rules file) and the OSM access tags, so the
+  map can be styled by score and access
+
+Tiles are gzipped MVT 2.1 with one "trails" layer, written by the small
+protobuf encoder below, so no tiling libraries are needed.
+
+Usage: python scripts/trail_tiles.py [--minzoom 6] [--maxzoom 14] [--output data/trails.mbtiles] [--rules FILE]
+"""
+
+import argparse
+import gzip
+import json
+import math
+import sqlite3
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from filter_and_score_trails import (
+    RULE_SET,
+    TrailScore,
+    score_columns,
+    score_table_from_features,
+    trail_scores,
+)
+from scoring_rules import DEFAULT_RULES_PATH, RuleSet, load_rule_set
+from trail_columns import encode_varints, varint_lengths, zigzag
+from trail_geometry import douglas_peucker_significance
+from trail_store import DEFAULT_GEOJSON_PATH, DEFAULT_KML_PATH, iter_trail_features
+
+DEFAULT_OUTPUT = Path("data/trails.mbtiles")
+DEFAULT_MINZOOM = 6
+DEFAULT_MAXZOOM = 14
+LAYER_NAME = "trails"
+EXTENT = 4096
+BUFFER = 64
+# Douglas-Peucker tolerance, in pixels of a 256 px tile
+SIMPLIFY_PIXELS = 0.5
+MAX_LATITUDE = 85.0511287798
+
+# OSM access tags copied onto every feature
+ACCESS_KEYS = ["access", "foot", "bicycle", "horse", "motor_vehicle"]
+
+# Feature attributes, with their MBTiles vector_layers field types
+FIELDS = {
+    "osm_id": "String",
+    "name": "String",
+    "county": "String",
+    "highway_type": "String",
+    "surface": "String",
+    "difficulty": "String",
+    "distance_miles": "Number",
+    "score": "Number",
+    "passes_constraints": "Boolean",
+    "elevation_est": "Number",
+    "drive_time_minutes": "Number",
+    **{key: "String" for key in ACCESS_KEYS},
+}
+
+# MVT geometry commands and types
+MOVE_TO, LINE_TO = 1, 2
+GEOM_LINESTRING = 2
+MVT_VERSION = 2
+
+
+# ----------------------------------------------------------------------
+# Protobuf encoding
+# ----------------------------------------------------------------------
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _key(field: int, wire: int) -> bytes:
+    return _varint((field << 3) | wire)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _value(value: Any) -> bytes:
+    """One Layer.Value message"""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint((value << 1) ^ (value >> 63))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+def encode_geometry(parts: List[np.ndarray]) -> np.ndarray:
+    """
+    MVT command integers for a (multi)linestring given as int64 (k, 2)
+    tile-coordinate parts, each with k >= 2 and no repeated vertices
+    """
+    commands = []
+    cursor = np.zeros((1, 2), dtype=np.int64)
+    for part in parts:
+        params = zigzag(np.diff(part, axis=0, prepend=cursor).ravel())
+        commands.append(np.array([MOVE_TO | (1 << 3)], dtype=np.uint64))
+        commands.append(params[:2])
+        commands.append(np.array([LINE_TO | ((len(part) - 1) << 3)], dtype=np.uint64))
+        commands.append(params[2:])
+        cursor = part[-1:]
+    return np.concatenate(commands)
+
+
+class TileLayer:
+    """
+    One MVT layer being filled: features plus interned keys and values.
+    Tag and geometry varints for the whole layer are encoded in one batch
+    by encode(), which is much cheaper than one small encode per feature.
+    """
+
+    def __init__(self, name: str = LAYER_NAME, extent: int = EXTENT):
+        self.name = name
+        self.extent = extent
+        self.features: List[Tuple[Optional[int], List[int], np.ndarray]] = []
+        self.keys: Dict[str, int] = {}
+        # Keyed by (type, value) so True and 1 stay distinct values
+        self.values: Dict[Tuple[type, Any], int] = {}
+
+    def add(
+        self, attributes: Dict[str, Any], geometry: np.ndarray, feature_id: Optional[int] = None
+    ) -> None:
+        tags = []
+        for key, value in attributes.items():
+            if value is None:
+                continue
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            tags.append(self.values.setdefault((type(value), value), len(self.values)))
+        self.features.append((feature_id, tags, geometry))
+
+    def _packed_fields(self) -> List[bytes]:
+        """Varint payloads of every feature's tags then geometry, in order"""
+        arrays = []
+        for _, tags, geometry in self.features:
+            arrays.append(np.array(tags, dtype=np.uint64))
+            arrays.append(geometry)
+        values = np.concatenate(arrays)
+        value_bounds = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum([len(a) for a in arrays], out=value_bounds[1:])
+        byte_bounds = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(varint_lengths(values), out=byte_bounds[1:])
+        data = encode_varints(values).tobytes()
+        bounds = byte_bounds[value_bounds].tolist()
+        return [data[bounds[i] : bounds[i + 1]] for i in range(len(arrays))]
+
+    def encode(self) -> bytes:
+        """A Tile message holding just this layer"""
+        parts = [_length_delimited(1, self.name.encode("utf-8"))]
+        packed = self._packed_fields()
+        for i, (feature_id, _, _) in enumerate(self.features):
+            body = b"" if feature_id is None else _key(1, 0) + _varint(feature_id)
+            body += _length_delimited(2, packed[2 * i])
+            body += _key(3, 0) + _varint(GEOM_LINESTRING)
+            body += _length_delimited(4, packed[2 * i + 1])
+            parts.append(_length_delimited(2, body))
+        parts.extend(_length_delimited(3, key.encode("utf-8")) for key in self.keys)
+        parts.extend(_length_delimited(4, _value(value)) for _, value in self.values)
+        parts.append(_key(5, 0) + _varint(self.extent))
+        parts.append(_key(15, 0) + _varint(MVT_VERSION))
+        return _length_delimited(3, b"".join(parts))
+
+
+# ----------------------------------------------------------------------
+# MBTiles container
+# ----------------------------------------------------------------------
+
+
+class MBTilesWriter:
+    """
+    Write an MBTiles file (use as a context manager). Tiles are built in a
+    temporary file that replaces ``path`` only if no exception was raised.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._db: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> "MBTilesWriter":
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp.unlink(missing_ok=True)
+        self._db = sqlite3.connect(self._tmp)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+            );
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+            """
+        )
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        self._db.commit()
+        self._db.close()
+        self._db = None
+        if exc_type is None:
+            self._tmp.replace(self.path)
+        else:
+            self._tmp.unlink(missing_ok=True)
+
+    def put_tiles(self, zoom: int, tiles: Iterator[Tuple[int, int, bytes]]) -> None:
+        """Store (x, y, data) tiles; y counts from the top (XYZ), rows are TMS"""
+        flip = (1 << zoom) - 1
+        self._db.executemany(
+            "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+            ((zoom, x, flip - y, data) for x, y, data in tiles),
+        )
+
+    def set_metadata(self, metadata: Dict[str, Any]) -> None:
+        self._db.executemany(
+            "INSERT INTO metadata VALUES (?, ?)",
+            ((name, str(value)) for name, value in metadata.items()),
+        )
+
+
+def read_tile(path, zoom: int, x: int, y: int) -> Optional[bytes]:
+    """Decompressed MVT bytes of one XYZ tile, or None if it is empty"""
+    with sqlite3.connect(path) as db:
+        row = db.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (zoom, x, (1 << zoom) - 1 - y),
+        ).fetchone()
+    return None if row is None else gzip.decompress(row[0])
+
+
+# ----------------------------------------------------------------------
+# Trails to tiles
+# ----------------------------------------------------------------------
+
+
+def mercator(vertices: np.ndarray) -> np.ndarray:
+    """(lon, lat) -> Web Mercator (x, y) as fractions of the world, y down"""
+    lat = np.radians(np.clip(vertices[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    x = (vertices[:, 0] + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0
+    return np.column_stack([x, y])
+
+
+def trail_attributes(trail: TrailScore, passes: bool, props: Dict[str, Any]) -> Dict[str, Any]:
+    """Tile attributes for one trail: identity, composite score and access"""
+    attributes = {
+        "osm_id": trail.osm_id,
+        "name": trail.name,
+        "county": trail.county,
+        "highway_type": trail.highway_type,
+        "surface": trail.surface,
+        "difficulty": trail.difficulty,
+        "distance_miles": round(trail.distance_miles, 2),
+        "score": trail.score,
+        "passes_constraints": passes,
+        "elevation_est": round(trail.elevation_est),
+        "drive_time_minutes": round(trail.drive_time_minutes),
+    }
+    for key in ACCESS_KEYS:
+        if props.get(key):
+            attributes[key] = str(props[key])
+    return attributes
+
+
+def load_trails(
+    kml_path=DEFAULT_KML_PATH,
+    geojson_path=DEFAULT_GEOJSON_PATH,
+    rules: Optional[RuleSet] = None,
+) -> Tuple[np.ndarray, np.ndarray, List[Dict[str, Any]]]:
+    """
+    (lon, lat) vertices, offsets and tile attributes of every LineString
+    trail, scored together with score_columns as the features stream past
+    """
+    chunks = []
+    access = []
+
+    def linestrings() -> Iterator[Dict[str, Any]]:
+        for feature in iter_trail_features(kml_path, geojson_path):
+            geometry = feature.get("geometry")
+            if not geometry or geometry.get("type") != "LineString":
+                continue
+            if len(geometry["coordinates"]) < 2:
+                continue
+            chunks.append(np.asarray(geometry["coordinates"], dtype=np.float64)[:, :2])
+            props = feature["properties"]
+            access.append({key: props[key] for key in ACCESS_KEYS if props.get(key)})
+            yield feature
+
+    table = score_table_from_features(linestrings())
+    scores = score_columns(table, rules)
+    attributes = [
+        trail_attributes(trail, passes, props)
+        for trail, passes, props in zip(
+            trail_scores(table, scores, range(len(table))), scores["passes"].tolist(), access
+        )
+    ]
+
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+    vertices = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.float64)
+    return vertices, offsets, attributes
+
+
+def tile_parts(
+    pixels: np.ndarray, zoom: int, extent: int = EXTENT, buffer: int = BUFFER
+) -> Iterator[Tuple[int, int, List[np.ndarray]]]:
+    """
+    Split one trail, in global tile units at ``zoom``, into the tiles it
+    crosses: (x, y, parts) with each part in that tile's coordinates. A part
+    is a run of consecutive segments that touch the buffered tile.
+    """
+    last_tile = (1 << zoom) - 1
+    low = np.clip((pixels.min(axis=0) - buffer) // extent, 0, last_tile)
+    high = np.clip((pixels.max(axis=0) + buffer) // extent, 0, last_tile)
+    if (low == high).all():
+        yield int(low[0]), int(low[1]), [pixels - low * extent]
+        return
+
+    segment_min = np.minimum(pixels[:-1], pixels[1:])
+    segment_max = np.maximum(pixels[:-1], pixels[1:])
+    for x in range(int(low[0]), int(high[0]) + 1):
+        for y in range(int(low[1]), int(high[1]) + 1):
+            origin = np.array([x, y], dtype=np.int64) * extent
+            inside = (
+                (segment_max >= origin - buffer) & (segment_min <= origin + extent + buffer)
+            ).all(axis=1)
+            if not inside.any():
+                continue
+            # Segment runs [start, end) cover vertices start..end
+            edges = np.diff(np.concatenate([[0], inside.astype(np.int8), [0]]))
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1)
+            yield x, y, [pixels[s : e + 1] - origin for s, e in zip(starts, ends)]
+
+
+def zoom_tiles(
+    projected: np.ndarray,
+    offsets: np.ndarray,
+    significance: np.ndarray,
+    attributes: List[Dict[str, Any]],
+    zoom: int,
+    extent: int = EXTENT,
+    buffer: int = BUFFER,
+) -> Dict[Tuple[int, int], TileLayer]:
+    """
+    Every non-empty tile at ``zoom``, keyed by XYZ (x, y). ``significance``
+    is the Douglas-Peucker significance of the projected vertices.
+    """
+    scale = float(extent << zoom)
+    keep = significance > SIMPLIFY_PIXELS / (256 << zoom)
+    layers: Dict[Tuple[int, int], TileLayer] = {}
+    bounds = offsets.tolist()
+    for i, attrs in enumerate(attributes):
+        start, end = bounds[i], bounds[i + 1]
+        points = projected[start:end][keep[start:end]] * scale
+        pixels = np.round(points).astype(np.int64)
+        moved = np.concatenate([[True], (pixels[1:] != pixels[:-1]).any(axis=1)])
+        pixels = pixels[moved]
+        if len(pixels) < 2:
+            continue
+
+        osm_id = attrs["osm_id"]
+        feature_id = int(osm_id) if osm_id.isdigit() else None
+        for x, y, parts in tile_parts(pixels, zoom, extent, buffer):
+            layer = layers.get((x, y))
+            if layer is None:
+                layer = layers[(x, y)] = TileLayer(extent=extent)
+            layer.add(attrs, encode_geometry(parts), feature_id)
+    return layers
+
+
+def build_tiles(
+    output=DEFAULT_OUTPUT,
+    minzoom: int = DEFAULT_MINZOOM,
+    maxzoom: int = DEFAULT_MAXZOOM,
+    kml_path=DEFAULT_KML_PATH,
+    geojson_path=DEFAULT_GEOJSON_PATH,
+    rules: Optional[RuleSet] = None,
+) -> Dict[str, Any]:
+    """Write the MBTiles pyramid and return per-zoom statistics"""
+    start = time.perf_counter()
+    vertices, offsets, attributes = load_trails(kml_path, geojson_path, rules)
+    if not attributes:
+        raise ValueError("no LineString trails to tile")
+    print(
+        f"Loaded and scored {len(attributes):,} trails ({len(vertices):,} vertices) "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    projected = mercator(vertices)
+    # Simplify once: every zoom's Douglas-Peucker tolerance is a threshold on it
+    significance = douglas_peucker_significance(projected, offsets)
+    west, south = vertices.min(axis=0).tolist()
+    east, north = vertices.max(axis=0).tolist()
+
+    stats = {"trails": len(attributes), "vertices": len(vertices), "zooms": {}}
+    with MBTilesWriter(output) as writer:
+        for zoom in range(minzoom, maxzoom + 1):
+            zoom_start = time.perf_counter()
+            layers = zoom_tiles(projected, offsets, significance, attributes, zoom)
+            tiles = [
+                (x, y, gzip.compress(layer.encode(), compresslevel=6, mtime=0))
+                for (x, y), layer in sorted(layers.items())
+            ]
+            writer.put_tiles(zoom, iter(tiles))
+            zoom_stats = {
+                "tiles": len(tiles),
+                "features": sum(len(layer.features) for layer in layers.values()),
+                "bytes": sum(len(data) for _, _, data in tiles),
+            }
+            stats["zooms"][zoom] = zoom_stats
+            print(
+                f"  z{zoom:<2} {zoom_stats['tiles']:>7,} tiles {zoom_stats['features']:>9,} features "
+                f"{zoom_stats['bytes'] / 1024:>10,.0f} KB  {time.perf_counter() - zoom_start:.1f}s"
+            )
+
+        vector_layer = {
+            "id": LAYER_NAME,
+            "description": "OSM trails with composite scores and access tags",
+            "minzoom": minzoom,
+            "maxzoom": maxzoom,
+            "fields": FIELDS,
+        }
+        writer.set_metadata(
+            {
+                "name": "Trail network",
+                "format": "pbf",
+                "type": "overlay",
+                "version": 1,
+                "description": f"{len(attributes):,} trails scored by filter_and_score_trails",
+                "minzoom": minzoom,
+                "maxzoom": maxzoom,
+                "bounds": f"{west},{south},{east},{north}",
+                "center": f"{(west + east) / 2},{(south + north) / 2},{min(minzoom + 4, maxzoom)}",
+                "json": json.dumps({"vector_layers": [vector_layer]}),
+            }
+        )
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="MBTiles file to write")
+    parser.add_argument("--minzoom", type=int, default=DEFAULT_MINZOOM)
+    parser.add_argument("--maxzoom", type=int, default=DEFAULT_MAXZOOM)
+    parser.add_argument("--kml", default=DEFAULT_KML_PATH, help="OSM trail export")
+    parser.add_argument("--geojson", default=DEFAULT_GEOJSON_PATH, help="used when the KML is absent")
+    parser.add_argument(
+        "--rules",
+        default=str(DEFAULT_RULES_PATH),
+        help=f'scoring rules file (its "{RULE_SET}" rule set; default: %(default)s)',
+    )
+    args = parser.parse_args()
+    if not 0 <= args.minzoom <= args.maxzoom <= 22:
+        parser.error("zooms must satisfy 0 <= minzoom <= maxzoom <= 22")
+
+    print("Building trail vector tiles...")
+    start = time.perf_counter()
+    rules = load_rule_set(RULE_SET, args.rules)
+    stats = build_tiles(args.output, args.minzoom, args.maxzoom, args.kml, args.geojson, rules)
+    total = sum(zoom["bytes"] for zoom in stats["zooms"].values())
+    tiles = sum(zoom["tiles"] for zoom in stats["zooms"].values())
+    print(
+        f"Wrote {tiles:,} tiles ({total / 2**20:,.1f} MB) to {args.output} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
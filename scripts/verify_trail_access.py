@@ -4,58 +4,33 @@ Comprehensive trail verification script to identify access restrictions
 and filter out private trails from the candidate list.
 """
 
-import json
-import re
-import xml.etree.ElementTree as ET
+import sys
 from pathlib import Path
 
 import pandas as pd
 
+from osm_tags import parse_osm_tags
+from output_cache import StagedOutputs
+from trail_store import load_trail_store
+
 
 def parse_kml_description(description):
     """Parse CDATA description field to extract OSM tags."""
-    tags = {}
-
-    # Extract CDATA content
-    cdata_match = re.search(r"<!\[CDATA\[(.*?)\]\]>", description, re.DOTALL)
-    if not cdata_match:
-        return tags
-
-    cdata_content = cdata_match.group(1)
-
-    # Parse each tag from the HTML-encoded format
-    # Format: <b>tag_name:</b> tag_value<br/>
-    tag_pattern = r"<b>(.*?):</b>\s*(.*?)(?:<br/>|$)"
-    matches = re.findall(tag_pattern, cdata_content)
-
-    for key, value in matches:
-        tags[key.strip()] = value.strip()
-
-    return tags
+    return parse_osm_tags(description)
 
 
 def parse_kml_file(kml_path):
     """Parse KML file and extract trail information with all tags."""
-    tree = ET.parse(kml_path)
-    root = tree.getroot()
-
-    # Define namespace
-    ns = {"kml": "http://www.opengis.net/kml/2.2"}
+    store = load_trail_store(kml_path)
 
     trails = []
 
-    for placemark in root.findall(".//kml:Placemark", ns):
-        name_elem = placemark.find("kml:name", ns)
-        desc_elem = placemark.find("kml:description", ns)
-
-        if name_elem is None or desc_elem is None:
+    for i in range(len(store)):
+        if store.name_missing[i]:
             continue
 
-        trail_name = name_elem.text
-        description = desc_elem.text
-
-        # Parse tags from description
-        tags = parse_kml_description(description)
+        trail_name = store.columns["name"][i]
+        tags = store.tags(i)
 
         if "OSM ID" not in tags:
             continue
@@ -110,14 +85,8 @@ def identify_access_restrictions(df):
     return df
 
 
-def main():
-    # Paths
-    base_dir = Path(".")
-    kml_path = base_dir / "trails.kml"
-    top_20_path = base_dir / "data" / "final_top_20.csv"
-    output_dir = base_dir / "data"
-    output_dir.mkdir(exist_ok=True)
-
+def verify_access(kml_path, top_20_path, output_dir, outputs):
+    """Flag restricted trails and re-rank the top 20 without them."""
     print("Step 1: Parsing KML file...")
     kml_df = parse_kml_file(kml_path)
     print(f"Parsed {len(kml_df)} trails from KML")
@@ -149,7 +118,7 @@ def main():
     # Save trails with restrictions
     restricted_df = kml_df[kml_df["has_any_restriction"]]
     restricted_path = output_dir / "private_trails_flagged.csv"
-    restricted_df.to_csv(restricted_path, index=False)
+    restricted_df.to_csv(outputs.path(restricted_path), index=False)
     print(f"\nSaved {len(restricted_df)} restricted trails to {restricted_path}")
 
     print("\nStep 3: Loading top 20 candidates...")
@@ -219,13 +188,13 @@ def main():
 
     # Save verified public trails
     verified_path = output_dir / "public_trails_verified.csv"
-    public_df.to_csv(verified_path, index=False)
+    public_df.to_csv(outputs.path(verified_path), index=False)
     print(f"\nSaved {len(public_df)} verified public trails to {verified_path}")
 
     # Save updated top 20
     top_20_verified = public_df.head(20)
     top_20_verified_path = output_dir / "top_20_verified.csv"
-    top_20_verified.to_csv(top_20_verified_path, index=False)
+    top_20_verified.to_csv(outputs.path(top_20_verified_path), index=False)
     print(f"Saved updated top 20 to {top_20_verified_path}")
 
     print("\n" + "=" * 80)
@@ -241,5 +210,27 @@ def main():
             print(f"   Ref: {row['ref']}")
 
 
+def main():
+    # Paths
+    base_dir = Path(".")
+    kml_path = base_dir / "trails.kml"
+    top_20_path = base_dir / "data" / "final_top_20.csv"
+    output_dir = base_dir / "data"
+    output_dir.mkdir(exist_ok=True)
+
+    # --force re-verifies even when the KML and top 20 are unchanged
+    with StagedOutputs(
+        "verify_trail_access",
+        [kml_path, top_20_path],
+        force="--force" in sys.argv,
+        code=[__file__],
+    ) as outputs:
+        if outputs.unchanged():
+            print(f"{kml_path} and {top_20_path} unchanged since the last run; nothing to verify")
+        else:
+            verify_access(kml_path, top_20_path, output_dir, outputs)
+    outputs.report()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Memory-mapped vertex store for random-access trail geometry
+Scripts that need a handful of trails (map polylines, satellite centroids)
+used to load every feature to find them. The vertex store keeps the trail
+geometry on disk as raw .npy arrays:
+
+- vertices.npy  (N, 2) float64 (lon, lat), all trails back to back
+- offsets.npy   int64, trail i is vertices[offsets[i]:offsets[i + 1]]
+- osm_ids.npy / rows.npy  sorted numeric OSM IDs and the row of each
+
+Opening it maps the files read-only (np.load(mmap_mode="r")), so reading a
+trail is a slice of the mapping with no copy and no parse, and worker
+processes that open the same store share the pages through the OS cache.
+The store lives in data/cache/, keyed by the SHA-256 of its source (the
+KML, or whichever analyze_trails.py output is newest), and is rebuilt
+when the source changes.
+
+Usage: python scripts/vertex_store.py [--rebuild] [osm_id ...]
+"""
+
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from feature_index import osm_id_key
+from file_hashes import DEFAULT_CACHE_DIR, source_hash
+from trail_geometry import line_centroids
+from trail_store import (
+    DEFAULT_GEOJSON_PATH,
+    DEFAULT_KML_PATH,
+    load_trail_geometry,
+    trail_source,
+)
+
+# Bump when the on-disk layout changes so stale stores are rebuilt
+VERTEX_STORE_VERSION = 1
+ARRAY_NAMES = ("vertices", "offsets", "osm_ids", "rows")
+
+
+def build_vertex_store(
+    directory, vertices: np.ndarray, offsets: np.ndarray, osm_ids: Sequence[Any]
+) -> Path:
+    """
+    Write a vertex store to ``directory``. OSM IDs that aren't numeric are
+    left out of the ID index; when an ID repeats, its first trail wins.
+    """
+    directory = Path(directory)
+    tmp = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    keys = [osm_id_key(value) for value in osm_ids]
+    numeric = np.array([key.isdigit() for key in keys], dtype=bool)
+    ids = np.array([int(key) if key.isdigit() else 0 for key in keys], dtype=np.int64)
+    rows = np.flatnonzero(numeric)
+    # Stable sort keeps duplicate IDs in row order, so the first trail wins
+    order = np.argsort(ids[rows], kind="stable")
+    arrays = {
+        "vertices": np.ascontiguousarray(vertices, dtype=np.float64).reshape(-1, 2),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "osm_ids": ids[rows][order],
+        "rows": rows[order],
+    }
+    for name in ARRAY_NAMES:
+        np.save(tmp / f"{name}.npy", arrays[name])
+    with open(tmp / "meta.json", "w") as f:
+        json.dump({"version": VERTEX_STORE_VERSION, "trails": len(offsets) - 1}, f)
+
+    shutil.rmtree(directory, ignore_errors=True)
+    tmp.rename(directory)
+    return directory
+
+
+class VertexStore:
+    """
+    Read-only memory-mapped trail geometry (see the module docstring).
+
+    Row access returns views into the mapping; copy them before writing.
+    Pickling a store pickles only its path, so a store passed to
+    multiprocessing workers is re-mapped there rather than copied.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        with open(self.directory / "meta.json") as f:
+            meta = json.load(f)
+        if meta.get("version") != VERTEX_STORE_VERSION:
+            raise ValueError(f"{self.directory}: unsupported vertex store version")
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.load(self.directory / f"{name}.npy", mmap_mode="r") for name in ARRAY_NAMES
+        }
+        self.vertex_array = self.arrays["vertices"]
+        self.offsets = self.arrays["offsets"]
+
+    def __reduce__(self):
+        return (VertexStore, (str(self.directory),))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def num_coordinates(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def row(self, osm_id: Any) -> Optional[int]:
+        """Row of the trail with this OSM ID, by binary search of the index"""
+        key = osm_id_key(osm_id)
+        if not key.isdigit():
+            return None
+        ids = self.arrays["osm_ids"]
+        value = int(key)
+        i = int(np.searchsorted(ids, value))
+        if i < len(ids) and ids[i] == value:
+            return int(self.arrays["rows"][i])
+        return None
+
+    def vertices(self, i: int) -> np.ndarray:
+        """(n, 2) (lon, lat) view of one trail's vertices"""
+        return self.vertex_array[int(self.offsets[i]) : int(self.offsets[i + 1])]
+
+    def coordinates(self, i: int) -> List[List[float]]:
+        """[lon, lat] pairs for one trail, as written to GeoJSON"""
+        return self.vertices(i).tolist()
+
+    def by_osm_id(self, osm_id: Any) -> Optional[np.ndarray]:
+        """Vertices of the trail with this OSM ID, or None if it is unknown"""
+        i = self.row(osm_id)
+        return None if i is None else self.vertices(i)
+
+    def centroids(self, rows: Sequence[int]) -> np.ndarray:
+        """Line centroids (as shapely computes them) of the given rows"""
+        chunks = [self.vertices(i) for i in rows]
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+        vertices = np.concatenate(chunks) if chunks else np.empty((0, 2))
+        return line_centroids(vertices, offsets)
+
+
+def vertex_store_path_for(digest: str, cache_dir=DEFAULT_CACHE_DIR) -> Path:
+    return Path(cache_dir) / f"vertex_store_v{VERTEX_STORE_VERSION}_{digest[:16]}"
+
+
+def open_vertex_store(
+    kml_path=DEFAULT_KML_PATH,
+    geojson_path=DEFAULT_GEOJSON_PATH,
+    cache_dir=DEFAULT_CACHE_DIR,
+    rebuild: bool = False,
+) -> VertexStore:
+    """
+    Map the vertex store for the current trail source, building it first if
+    the source changed. Raises FileNotFoundError when there is no source.
+    """
+    source = trail_source(kml_path, geojson_path)
+    if not source.exists():
+        raise FileNotFoundError(f"no trail source: {kml_path} or {geojson_path}")
+    digest = source_hash(source, cache_dir)
+    directory = vertex_store_path_for(digest, cache_dir)
+    if directory.exists() and not rebuild:
+        return VertexStore(directory)
+
+    start = time.perf_counter()
+    vertices, offsets, osm_ids = load_trail_geometry(kml_path, geojson_path)
+    build_vertex_store(directory, vertices, offsets, osm_ids)
+    for stale in Path(cache_dir).glob("vertex_store_v*"):
+        if stale != directory and stale.is_dir():
+            shutil.rmtree(stale)
+    print(
+        f"Built vertex store {directory} ({len(offsets) - 1:,} trails, "
+        f"{len(vertices):,} vertices) in {time.perf_counter() - start:.2f}s"
+    )
+    return VertexStore(directory)
+
+
+def main():
+    osm_ids = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    store = open_vertex_store(rebuild="--rebuild" in sys.argv)
+    print(f"{store.directory}: {len(store):,} trails, {len(store.vertex_array):,} vertices")
+    for osm_id in osm_ids:
+        start = time.perf_counter()
+        vertices = store.by_osm_id(osm_id)
+        micros = (time.perf_counter() - start) * 1e6
+        if vertices is None:
+            print(f"  {osm_id}: not found")
+        else:
+            print(f"  {osm_id}: {len(vertices):,} vertices in {micros:.0f} us, first {vertices[0].tolist()}")
+
+
+if __name__ == "__main__":
+    main()
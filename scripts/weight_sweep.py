@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Weight sweep: how stable is the trail ranking under other weightings?
+The hunt's post-mortem found that the filtering was sound and the ranking
+was not. This stage rescores every trail under thousands of random
+weightings around the rule set's own and reports how much each trail's
+rank moves, how often each makes the top K, and the smallest weight
+changes that change the top K.
+
+The trails x criteria matrix of points (score_columns at the rule set's
+weights) is built once. A weight vector is one multiplier per criterion
+(1 = the rule file's weight), so every weighting's scores are one matrix
+multiply. Trails with identical points on every criterion tie under every
+weighting, so only the distinct rows are scored and ranked, each counted
+as many times as it occurs.
+
+Only trails passing the rule set's hard constraints are ranked, as in
+filter_and_score_trails.py (--all-trails ranks every trail). Ranks are
+competition ranks: 1 + the number of ranked trails scoring strictly
+higher, so tied trails share a rank and the "top K" is every trail with
+rank <= K.
+
+Usage: python scripts/weight_sweep.py [--vectors 10000] [--spread 0.5] [--top 20] [--all-trails]
+"""
+
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from filter_and_score_trails import RULE_SET, load_score_table, score_columns
+from scoring_rules import DEFAULT_RULES_PATH, load_rule_set
+
+RANKS_CSV = Path("data/weight_sweep_ranks.csv")
+REPORT_PATH = Path("data/weight_sweep.json")
+RANKS_HEADER = [
+    "default_rank",
+    "osm_id",
+    "name",
+    "default_score",
+    "best_rank",
+    "p05_rank",
+    "median_rank",
+    "p95_rank",
+    "worst_rank",
+    "mean_rank",
+    "top_k_frequency",
+]
+PROFILE_STATS = [
+    "best_rank",
+    "p05_rank",
+    "median_rank",
+    "p95_rank",
+    "worst_rank",
+    "mean_rank",
+    "top_k_frequency",
+]
+LISTED_TRAILS = 5
+BLOCK_CELLS = 1 << 24  # profiles x weightings ranked at a time
+
+
+def weight_vectors(criteria: int, vectors: int, spread: float, seed: int) -> np.ndarray:
+    """
+    (vectors, criteria) multipliers, each uniform in [1 - spread, 1 + spread];
+    row 0 is the rule file's own weighting (all ones)
+    """
+    rng = np.random.default_rng(seed)
+    multipliers = rng.uniform(1.0 - spread, 1.0 + spread, (vectors, criteria))
+    multipliers[0] = 1.0
+    return multipliers
+
+
+def competition_ranks(scores: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Rank of every column of ``scores`` (weightings x profiles) in each
+    row, where column p stands for counts[p] tied trails: 1 + the trails
+    scoring strictly higher
+    """
+    order = np.argsort(-scores, axis=1)
+    ordered = np.take_along_axis(scores, order, axis=1)
+    ordered_counts = counts[order]
+    ahead = np.cumsum(ordered_counts, axis=1) - ordered_counts
+    # Equal scores are adjacent once sorted: each takes the count ahead of
+    # the first of its run
+    starts = np.ones_like(ordered, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ahead = np.maximum.accumulate(np.where(starts, ahead, 0), axis=1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, ahead + 1, axis=1)
+    return ranks
+
+
+def sweep(points: np.ndarray, multipliers: np.ndarray, top_k: int) -> Dict[str, Any]:
+    """
+    Rank statistics per trail over every weighting. ``points`` is trails x
+    criteria at the default weights, ``multipliers`` weightings x criteria.
+    """
+    profiles, trail_profile, counts = np.unique(
+        points, axis=0, return_inverse=True, return_counts=True
+    )
+    trail_profile = trail_profile.ravel()
+
+    # One matrix multiply scores every profile under every weighting (in
+    # blocks of weightings only when the profiles are many); ranks are
+    # then kept profile-major for the per-trail statistics
+    ranks = np.empty((len(profiles), len(multipliers)), dtype=np.int32)
+    step = max(1, BLOCK_CELLS // len(profiles))
+    for start in range(0, len(multipliers), step):
+        block = multipliers[start : start + step]
+        ranks[:, start : start + step] = competition_ranks(block @ profiles.T, counts).T
+
+    per_profile = {
+        key: np.empty(len(profiles), dtype=np.int32 if key in ("best_rank", "worst_rank") else np.float64)
+        for key in PROFILE_STATS
+    }
+    in_top = ranks <= top_k
+    step = max(1, BLOCK_CELLS // len(multipliers))
+    for start in range(0, len(profiles), step):
+        block = ranks[start : start + step]
+        rows = slice(start, start + step)
+        p05, median, p95 = np.percentile(block, [5, 50, 95], axis=1)
+        per_profile["best_rank"][rows] = block.min(axis=1)
+        per_profile["p05_rank"][rows] = p05
+        per_profile["median_rank"][rows] = median
+        per_profile["p95_rank"][rows] = p95
+        per_profile["worst_rank"][rows] = block.max(axis=1)
+        per_profile["mean_rank"][rows] = block.mean(axis=1)
+        per_profile["top_k_frequency"][rows] = in_top[start : start + step].mean(axis=1)
+    per_profile["default_rank"] = ranks[:, 0]
+    per_profile["default_score"] = profiles @ multipliers[0]
+
+    result: Dict[str, Any] = {
+        key: values[trail_profile] for key, values in per_profile.items()
+    }
+    # Weightings whose top K is not the default's, and whose #1 is not
+    result["top_k_changed"] = (in_top != in_top[:, [0]]).any(axis=0)
+    result["leader_changed"] = ((ranks == 1) != (ranks[:, [0]] == 1)).any(axis=0)
+    result["profile_in_top"] = in_top
+    result["trail_profile"] = trail_profile
+    result["profiles"] = len(profiles)
+    return result
+
+
+def _trail_list(table: pd.DataFrame, trail_profile: np.ndarray, profiles: np.ndarray) -> Dict[str, Any]:
+    """The trails having any of the given score profiles: how many, and the first few names"""
+    rows = np.flatnonzero(np.isin(trail_profile, profiles))
+    return {
+        "trails": len(rows),
+        "names": [str(name) for name in table["name"].iloc[rows[:LISTED_TRAILS]].tolist()],
+    }
+
+
+def flips(
+    table: pd.DataFrame,
+    result: Dict[str, Any],
+    multipliers: np.ndarray,
+    weights: Dict[str, int],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    The ``limit`` weightings closest to the default (largest relative
+    change to any one weight) that change the top K, with what enters and
+    leaves it
+    """
+    changed = np.flatnonzero(result["top_k_changed"])
+    distance = np.abs(multipliers[changed] - 1.0).max(axis=1)
+    in_top = result["profile_in_top"]
+    default_top = in_top[:, 0]
+    closest = []
+    for v in changed[np.argsort(distance, kind="stable")[:limit]]:
+        entering = np.flatnonzero(in_top[:, v] & ~default_top)
+        leaving = np.flatnonzero(default_top & ~in_top[:, v])
+        closest.append(
+            {
+                "max_relative_change": round(float(np.abs(multipliers[v] - 1.0).max()), 4),
+                "weights": {
+                    label: round(weight * float(m), 2)
+                    for (label, weight), m in zip(weights.items(), multipliers[v])
+                },
+                "enter": _trail_list(table, result["trail_profile"], entering),
+                "leave": _trail_list(table, result["trail_profile"], leaving),
+            }
+        )
+    return closest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vectors", type=int, default=10_000, help="weightings to try")
+    parser.add_argument(
+        "--spread", type=float, default=0.5, help="each weight varies by up to this fraction"
+    )
+    parser.add_argument("--top", type=int, default=20, help="K of the top-K list")
+    parser.add_argument("--flips", type=int, default=5, help="closest top-K-changing weightings to report")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--all-trails",
+        action="store_true",
+        help="rank every trail, not only those passing the hard constraints",
+    )
+    parser.add_argument("--rules", default=str(DEFAULT_RULES_PATH), help="scoring rules file")
+    parser.add_argument("--output", default=RANKS_CSV, help="per-trail rank statistics CSV")
+    parser.add_argument("--report", default=REPORT_PATH, help="summary JSON")
+    args = parser.parse_args()
+    if not 0 <= args.spread <= 1:
+        parser.error("--spread must be between 0 and 1")
+
+    rules = load_rule_set(RULE_SET, args.rules)
+    table, _ = load_score_table()
+    scores = score_columns(table, rules)
+    scored = len(table)
+    if not args.all_trails:
+        keep = scores["passes"].to_numpy()
+        table, scores = table[keep], scores[keep]
+        if not len(table):
+            parser.error(f"none of {scored:,} trails pass the hard constraints (--all-trails ranks them all)")
+    labels = rules.weights()
+    points = np.column_stack(
+        [scores[f"score_{c.name}"].to_numpy(dtype=np.float64) for c in rules.criteria]
+    )
+    print(
+        f"Sweeping {args.vectors:,} weightings over {len(table):,} of {scored:,} trails "
+        f"x {len(rules.criteria)} criteria..."
+    )
+
+    start = time.perf_counter()
+    multipliers = weight_vectors(len(rules.criteria), args.vectors, args.spread, args.seed)
+    result = sweep(points, multipliers, args.top)
+    closest = flips(table, result, multipliers, labels, args.flips)
+    elapsed = time.perf_counter() - start
+
+    order = np.lexsort((np.arange(len(table)), result["default_rank"]))
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RANKS_HEADER)
+        osm_ids = table["osm_id"].tolist()
+        names = table["name"].tolist()
+        columns = {key: result[key].tolist() for key in RANKS_HEADER if key in result}
+        for i in order.tolist():
+            writer.writerow(
+                [
+                    columns["default_rank"][i],
+                    osm_ids[i],
+                    names[i],
+                    f"{columns['default_score'][i]:g}",
+                    columns["best_rank"][i],
+                    f"{columns['p05_rank'][i]:g}",
+                    f"{columns['median_rank'][i]:g}",
+                    f"{columns['p95_rank'][i]:g}",
+                    columns["worst_rank"][i],
+                    f"{columns['mean_rank'][i]:.1f}",
+                    f"{columns['top_k_frequency'][i]:.4f}",
+                ]
+            )
+
+    default_top = np.flatnonzero(result["default_rank"] <= args.top)
+    default_top = default_top[np.argsort(result["default_rank"][default_top], kind="stable")]
+    changed = result["top_k_changed"]
+    summary = {
+        "trails": len(table),
+        "trails_scored": scored,
+        "distinct_score_profiles": result["profiles"],
+        "weightings": args.vectors,
+        "spread": args.spread,
+        "top_k": args.top,
+        "seed": args.seed,
+        "passing_only": not args.all_trails,
+        "seconds": round(elapsed, 3),
+        "default_weights": labels,
+        "weightings_changing_top_k": int(changed.sum()),
+        "weightings_changing_leader": int(result["leader_changed"].sum()),
+        # Mean multiplier per criterion among weightings that change the
+        # top K: above 1 means raising that weight tends to reshuffle it
+        "mean_multiplier_when_top_k_changes": {
+            label: round(float(m), 4)
+            for label, m in zip(labels, multipliers[changed].mean(axis=0) if changed.any() else [])
+        },
+        "default_top_k": [
+            {
+                "rank": int(result["default_rank"][i]),
+                "osm_id": str(table["osm_id"].iat[i]),
+                "name": str(table["name"].iat[i]),
+                "top_k_frequency": round(float(result["top_k_frequency"][i]), 4),
+                "rank_p05_p95": [float(result["p05_rank"][i]), float(result["p95_rank"][i])],
+            }
+            for i in default_top
+        ],
+        "closest_top_k_changes": closest,
+    }
+    with open(args.report, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(
+        f"{result['profiles']:,} distinct score profiles, "
+        f"{args.vectors:,} weightings ranked in {elapsed:.2f}s"
+    )
+    print(
+        f"Top {args.top} ({len(default_top):,} trails with ties) changes under "
+        f"{changed.mean():.1%} of weightings; the leader under "
+        f"{result['leader_changed'].mean():.1%}"
+    )
+    print(f"\n{'Rank':>5} {'Top-K freq':>10} {'p5-p95 rank':>12}  Trail")
+    print("-" * 60)
+    for entry in summary["default_top_k"][: args.top]:
+        low, high = entry["rank_p05_p95"]
+        print(
+            f"{entry['rank']:>5} {entry['top_k_frequency']:>10.1%} "
+            f"{low:>5g}-{high:<6g}  {entry['name']}"
+        )
+    if closest:
+        print(f"\nSmallest change that reshuffles the top {args.top}:")
+        print(f"  up to {closest[0]['max_relative_change']:.1%} on a weight: {closest[0]['weights']}")
+    print(f"\nWrote {output} and {args.report}")
+
+
+if __name__ == "__main__":
+    main()